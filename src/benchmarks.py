@@ -0,0 +1,606 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import numpy as np
+import os
+import pandas as pd
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+from cleaning_pipeline import CleaningPipeline
+from data_transform import DataTransform, updated_frame
+from df_information import DataFrameInfo
+from df_transform import DataFrameTransform
+from out_of_core import OutOfCorePipeline
+from pandas import DataFrame, Series
+from plotter import Plotter
+from synthetic_data import generate_loan_payments, generate_loan_payments_in_chunks
+from typing import Callable, Dict, List
+
+
+def time_call(func: Callable, repeat: int = 3) -> float:
+    """Return the fastest wall time, in seconds, of repeat calls to func."""
+    
+    timings = []
+    
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+        
+    return min(timings)
+
+########## ########## ##########
+# The per-element implementations which the vectorized methods replaced, kept as the baseline for benchmark_vectorized_paths.
+########## ########## #########
+
+def legacy_object_to_int(column: Series, mapping: dict) -> Series:
+    return Series(column.apply(lambda x: mapping[x])).astype('int64')
+
+def legacy_log_transform(column: Series) -> Series:
+    if column.dtype == 'float64':
+        return column.map(lambda i: np.log(i) if i > 0.0 else 0.0)
+    return column.map(lambda i: np.log(i) if i > 0 else 0)
+
+def legacy_convert_obj_columns_to_date(dataframe: DataFrame, column_names: list, current_format: str) -> DataFrame:
+    dataframe[column_names] = dataframe[column_names].apply(lambda x: pd.to_datetime(x, format=current_format))
+    return dataframe
+
+def benchmark_vectorized_paths(n_rows: int = 1_000_000, repeat: int = 3, seed: int = 0) -> DataFrame:
+    """Time each vectorized method against the per-element implementation it replaced, on n_rows of loan-like data.
+
+    Returns:
+        results (DataFrame): the legacy and vectorized times in seconds, and the speedup, for each path
+    """
+    
+    rng = np.random.default_rng(seed)
+    data_transform = DataTransform()
+    df_transform = DataFrameTransform()
+    
+    # Loan-like columns: a term string, a skewed money amount with some zeros, and '%b-%Y' dates
+    term = Series(rng.choice(['36 months', '60 months'], n_rows))
+    term_category = term.astype('category')
+    mapping = {'36 months': 36, '60 months': 60}
+    amounts = Series(rng.lognormal(6, 1.5, n_rows) * (rng.random(n_rows) > 0.1))
+    months = pd.date_range('1990-01-01', '2022-12-01', freq='MS').strftime('%b-%Y')
+    dates = DataFrame({f"date_{i}": rng.choice(months, n_rows) for i in range(5)})
+    
+    paths = {
+        'object_to_int': (lambda: legacy_object_to_int(term, mapping), lambda: data_transform.object_to_int(term, mapping)),
+        'category_to_int': (lambda: legacy_object_to_int(term_category, mapping), lambda: data_transform.category_to_int(term_category, mapping)),
+        'log_transform': (lambda: legacy_log_transform(amounts), lambda: df_transform.log_transform(amounts)),
+        'convert_obj_columns_to_date': (lambda: legacy_convert_obj_columns_to_date(dates.copy(), list(dates.columns), '%b-%Y'),
+                                        lambda: data_transform.convert_obj_columns_to_date(dates.copy(), list(dates.columns), '%b-%Y')),
+    }
+    
+    results = []
+    
+    for path, (legacy, vectorized) in paths.items():
+        # Check the vectorized method gives the same answer before timing it
+        expected, actual = legacy(), vectorized()
+        if isinstance(expected, DataFrame):
+            pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+        else:
+            pd.testing.assert_series_equal(expected, actual, check_dtype=False, check_names=False)
+        
+        legacy_seconds = time_call(legacy, repeat)
+        vectorized_seconds = time_call(vectorized, repeat)
+        
+        results.append({'path': path, 'rows': n_rows, 'legacy (s)': legacy_seconds, 'vectorized (s)': vectorized_seconds,
+                        'speedup': legacy_seconds / vectorized_seconds})
+        
+    return DataFrame(results).set_index('path')
+
+########## ########## ##########
+# The implementations which copied or cast whole columns before the inplace mode, kept as the baseline for benchmark_transform_memory.
+########## ########## #########
+
+def legacy_drop_columns(df: DataFrame, column_names: List[str]) -> DataFrame:
+    return df.drop(column_names, axis=1)
+
+def legacy_drop_rows_of_null_column_entries(df: DataFrame, column_names: List[str]) -> DataFrame:
+    for column_name in column_names:
+        to_drop = df[df[column_name].isnull()].index
+        df = df.drop(to_drop, axis=0)
+    return df
+
+def legacy_replace_column_after_box_cox(df: DataFrame, original_column: Series, new_column: Series) -> DataFrame:
+    df[original_column.name] = df[original_column.name].astype(str(new_column.dtype))
+    df[original_column.name] = new_column
+    df[original_column.name] = df[original_column.name].fillna(new_column.mean())
+    return df
+
+def legacy_convert_object_columns_into_categories(df: DataFrame, colnames: List[str]) -> DataFrame:
+    df[colnames] = df[colnames].astype("category")
+    return df
+
+def legacy_int64_to_category_with_ranges(data_transform: DataTransform, df: DataFrame, column: Series) -> Series:
+    binned = data_transform.int64_to_category_with_ranges(df, column)
+    df.loc[column == 0, column.name] = np.nan
+    return binned
+
+def benchmark_transform_memory(n_rows: int = 1_000_000, seed: int = 0) -> DataFrame:
+    """Measure the peak memory each DataFrame-changing transform allocates on n_rows of synthetic loan_payments, as it was before the 
+    inplace mode, and as it is now returning a new DataFrame, with pandas' copy-on-write mode off and on, and with inplace=True, 
+    checking all four give the same DataFrame. With copy-on-write off, the new DataFrame copies the columns it keeps, as df.drop does.
+    
+    Raises an error if the copy-on-write or the inplace version of a transform allocates more than its legacy version.
+    
+    Returns:
+        results (DataFrame): the peak memory in MB of each version
+    """
+    data_transform = DataTransform()
+    df_transform = DataFrameTransform()
+    
+    # The cleaning flow reaches these transforms with datetime and category columns, and whole numbers where it bins columns
+    df = data_transform.convert_obj_columns_to_date(generate_loan_payments(n_rows, seed), ['issue_date', 'last_payment_date'], '%b-%Y')
+    df['recoveries'] = df['recoveries'].round().astype(np.int64)
+    categories = ['grade', 'sub_grade', 'home_ownership', 'verification_status', 'loan_status', 'purpose']
+    nulls = ['last_payment_date', 'last_credit_pull_date', 'collections_12_mths_ex_med']
+    transformed = df_transform.box_cox_transform(df['total_rec_int'])
+    transformed.iloc[:10] = np.nan
+    
+    def legacy_binned(df: DataFrame) -> DataFrame:
+        # As the notebook uses it, replacing the column with the binned one
+        df['recoveries'] = legacy_int64_to_category_with_ranges(data_transform, df, df['recoveries'])
+        return df
+    
+    # The legacy version, the version returning a new DataFrame, and the inplace version, which changes the DataFrame it is given
+    paths = {
+        'drop_columns': (lambda df: legacy_drop_columns(df, ['grade', 'payment_plan']),
+                         lambda df: df_transform.drop_columns(df, ['grade', 'payment_plan'], inplace=False),
+                         lambda df: df_transform.drop_columns(df, ['grade', 'payment_plan'], inplace=True)),
+        'drop_rows_of_null_column_entries': (lambda df: legacy_drop_rows_of_null_column_entries(df, nulls),
+                                             lambda df: df_transform.drop_rows_of_null_column_entries(df, nulls, inplace=False),
+                                             lambda df: df_transform.drop_rows_of_null_column_entries(df, nulls, inplace=True)),
+        'replace_column_after_box_cox': (lambda df: legacy_replace_column_after_box_cox(df, df['total_rec_int'], transformed),
+                                         lambda df: df_transform.replace_column_after_box_cox(df, df['total_rec_int'], transformed, inplace=False),
+                                         lambda df: df_transform.replace_column_after_box_cox(df, df['total_rec_int'], transformed, inplace=True)),
+        'convert_object_columns_into_categories': (lambda df: legacy_convert_object_columns_into_categories(df, categories),
+                                                   lambda df: data_transform.convert_object_columns_into_categories(df, categories, inplace=False),
+                                                   lambda df: data_transform.convert_object_columns_into_categories(df, categories, inplace=True)),
+        'int64_to_category_with_ranges': (legacy_binned,
+                                          lambda df: updated_frame(df, {'recoveries': data_transform.int64_to_category_with_ranges(df, df['recoveries'])}),
+                                          lambda df: data_transform.int64_to_category_with_ranges(df, df['recoveries'], inplace=True)),
+    }
+    
+    def peak_memory(func: Callable, df: DataFrame, copy_on_write: bool = False) -> (DataFrame, float):
+        tracemalloc.start()
+        try:
+            with pd.option_context('mode.copy_on_write', copy_on_write):
+                result = func(df)
+            return result, tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    
+    results = []
+    
+    for path, (legacy, new_frame, in_place) in paths.items():
+        # Every version gets its own copy, made before tracing starts, as the legacy and inplace versions change it
+        expected, legacy_mb = peak_memory(legacy, df.copy())
+        returned, new_frame_mb = peak_memory(new_frame, df.copy())
+        shared, copy_on_write_mb = peak_memory(new_frame, df.copy(), copy_on_write=True)
+        changed = df.copy()
+        _, inplace_mb = peak_memory(in_place, changed)
+        
+        pd.testing.assert_frame_equal(expected, returned)
+        pd.testing.assert_frame_equal(expected, shared)
+        pd.testing.assert_frame_equal(expected, changed)
+        
+        results.append({'path': path, 'rows': n_rows, 'legacy peak (MB)': legacy_mb, 'new frame peak (MB)': new_frame_mb, 
+                        'copy-on-write peak (MB)': copy_on_write_mb, 'inplace peak (MB)': inplace_mb})
+    
+    results = DataFrame(results).set_index('path')
+    
+    over_legacy = results[results[['copy-on-write peak (MB)', 'inplace peak (MB)']].max(axis=1) > results['legacy peak (MB)']]
+    if len(over_legacy) > 0:
+        raise Exception(f"The copy-on-write or inplace versions of {list(over_legacy.index)} allocate more memory than the legacy versions:\n{over_legacy}")
+    
+    return results
+
+def benchmark_out_of_core(n_rows: int = 1_000_000, chunksize: int = 100_000, seed: int = 0, 
+                          pipeline_file: str = 'loan_payments_cleaning.yaml') -> DataFrame:
+    """Measure the time and peak memory of cleaning n_rows of synthetic loan_payments into a CSV file, with the whole table in memory,
+    and with an OutOfCorePipeline reading chunks of chunksize rows, checking both write the same number of rows.
+    
+    Returns:
+        results (DataFrame): the seconds, peak memory in MB, passes over the chunks and rows written of each way of running the pipeline
+    """
+    def in_memory(filepath: str) -> (int, int):
+        cleaned = CleaningPipeline.from_yaml(pipeline_file).run(generate_loan_payments(n_rows, seed, chunksize))
+        cleaned.to_csv(filepath)
+        return len(cleaned), 1
+    
+    def out_of_core(filepath: str) -> (int, int):
+        executor = OutOfCorePipeline(CleaningPipeline.from_yaml(pipeline_file))
+        rows = executor.run_to_csv(lambda: generate_loan_payments_in_chunks(n_rows, seed, chunksize), filepath)
+        return rows, executor.passes
+    
+    results = []
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for name, run in {'in memory': in_memory, 'out of core': out_of_core}.items():
+            tracemalloc.start()
+            try:
+                start = time.perf_counter()
+                rows, passes = run(os.path.join(directory, f"{name}.csv"))
+                seconds = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            
+            results.append({'run': name, 'rows': n_rows, 'chunksize': chunksize, 'seconds': seconds, 'peak memory (MB)': peak / 2 ** 20, 
+                            'passes': passes, 'rows written': rows})
+    
+    results = DataFrame(results).set_index('run')
+    
+    if results['rows written'].nunique() != 1:
+        raise Exception(f"The out of core run wrote {results.loc['out of core', 'rows written']} rows, but the in memory run wrote {results.loc['in memory', 'rows written']}.")
+    
+    return results
+
+def benchmark_result_cache(n_rows: int = 1_000_000, repeat: int = 3, seed: int = 0) -> DataFrame:
+    """Time each cached DataFrameInfo method on n_rows of raw synthetic loan_payments, without a cache and when its result is
+    already cached, so the hit includes the cost of fingerprinting the frame. Raises an Exception if any hit is not faster.
+
+    Returns:
+        results (DataFrame): the uncached and cache hit times in seconds, and the speedup, for each method
+    """
+    raw = generate_loan_payments(n_rows, seed)
+    uncached = DataFrameInfo()
+    cache = DataFrameInfo(cache_max_bytes=2 ** 30)
+    
+    cases = {
+        'profile': (raw,),
+        'measure_skew_for_all_columns': (raw,),
+        'percentage_of_nulls_in_data_frame': (raw,),
+        'print_null_removal_progress': (raw,),
+        'combine_null_percentage_and_count': (raw,),
+        'get_updated_skew_series': (raw, []),
+        'get_normally_distributed_series': (raw, []),
+        'describe_all': (raw,),
+        'print_skew_and_dtype': (raw,),
+        'describe_column': (raw['loan_amount'],),
+        'get_column_median': (raw['loan_amount'],),
+        'get_column_mode': (raw['grade'],),
+    }
+    
+    results = []
+    
+    for method, args in cases.items():
+        uncached_seconds = time_call(lambda: getattr(uncached, method)(*args), repeat)
+        
+        # The first call fills the cache, so every timed call is a hit
+        getattr(cache, method)(*args)
+        hit_seconds = time_call(lambda: getattr(cache, method)(*args), repeat)
+        
+        results.append({'method': method, 'rows': n_rows, 'uncached (s)': uncached_seconds, 'hit (s)': hit_seconds, 
+                        'speedup': uncached_seconds / hit_seconds})
+    
+    results = DataFrame(results).set_index('method')
+    slower = list(results.index[results['speedup'] <= 1])
+    
+    if slower:
+        raise Exception(f"A cache hit is not faster than recalculating for {slower}.")
+    
+    return results
+
+# The modules batch workers import without plotting, which should start quickly
+NON_PLOTTING_MODULES = ['db_utils', 'df_information', 'df_transform', 'data_transform', 'cleaning_pipeline', 'fitted_transformers',
+                        'streaming_stats', 'result_cache', 'segment_index', 'correlation', 'column_executor', 'instrumentation', 'out_of_core', 'partitioned']
+
+# Dependencies which take seconds to import, so should only be imported when they are used. pyarrow is left out as pandas imports it.
+HEAVY_DEPENDENCIES = ['scipy', 'sklearn', 'matplotlib', 'seaborn', 'statsmodels', 'missingno', 'sqlalchemy']
+
+def benchmark_import_times(modules: List[str] = None, budget_seconds: float = 1.0, repeat: int = 3) -> DataFrame:
+    """Time a cold import of each module in a new Python process, and list the heavy dependencies it imported. The modules are 
+    NON_PLOTTING_MODULES unless they are given.
+
+    Returns:
+        results (DataFrame): the fastest import time in seconds, the time on top of importing pandas, the heavy dependencies imported, 
+        and whether the import was within budget_seconds, for each module
+    """
+    script = ("import sys, time; start = time.perf_counter(); import {module}; seconds = time.perf_counter() - start; "
+              f"print(seconds, ','.join(name for name in {HEAVY_DEPENDENCIES!r} if name in sys.modules))")
+    
+    def cold_import(module: str) -> (float, str):
+        timings = []
+        
+        for _ in range(repeat):
+            # A new process each time, so nothing is already imported
+            output = subprocess.run([sys.executable, '-c', script.format(module=module)], cwd=os.path.dirname(os.path.abspath(__file__)), 
+                                    capture_output=True, text=True, check=True).stdout.split()
+            timings.append(float(output[0]))
+            
+        return min(timings), output[1] if len(output) > 1 else ''
+    
+    pandas_seconds, _ = cold_import('pandas')
+    results = []
+    
+    for module in modules or NON_PLOTTING_MODULES:
+        seconds, heavy = cold_import(module)
+        results.append({'module': module, 'import (s)': seconds, 'over pandas (s)': seconds - pandas_seconds, 'heavy dependencies': heavy,
+                        'within budget': seconds <= budget_seconds and not heavy})
+        
+    return DataFrame(results).set_index('module')
+
+def check_import_budget(modules: List[str] = None, budget_seconds: float = 1.0) -> DataFrame:
+    """Raise an error if any module takes longer than budget_seconds to import, or imports a heavy dependency. Returns the timings."""
+    results = benchmark_import_times(modules, budget_seconds)
+    over_budget = results[~results['within budget']]
+    
+    if len(over_budget) > 0:
+        raise Exception(f"These modules are over the import budget of {budget_seconds}s, or import heavy dependencies:\n{over_budget}")
+    
+    return results
+
+########## ########## ##########
+# The benchmark suite, which times and memory-profiles every public method, and the cleaning pipeline, on synthetic loan_payments tables.
+########## ########## #########
+
+# The numbers of rows benchmark_suite runs with unless it is given sizes
+DEFAULT_SUITE_SIZES = [10_000, 1_000_000]
+
+# The classes whose public methods the suite benchmarks
+BENCHMARKED_CLASSES = [DataFrameInfo, DataTransform, DataFrameTransform, Plotter, CleaningPipeline]
+
+def benchmark_suite(sizes: List[int] = None, repeat: int = 3, seed: int = 0, include_plots: bool = True) -> DataFrame:
+    """Time and memory-profile each public method, and the end-to-end CleaningPipeline run, on synthetic tables of each size.
+
+    Each case's arguments are prepared before it is timed, by its setup where they take time to make, e.g. the list scatter_plot takes.
+    The fastest of repeat calls is kept, then one more call is traced with tracemalloc for the peak memory it allocated, as tracing slows it down.
+    A case which raises an error is recorded with the error rather than stopping the suite.
+
+    Returns:
+        results (DataFrame): the seconds, peak memory in MB and any error of each case, at each number of rows
+    """
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for n_rows in sizes or DEFAULT_SUITE_SIZES:
+            raw = generate_loan_payments(n_rows, seed)
+
+            # The constructors print a message, which would be repeated for every size, as would any deprecation warnings
+            with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                cases = _benchmark_cases(raw, directory, include_plots)
+
+                for case, (setup, method) in cases.items():
+                    results.append({'case': case, 'rows': n_rows, **_measure(setup, method, repeat)})
+
+    missing = [case for case in _public_methods(include_plots) if case not in cases]
+    if missing:
+        print(f"These public methods have no benchmark case: {missing}")
+
+    return DataFrame(results).set_index(['case', 'rows'])
+
+def save_benchmark_results(results: DataFrame, filepath: str) -> None:
+    """Save the results of benchmark_suite to a json file, with the versions of Python, pandas and numpy they were measured with."""
+    document = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'machine': platform.platform(),
+        'versions': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__},
+        'results': results.reset_index().replace({np.nan: None}).to_dict(orient='records'),
+    }
+
+    with open(filepath, 'w') as f:
+        json.dump(document, f, indent=2)
+
+def load_benchmark_results(filepath: str) -> DataFrame:
+    """Load results saved by save_benchmark_results."""
+    with open(filepath, 'r') as f:
+        return DataFrame(json.load(f)['results']).set_index(['case', 'rows'])
+
+def compare_benchmark_results(current: DataFrame, baseline: DataFrame, tolerance: float = 1.25, min_seconds: float = 0.01, 
+                              min_memory_mb: float = 1.0) -> DataFrame:
+    """Compare two sets of benchmark_suite results, flagging each case which got slower or used more memory than tolerance times its baseline.
+
+    Differences of less than min_seconds or min_memory_mb are never flagged, as they are within the noise of timing small cases.
+
+    Returns:
+        comparison (DataFrame): the baseline and current seconds and peak memory, their ratios, and whether each case regressed
+    """
+    comparison = baseline[['seconds', 'peak memory (MB)']].join(current[['seconds', 'peak memory (MB)']], how='inner', lsuffix=' baseline', rsuffix=' current')
+
+    for measure, noise in [('seconds', min_seconds), ('peak memory (MB)', min_memory_mb)]:
+        before, after = comparison[f"{measure} baseline"], comparison[f"{measure} current"]
+        comparison[f"{measure} ratio"] = after / before
+        comparison[f"{measure} regressed"] = (after > before * tolerance) & (after - before > noise)
+
+    comparison['regressed'] = comparison['seconds regressed'] | comparison['peak memory (MB) regressed']
+
+    return comparison
+
+def _measure(setup: Callable[[], tuple], method: Callable, repeat: int) -> dict:
+    """Return the fastest time of repeat calls to method with the arguments made by setup, and the peak memory of one traced call."""
+    try:
+        timings = []
+
+        for _ in range(repeat):
+            args = setup()
+            start = time.perf_counter()
+            method(*args)
+            timings.append(time.perf_counter() - start)
+            _close_figures()
+
+        args = setup()
+        tracemalloc.start()
+        try:
+            method(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            _close_figures()
+
+        return {'seconds': min(timings), 'peak memory (MB)': peak / 2 ** 20, 'error': None}
+    except Exception as error:
+        return {'seconds': np.nan, 'peak memory (MB)': np.nan, 'error': f"{type(error).__name__}: {error}"}
+
+def _close_figures() -> None:
+    """Close every figure the plotting cases drew, so they do not hold memory, if pyplot has been imported."""
+    if 'matplotlib.pyplot' in sys.modules:
+        sys.modules['matplotlib.pyplot'].close('all')
+
+def _public_methods(include_plots: bool) -> List[str]:
+    """Return the name of each public method of the benchmarked classes, as '<class>.<method>'."""
+    classes = [cls for cls in BENCHMARKED_CLASSES if include_plots or cls is not Plotter]
+    return [f"{cls.__name__}.{name}" for cls in classes for name in dir(cls) if not name.startswith('_') and callable(getattr(cls, name))]
+
+def _benchmark_cases(raw: DataFrame, directory: str, include_plots: bool) -> Dict[str, tuple]:
+    """Return the setup and method of each case, keyed by '<class>.<method>'. setup returns the method's arguments.
+
+    The methods which take cleaned data, such as portfolio_metrics, are given the table cleaned by loan_payments_cleaning.yaml.
+    """
+    info, data_transform, df_transform = DataFrameInfo(), DataTransform(), DataFrameTransform()
+    pipeline = CleaningPipeline.from_yaml(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loan_payments_cleaning.yaml'))
+    cleaned = pipeline.run(raw)
+
+    no_args = lambda: ()
+    dates = ['issue_date', 'last_payment_date', 'next_payment_date', 'last_credit_pull_date', 'earliest_credit_line']
+    categories = ['grade', 'sub_grade', 'employment_length', 'home_ownership', 'verification_status', 'loan_status', 'purpose']
+    skewed = ['annual_inc', 'total_rec_int', 'total_payment', 'last_payment_amount']
+    bins = ['delinq_2yrs', 'inq_last_6mths']
+    fitted_path = os.path.join(directory, 'fitted.yaml')
+
+    # Fit every transform once, so the cases which save or reuse fitted statistics have some
+    df_transform.box_cox_transform_columns(raw, ['total_accounts', 'total_rec_int'])
+    data_transform.int64_columns_to_categories_with_ranges(raw, bins)
+    pipeline.save_fitted(fitted_path)
+
+    cases = {
+        'DataFrameInfo.profile': (no_args, lambda: info.profile(raw)),
+        'DataFrameInfo.measure_skew_for_all_columns': (no_args, lambda: info.measure_skew_for_all_columns(raw)),
+        'DataFrameInfo.print_null_removal_progress': (no_args, lambda: info.print_null_removal_progress(raw)),
+        'DataFrameInfo.combine_null_percentage_and_count': (no_args, lambda: info.combine_null_percentage_and_count(raw)),
+        'DataFrameInfo.get_numeric_columns_from_df': (no_args, lambda: info.get_numeric_columns_from_df(raw)),
+        'DataFrameInfo.get_columns_with_nulls': (no_args, lambda: info.get_columns_with_nulls(raw)),
+        'DataFrameInfo.percentage_of_nulls_in_data_frame': (no_args, lambda: info.percentage_of_nulls_in_data_frame(raw)),
+        'DataFrameInfo.get_updated_skew_series': (no_args, lambda: info.get_updated_skew_series(raw, ['id', 'member_id'])),
+        'DataFrameInfo.get_normally_distributed_series': (no_args, lambda: info.get_normally_distributed_series(raw, ['id', 'member_id'])),
+        'DataFrameInfo.get_column_standard_deviation': (no_args, lambda: info.get_column_standard_deviation(raw['annual_inc'])),
+        'DataFrameInfo.describe_all': (no_args, lambda: info.describe_all(raw)),
+        'DataFrameInfo.show_all_column_dtypes': (no_args, lambda: info.show_all_column_dtypes(raw)),
+        'DataFrameInfo.describe_column': (no_args, lambda: info.describe_column(raw['annual_inc'])),
+        'DataFrameInfo.get_column_median': (no_args, lambda: info.get_column_median(raw['annual_inc'])),
+        'DataFrameInfo.get_column_mean': (no_args, lambda: info.get_column_mean(raw['annual_inc'])),
+        'DataFrameInfo.get_column_mode': (no_args, lambda: info.get_column_mode(raw['purpose'])),
+        'DataFrameInfo.percentage_of_nulls_in_column': (no_args, lambda: info.percentage_of_nulls_in_column(raw['int_rate'])),
+        'DataFrameInfo.print_skew_and_dtype': (no_args, lambda: info.print_skew_and_dtype(raw)),
+        'DataFrameInfo.count_nulls_in_column': (no_args, lambda: info.count_nulls_in_column(raw['int_rate'])),
+        'DataFrameInfo.contains_nulls': (no_args, lambda: info.contains_nulls(raw['int_rate'])),
+        'DataFrameInfo.get_categorical_columns': (no_args, lambda: info.get_categorical_columns(cleaned)),
+        'DataFrameInfo.get_distinct_categories_in_colum': (no_args, lambda: info.get_distinct_categories_in_colum(cleaned['purpose'])),
+
+        'DataTransform.int64_to_category_with_ranges': (no_args, lambda: data_transform.int64_to_category_with_ranges(raw, raw['delinq_2yrs'])),
+        'DataTransform.int64_columns_to_categories_with_ranges': (no_args, lambda: data_transform.int64_columns_to_categories_with_ranges(raw, bins)),
+        'DataTransform.convert_float64_columns_into_Int64s': (no_args, lambda: data_transform.convert_float64_columns_into_Int64s(raw[['recoveries', 'total_rec_late_fee']].round())),
+        'DataTransform.convert_object_columns_into_categories': (no_args, lambda: data_transform.convert_object_columns_into_categories(raw, categories, inplace=False)),
+        'DataTransform.convert_obj_columns_to_date': (no_args, lambda: data_transform.convert_obj_columns_to_date(raw, dates, '%b-%Y', inplace=False)),
+        'DataTransform.downcast_dtypes': (no_args, lambda: data_transform.downcast_dtypes(raw)),
+        'DataTransform.object_to_date': (no_args, lambda: data_transform.object_to_date(raw['issue_date'], '%b-%Y')),
+        'DataTransform.object_to_int': (no_args, lambda: data_transform.object_to_int(raw['term'].dropna(), {'36 months': 36, '60 months': 60})),
+        'DataTransform.float_to_money_format': (no_args, lambda: data_transform.float_to_money_format(raw['loan_amount'].sum())),
+        'DataTransform.category_to_int': (no_args, lambda: data_transform.category_to_int(cleaned['loan_status'], {status: code for code, status in enumerate(cleaned['loan_status'].cat.categories)})),
+        'DataTransform.float64_to_int64': (no_args, lambda: data_transform.float64_to_int64(raw['recoveries'])),
+        'DataTransform.object_to_categorical': (no_args, lambda: data_transform.object_to_categorical(raw['purpose'])),
+        'DataTransform.save_fitted_transformers': (no_args, lambda: data_transform.save_fitted_transformers(fitted_path)),
+        'DataTransform.load_fitted_transformers': (no_args, lambda: data_transform.load_fitted_transformers(fitted_path)),
+
+        'DataFrameTransform.replace_column_after_box_cox': (no_args, lambda: df_transform.replace_column_after_box_cox(raw, raw['total_rec_int'], cleaned['total_rec_int'], inplace=False)),
+        'DataFrameTransform.calculate_revenue': (no_args, lambda: df_transform.calculate_revenue(cleaned)),
+        'DataFrameTransform.portfolio_metrics': (no_args, lambda: df_transform.portfolio_metrics(cleaned, by=['sub_grade'])),
+        'DataFrameTransform.portfolio_metric_sums': (no_args, lambda: df_transform.portfolio_metric_sums(cleaned, by=['sub_grade'])),
+        'DataFrameTransform.portfolio_metrics_from_sums': (lambda: (df_transform.portfolio_metric_sums(cleaned, by=['sub_grade']),), df_transform.portfolio_metrics_from_sums),
+        'DataFrameTransform.box_cox_transform': (no_args, lambda: df_transform.box_cox_transform(raw['total_accounts'])),
+        'DataFrameTransform.yeo_johnson_transform': (no_args, lambda: df_transform.yeo_johnson_transform(raw['total_payment_inv'])),
+        'DataFrameTransform.box_cox_transform_columns': (no_args, lambda: df_transform.box_cox_transform_columns(raw, ['total_accounts', 'total_rec_int'])),
+        'DataFrameTransform.yeo_johnson_transform_columns': (no_args, lambda: df_transform.yeo_johnson_transform_columns(raw, skewed)),
+        'DataFrameTransform.reduce_skew': (no_args, lambda: df_transform.reduce_skew(info.get_numeric_columns_from_df(raw), to_drop=['id', 'member_id'])),
+        'DataFrameTransform.drop_column': (no_args, lambda: df_transform.drop_column(raw, raw['policy_code'])),
+        'DataFrameTransform.drop_columns': (no_args, lambda: df_transform.drop_columns(raw, ['grade', 'payment_plan', 'policy_code', 'application_type'])),
+        'DataFrameTransform.drop_rows_of_null_column_entries': (no_args, lambda: df_transform.drop_rows_of_null_column_entries(raw, ['last_payment_date', 'last_credit_pull_date', 'collections_12_mths_ex_med'])),
+        'DataFrameTransform.impute_nulls_in_column': (no_args, lambda: df_transform.impute_nulls_in_column(raw['int_rate'], 'median')),
+        'DataFrameTransform.apply_label_encoder_to_df': (no_args, lambda: df_transform.apply_label_encoder_to_df(raw, categories, inplace=False)),
+        'DataFrameTransform.log_transform': (no_args, lambda: df_transform.log_transform(raw['annual_inc'])),
+        'DataFrameTransform.save_fitted_transformers': (no_args, lambda: df_transform.save_fitted_transformers(fitted_path)),
+        'DataFrameTransform.load_fitted_transformers': (no_args, lambda: df_transform.load_fitted_transformers(fitted_path)),
+
+        # The end-to-end cleaning flow, fitting every step, then replaying the fitted steps on the same table
+        'CleaningPipeline.run': (no_args, lambda: pipeline.run(raw)),
+        'CleaningPipeline.transform': (no_args, lambda: pipeline.transform(raw)),
+        'CleaningPipeline.from_yaml': (no_args, lambda: CleaningPipeline.from_yaml(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loan_payments_cleaning.yaml'))),
+        'CleaningPipeline.to_yaml': (no_args, lambda: pipeline.to_yaml(os.path.join(directory, 'pipeline.yaml'))),
+        'CleaningPipeline.save_fitted': (no_args, lambda: pipeline.save_fitted(fitted_path)),
+        'CleaningPipeline.load_fitted': (no_args, lambda: pipeline.load_fitted(fitted_path)),
+    }
+
+    if include_plots:
+        cases.update(_plot_cases(raw, cleaned, info))
+
+    return cases
+
+def _plot_cases(raw: DataFrame, cleaned: DataFrame, info: DataFrameInfo) -> Dict[str, tuple]:
+    """Return the setup and method of each Plotter case, drawn with show=False on the non-interactive Agg backend."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+    plotter = Plotter(show=False)
+    no_args = lambda: ()
+    numeric = info.get_numeric_columns_from_df(raw).drop(['id', 'member_id'], axis=1)
+    correlation = numeric.corr()
+    skewed = ['annual_inc', 'total_rec_int', 'total_payment', 'last_payment_amount']
+
+    # The small summary tables the notebook draws bar plots of
+    status_amounts = raw.groupby('loan_status', as_index=False)['loan_amount'].mean()
+    paid_off = DataFrame({'Data': ['Currently', 'Projected'], 'Paid off': [60.0, 65.0], 'Not paid off': [40.0, 35.0]})
+
+    return {
+        'Plotter.plot_histogram_quad': (no_args, lambda: plotter.plot_histogram_quad(raw[skewed])),
+        'Plotter.plot_histogram_before_and_after_transform': (no_args, lambda: plotter.plot_histogram_before_and_after_transform(raw['total_rec_int'], cleaned['total_rec_int'], 'Box-Cox')),
+        'Plotter.plot_histogram_and_qq': (no_args, lambda: plotter.plot_histogram_and_qq(raw['total_accounts'])),
+        'Plotter.qq_plot': (no_args, lambda: plotter.qq_plot(raw['instalment'])),
+        'Plotter.histogram': (no_args, lambda: plotter.histogram(raw['annual_inc'])),
+        'Plotter.barplot': (no_args, lambda: plotter.barplot(status_amounts, 'loan_status', 'loan_amount')),
+        'Plotter.correlation_matrix': (no_args, lambda: plotter.correlation_matrix(numeric)),
+        'Plotter.plot_correlation_matrix': (no_args, lambda: plotter.plot_correlation_matrix(correlation)),
+        'Plotter.show_null_bar_chart': (no_args, lambda: plotter.show_null_bar_chart(raw)),
+        'Plotter.stacked_bar_plot': (no_args, lambda: plotter.stacked_bar_plot(paid_off, 'Paid off loans: currently and projected')),
+        'Plotter.scatter_plot': (lambda: (list(raw['annual_inc']),), lambda data: plotter.scatter_plot(data)),
+        'Plotter.plot_skew_by_column_name': (no_args, lambda: plotter.plot_skew_by_column_name(raw, 'annual_inc')),
+        'Plotter.pair_plot': (no_args, lambda: plotter.pair_plot(raw[skewed])),
+        'Plotter.box_and_whiskers': (no_args, lambda: plotter.box_and_whiskers(raw['annual_inc'])),
+        'Plotter.plot_box_whiskers_and_histogram': (no_args, lambda: plotter.plot_box_whiskers_and_histogram(raw['annual_inc'])),
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the EDA methods.")
+    parser.add_argument('--suite', action='store_true', help="run the benchmark suite instead of the vectorized path and import benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SUITE_SIZES, help="the numbers of rows to benchmark the suite with")
+    parser.add_argument('--no-plots', action='store_true', help="leave the Plotter methods out of the suite")
+    parser.add_argument('--output', default='benchmark_results.json', help="the json file to save the suite results to")
+    parser.add_argument('--baseline', help="a json file of earlier suite results, to flag the cases which regressed")
+    arguments = parser.parse_args()
+
+    if not arguments.suite:
+        print(benchmark_vectorized_paths().round(4))
+        print(benchmark_transform_memory().round(2))
+        print(benchmark_result_cache().round(4))
+        print(benchmark_import_times().round(3))
+    else:
+        results = benchmark_suite(arguments.sizes, include_plots=not arguments.no_plots)
+        save_benchmark_results(results, arguments.output)
+        print(results.round(4).to_string())
+
+        if arguments.baseline:
+            comparison = compare_benchmark_results(results, load_benchmark_results(arguments.baseline))
+            print(comparison[comparison['regressed']].round(3).to_string())
+
+            if comparison['regressed'].any():
+                sys.exit(1)
@@ -0,0 +1,243 @@
+import numpy as np
+import yaml
+
+from data_transform import DataTransform
+from df_transform import DataFrameTransform
+from fitted_transformers import BoxCoxTransformer, FittedTransformer, LabelEncoderTransformer, NullImputer, RangeBinner, YeoJohnsonTransformer, transformers_from_dict, transformers_to_dict
+from instrumentation import span
+from pandas import DataFrame, Series
+from typing import Dict, List
+
+
+class CleaningPipeline():
+    """Runs a declarative list of cleaning steps over a DataFrame in one call.
+
+    Each step is a dict naming the step and its arguments, e.g. {'step': 'impute', 'columns': ['int_rate'], 'strategy': 'median'}.
+    The steps are run one after another, in order, each over every column it names, so the pipeline does the same work on each
+    column as calling the DataTransform and DataFrameTransform methods step by step. What it saves is the intermediate frames: the
+    steps work on a dict of columns rather than the whole frame, dropped columns are simply forgotten, and dropped rows are only
+    recorded in a mask. The cleaned DataFrame is built once at the end, so no intermediate copies of the frame are made. Statistics
+    (modes, medians, bin cutoffs, Box-Cox lambdas) are calculated on the rows still kept at that step.
+
+    The fitted statistics are kept as transformers, so transform() can replay the pipeline on a new extract without refitting,
+    and save_fitted()/load_fitted() persist them between runs.
+
+    Attributes:
+        steps (List[dict]): the validated specification of the pipeline.
+        fitted (Dict[str, FittedTransformer]): the transformer fitted by each step, keyed by '<step number>:<column name>'.
+        dropped_null_columns (Dict[int, List[str]]): the columns removed by each drop_null_columns step, keyed by step number.
+
+    Methods:
+        from_yaml:
+            Load a pipeline specification from a yaml file.
+        to_yaml:
+            Save the pipeline specification to a yaml file.
+        run:
+            Fit every step to a DataFrame, apply it and return the cleaned copy.
+        transform:
+            Apply every step to a DataFrame using the statistics fitted by the last run.
+        save_fitted:
+            Save the fitted statistics to a yaml file.
+        load_fitted:
+            Load statistics saved by save_fitted, to transform without running first.
+
+    Steps:
+        to_datetime (columns, format): convert string columns into datetimes.
+        to_category (columns): convert columns into the category dtype.
+        to_Int64 (columns, round): convert float columns into nullable Int64, optionally rounding first.
+        map (column, mapping): replace each value of a column using the mapping, and convert it to int64.
+        impute (columns, strategy): fill nulls with the 'mean', 'median' or 'mode' of each column.
+        bin (columns, num_bins): convert integer columns into categories of value ranges, keeping 0 as its own category.
+        drop_columns (columns): remove the columns.
+        drop_null_columns (threshold): remove every column with more than threshold % null values.
+        drop_null_rows (columns): remove rows with a null in any of the columns.
+        box_cox (columns): apply a Box-Cox transform, filling nulls with the transformed mean.
+        yeo_johnson (columns): apply a Yeo-Johnson transform.
+        log (columns): apply a log transform, mapping values <= 0 to 0.
+        label_encode (columns): encode each value as its position in the sorted vocabulary of the column, and nulls as -1.
+
+    """
+
+    STEPS = ['to_datetime', 'to_category', 'to_Int64', 'map', 'impute', 'bin', 'drop_columns', 'drop_null_columns', 'drop_null_rows', 'box_cox', 'yeo_johnson', 'log', 'label_encode']
+
+    def __init__(self, steps: List[dict]):
+        # Raise an error straight away rather than part of the way through a run
+        for step in steps:
+            if step.get('step') not in self.STEPS:
+                raise Exception(f"Unknown pipeline step '{step.get('step')}'. Steps must be one of {self.STEPS}.")
+
+        self.steps = steps
+        self.fitted = {}
+        self.dropped_null_columns = {}
+        self.data_transform = DataTransform()
+        self.df_transform = DataFrameTransform()
+
+    @classmethod
+    def from_yaml(cls, filepath: str) -> 'CleaningPipeline':
+        """Load a pipeline specification from a yaml file containing a list of steps."""
+        with open(filepath, 'r') as f:
+            return cls(yaml.safe_load(f))
+
+    def to_yaml(self, filepath: str) -> None:
+        """Save the pipeline specification to a yaml file, so it can be replayed on new extracts."""
+        with open(filepath, 'w') as f:
+            yaml.safe_dump(self.steps, f, sort_keys=False)
+
+    def save_fitted(self, filepath: str) -> None:
+        """Save the statistics fitted by the last run to a yaml file."""
+        data = {'transformers': transformers_to_dict(self.fitted), 'dropped_null_columns': self.dropped_null_columns}
+
+        with open(filepath, 'w') as f:
+            yaml.safe_dump(data, f, sort_keys=False)
+
+    def load_fitted(self, filepath: str) -> None:
+        """Load statistics saved by save_fitted, so transform() can be used without a run."""
+        with open(filepath, 'r') as f:
+            data = yaml.safe_load(f)
+
+        self.fitted = transformers_from_dict(data['transformers'])
+        self.dropped_null_columns = data['dropped_null_columns']
+
+    def run(self, df: DataFrame) -> DataFrame:
+        """Fit every step to the DataFrame, apply it and return the cleaned result. The DataFrame passed in is not modified."""
+        return self._apply(df, refit=True)
+
+    def transform(self, df: DataFrame) -> DataFrame:
+        """Apply every step to the DataFrame with the statistics fitted by the last run, without refitting anything."""
+        if not self.fitted and not self.dropped_null_columns:
+            raise Exception("The pipeline has not been fitted. Call run() or load_fitted() before transform().")
+
+        return self._apply(df, refit=False)
+
+    def _apply(self, df: DataFrame, refit: bool) -> DataFrame:
+        """Apply every step to the DataFrame, refitting the statistics of each step if refit is True."""
+        columns, keep = self._apply_steps(df, refit)
+
+        # Build the cleaned DataFrame in a single pass, taking only the kept rows of each column
+        if keep is not None:
+            positions = np.flatnonzero(keep)
+            columns = {name: column.iloc[positions] for name, column in columns.items()}
+
+        return DataFrame(columns, copy=False)
+
+    def _apply_steps(self, df: DataFrame, refit: bool) -> (Dict[str, Series], np.ndarray):
+        """Apply every step to the columns of the DataFrame, and return the resulting columns and the mask of kept rows."""
+
+        self._refit = refit
+
+        # Work on references to the original columns - a column is only copied when a step changes it
+        columns = {name: df[name] for name in df.columns}
+
+        # Boolean mask of the rows which have not been dropped yet, or None while every row is kept
+        keep = None
+
+        for number, step in enumerate(self.steps):
+            self._step_number = number
+
+            # Each step is one span of the trace when a Tracer is active, holding the spans of the methods it calls
+            with span(f"CleaningPipeline step {number}: {step['step']}"):
+                keep = self._run_step(step, columns, keep)
+
+        return columns, keep
+
+    def _run_step(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        """Apply one step to the columns and return the mask of kept rows."""
+        return getattr(self, f"_{step['step']}")(step, columns, keep)
+
+    def _fitted_transformer(self, name: str, transformer: FittedTransformer, column: Series, keep: np.ndarray) -> FittedTransformer:
+        """Return the transformer of the current step for the column, fitting it to the kept rows first when refitting."""
+        key = f"{self._step_number}:{name}"
+
+        if self._refit:
+            self.fitted[key] = transformer.fit(_kept_rows(column, keep))
+
+        return self.fitted[key]
+
+    ########## ########## ##########
+    # Steps. Each one updates the dict of columns and returns the mask of kept rows.
+    ########## ########## #########
+
+    def _to_datetime(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            columns[name] = self.data_transform.object_to_date(columns[name], step['format'])
+        return keep
+
+    def _to_category(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            columns[name] = columns[name].astype('category')
+        return keep
+
+    def _to_Int64(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            column = columns[name].round() if step.get('round', False) else columns[name]
+            columns[name] = column.astype('Int64')
+        return keep
+
+    def _map(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        columns[step['column']] = self.data_transform.object_to_int(columns[step['column']], step['mapping'])
+        return keep
+
+    def _impute(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            imputer = self._fitted_transformer(name, NullImputer(step['strategy']), columns[name], keep)
+            columns[name] = imputer.transform(columns[name])
+        return keep
+
+    def _bin(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            # Same cutoffs and labels as DataTransform.int64_to_category_with_ranges
+            binner = self._fitted_transformer(name, RangeBinner(step.get('num_bins', 4)), columns[name], keep)
+            columns[name] = binner.transform(columns[name])
+        return keep
+
+    def _drop_columns(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            del columns[name]
+        return keep
+
+    def _drop_null_columns(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        if self._refit:
+            self.dropped_null_columns[self._step_number] = [name for name in columns if _kept_rows(columns[name].isna(), keep).mean() * 100 > step['threshold']]
+
+        for name in self.dropped_null_columns[self._step_number]:
+            del columns[name]
+        return keep
+
+    def _drop_null_rows(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        if keep is None:
+            keep = np.ones(len(next(iter(columns.values()))), dtype=bool)
+
+        # Rows are only marked as dropped here - they are removed from every column together at the end of the run
+        for name in step['columns']:
+            keep &= columns[name].notna().to_numpy()
+        return keep
+
+    def _box_cox(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            # As in DataFrameTransform.replace_column_after_box_cox, any nulls are replaced with the transformed mean
+            transformer = self._fitted_transformer(name, BoxCoxTransformer(), columns[name], keep)
+            columns[name] = transformer.transform(columns[name])
+        return keep
+
+    def _yeo_johnson(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            transformer = self._fitted_transformer(name, YeoJohnsonTransformer(), columns[name], keep)
+            columns[name] = transformer.transform(columns[name])
+        return keep
+
+    def _log(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            columns[name] = self.df_transform.log_transform(columns[name])
+        return keep
+
+    def _label_encode(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            # Same vocabulary and codes as DataFrameTransform.apply_label_encoder_to_df
+            encoder = self._fitted_transformer(name, LabelEncoderTransformer(), columns[name], keep)
+            columns[name] = encoder.transform(columns[name])
+        return keep
+
+
+def _kept_rows(column: Series, keep: np.ndarray) -> Series:
+    """Return the values of the column in the rows which have not been dropped."""
+    return column if keep is None else column[keep]
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pandas import Series
+from typing import Any, Callable, Dict
+
+
+class ColumnExecutor():
+    """Runs a function over a number of columns at once, so independent per-column work is spread across cores.
+
+    With 'thread', every worker reads the caller's columns directly. This suits numpy and scipy work, which releases the GIL
+    while it processes whole arrays. With 'process', the workers are forked from this process while the columns are held in
+    a module variable, so each worker reads them through the operating system's copy-on-write pages rather than a pickled copy.
+    Only the function and the column name are sent to a worker, and only its result is sent back. Where fork is not available,
+    the columns are pickled to the workers instead. 'serial' runs everything in this process, one column at a time.
+
+    Attributes:
+        kind (str): 'serial', 'thread' or 'process'.
+        max_workers (int): the number of threads or processes to use, which defaults to the number of cores.
+
+    Methods:
+        map:
+            Call a function on each column and return the results, keyed by column name.
+
+    """
+
+    KINDS = ['serial', 'thread', 'process']
+
+    def __init__(self, kind: str = 'serial', max_workers: int = None):
+        # Raise an error if the kind of executor is not recognised
+        if kind not in self.KINDS:
+            raise Exception(f"The parameter 'kind' accepts either 'serial', 'thread' or 'process'. You entered '{kind}'.")
+
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count()
+
+    def map(self, func: Callable[[Series], Any], columns: Dict[str, Series]) -> Dict[str, Any]:
+        """Call func on each column and return the results in a dict keyed by column name, in the same order as columns.
+
+        For the 'process' kind, func must be picklable, e.g. a module level function, or a partial of one.
+        """
+        workers = min(self.max_workers, len(columns))
+
+        if self.kind == 'serial' or workers <= 1:
+            return {name: func(column) for name, column in columns.items()}
+
+        if self.kind == 'thread':
+            with ThreadPoolExecutor(workers) as pool:
+                return dict(zip(columns, pool.map(func, columns.values())))
+
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            with ProcessPoolExecutor(workers) as pool:
+                return dict(zip(columns, pool.map(func, columns.values())))
+
+        global _shared_columns
+
+        # The workers are forked when the pool starts, so they inherit the columns held here without copying them
+        _shared_columns = columns
+        try:
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                return dict(zip(columns, pool.map(partial(_call_on_shared_column, func), columns)))
+        finally:
+            _shared_columns = {}
+
+
+# The columns being processed by a forked pool, which its workers read by name
+_shared_columns = {}
+
+
+def _call_on_shared_column(func: Callable[[Series], Any], name: str) -> Any:
+    """Call func on a column inherited from the parent process."""
+    return func(_shared_columns[name])
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+
+from pandas import DataFrame, Series
+from typing import List
+
+
+class CorrelationEngine():
+    """Calculates a correlation matrix for a mix of numeric and categorical columns, without label encoding them first.
+
+    Each pair of columns is measured in the way which suits their types:
+        numeric and numeric: Pearson's r, or Spearman's rho with method='spearman'.
+        categorical and categorical: Cramér's V, from the contingency table of their category codes.
+        numeric and categorical: the correlation ratio (eta), from the sums of the numeric column within each category.
+    Every measure is between -1 and 1 (0 and 1 for the last two), so they can be shown together in one heatmap.
+
+    Category columns are measured from their codes, and object or string columns are factorized, without changing the DataFrame.
+    The numeric block is calculated with matrix products of blocks of block_size columns, in float32 by default, so wide sets of
+    columns are fast and use half the memory. Nulls are skipped pair by pair, as DataFrame.corr() does. With sample_size set, only
+    a random sample of that many rows is used.
+
+    Attributes:
+        method (str): 'pearson' or 'spearman', for pairs of numeric columns.
+        sample_size (int): the number of rows to sample, or None to use every row.
+        block_size (int): the number of columns in each block of the matrix products.
+        dtype (type): the float type of the matrix products.
+        seed (int): the seed of the row sample.
+
+    Methods:
+        compute:
+            Return the correlation matrix of the columns of a DataFrame.
+
+    """
+
+    def __init__(self, method: str = 'pearson', sample_size: int = None, block_size: int = 256, dtype: type = np.float32, seed: int = 0):
+        # Raise an error if the correlation method is not recognised
+        if method not in ['pearson', 'spearman']:
+            raise Exception(f"The parameter 'method' accepts either 'pearson' or 'spearman'. You entered '{method}'.")
+
+        self.method = method
+        self.sample_size = sample_size
+        self.block_size = block_size
+        self.dtype = dtype
+        self.seed = seed
+
+    def compute(self, df: DataFrame, columns: List[str] = None) -> DataFrame:
+        """Return the correlation matrix of the columns (all of them by default), with the measure for each pair chosen by their types."""
+        columns = list(df.columns) if columns is None else list(columns)
+        data = df[columns]
+
+        if self.sample_size is not None and self.sample_size < len(data):
+            data = data.iloc[np.sort(np.random.default_rng(self.seed).choice(len(data), self.sample_size, replace=False))]
+
+        numeric = [name for name in columns if pd.api.types.is_numeric_dtype(data[name]) and not isinstance(data[name].dtype, pd.CategoricalDtype)]
+        categorical = [name for name in columns if name not in numeric]
+
+        matrix = DataFrame(np.nan, index=columns, columns=columns)
+
+        if numeric:
+            matrix.loc[numeric, numeric] = self._numeric_correlations(data[numeric])
+
+        codes = {name: _category_codes(data[name]) for name in categorical}
+
+        for i, name in enumerate(categorical):
+            matrix.loc[name, name] = 1.0
+
+            for other in categorical[i + 1:]:
+                matrix.loc[name, other] = matrix.loc[other, name] = _cramers_v(codes[name], codes[other])
+
+            for other in numeric:
+                matrix.loc[name, other] = matrix.loc[other, name] = _correlation_ratio(codes[name], data[other].to_numpy(dtype=float, na_value=np.nan))
+
+        return matrix
+
+    def _numeric_correlations(self, data: DataFrame) -> np.ndarray:
+        """Return Pearson's r (of the ranks, for Spearman) between every pair of numeric columns, skipping nulls pair by pair."""
+        if self.method == 'spearman':
+            data = data.rank()
+
+        values = data.to_numpy(dtype=float, na_value=np.nan)
+        present = ~np.isnan(values)
+
+        # Centring each column first keeps the sums small, so float32 loses little precision
+        values = np.where(present, values - np.nanmean(values, axis=0), 0).astype(self.dtype)
+        present = present.astype(self.dtype)
+
+        if present.all():
+            # Without nulls every pair uses every row, so one product of the centred values is enough
+            products = self._blocked_product(values, values)
+            std = np.sqrt(np.diag(products))
+            return products / np.outer(std, std)
+
+        # With nulls, each pair's count, sums and sums of squares only include the rows where both values are present
+        n = self._blocked_product(present, present)
+        sums = self._blocked_product(values, present)
+        squares = self._blocked_product(values ** 2, present)
+        products = self._blocked_product(values, values)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = n * products - sums * sums.T
+            variance = (n * squares - sums ** 2) * (n * squares - sums ** 2).T
+            return np.clip(covariance / np.sqrt(variance), -1, 1)
+
+    def _blocked_product(self, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        """Return left.T @ right, one block of columns at a time, as a float64 array."""
+        columns = left.shape[1]
+        result = np.empty((columns, columns))
+
+        for start in range(0, columns, self.block_size):
+            block = slice(start, start + self.block_size)
+            result[block] = left[:, block].T @ right
+
+        return result
+
+
+def _category_codes(column: Series) -> np.ndarray:
+    """Return the code of each row's category, or -1 for a null. Category columns already hold their codes."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy().astype(np.int64)
+
+    return pd.factorize(column)[0]
+
+
+def _cramers_v(codes_a: np.ndarray, codes_b: np.ndarray) -> float:
+    """Return Cramér's V between two categorical columns, from the contingency table of their codes."""
+    present = (codes_a >= 0) & (codes_b >= 0)
+    codes_a, codes_b = codes_a[present], codes_b[present]
+
+    if len(codes_a) == 0:
+        return np.nan
+
+    # Renumber the codes so categories without any rows do not add empty rows or columns to the table
+    codes_a, codes_b = np.unique(codes_a, return_inverse=True)[1], np.unique(codes_b, return_inverse=True)[1]
+    rows, columns = codes_a.max() + 1, codes_b.max() + 1
+
+    if min(rows, columns) == 1:
+        return np.nan
+
+    observed = np.bincount(codes_a * columns + codes_b, minlength=rows * columns).reshape(rows, columns).astype(float)
+    expected = np.outer(observed.sum(axis=1), observed.sum(axis=0)) / len(codes_a)
+    chi_squared = ((observed - expected) ** 2 / expected).sum()
+
+    return np.sqrt(chi_squared / len(codes_a) / (min(rows, columns) - 1))
+
+
+def _correlation_ratio(codes: np.ndarray, values: np.ndarray) -> float:
+    """Return the correlation ratio (eta) of a numeric column given a categorical one: the share of its spread explained by the categories."""
+    present = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[present], values[present]
+
+    if len(values) == 0:
+        return np.nan
+
+    counts = np.bincount(codes)
+    sums = np.bincount(codes, weights=values)
+    occupied = counts > 0
+
+    category_means = sums[occupied] / counts[occupied]
+    mean = values.mean()
+
+    between = (counts[occupied] * (category_means - mean) ** 2).sum()
+    total = ((values - mean) ** 2).sum()
+
+    return np.sqrt(between / total) if total > 0 else np.nan
@@ -1,26 +1,45 @@
-import math
 import numpy as np
 import pandas as pd 
+import sys
 
+from column_executor import ColumnExecutor
+from fitted_transformers import RangeBinner, TransformerStore
+from instrumentation import instrumented
 from pandas import DataFrame, Series
-from typing import List
+from typing import Any, Dict, List
 
 
-class DataTransform():
+@instrumented
+class DataTransform(TransformerStore):
     """A class to transform columns in the DataFrame. 
     
+    int64_to_category_with_ranges keeps the bin cutoffs it fits to each column, and reuses them when called with refit=False.
+    int64_columns_to_categories_with_ranges bins several columns at once, spread across cores by an executor of 'thread' or 'process'.
+    
+    The methods which change columns of a DataFrame, convert_object_columns_into_categories and convert_obj_columns_to_date, change the
+    DataFrame passed in and return it by default, as they always have, so only the converted columns take new memory. With inplace=False
+    they leave it as it is and return a new, independent DataFrame, which copies the other columns unless pandas' copy-on-write mode is
+    on, when it shares their memory until one of them is modified.
+    
     Attributes:
-        None
+        fitted_transformers (dict): the transformer last fitted to each column, keyed by column name.
+        executor (ColumnExecutor): runs the per-column work of int64_columns_to_categories_with_ranges.
     
     Methods:
         int64_to_category_with_ranges:
             Convert the Series given into a category type, and assign it's values to ranges.
+        int64_columns_to_categories_with_ranges:
+            Convert several columns into categories of value ranges at once.
         convert_float64_columns_into_Int64s:
             Convert the specified float64 columns in a DataFrame into int64.
         convert_object_columns_into_categories:
             Convert specified object columns in a DataFrame into category dtype.
         convert_obj_columns_to_date:
             Convert specified object columns in a DataFrame into datetime dtype.
+        downcast_dtypes:
+            Convert every column into the smallest dtype which holds its values, and report the memory saved.
+        object_to_date:
+            Convert object column to datetime, parsing each distinct value once.
         float64_to_int64:
             Convert float column to integer.
         object_to_int:
@@ -31,55 +50,97 @@ class DataTransform():
             Convert object column to category dtype.
         float_to_money_format:
             Convert a float to a string with commas to denote money.
+        save_fitted_transformers:
+            Save the fitted bin cutoffs to a yaml file.
+        load_fitted_transformers:
+            Load fitted bin cutoffs to reuse them with refit=False.
 
     """
-    def __init__(self):
+    def __init__(self, executor: str = 'serial', max_workers: int = None):
         print("Loaded DataTransform()...")  
+        self.executor = ColumnExecutor(executor, max_workers)
         
-    def int64_to_category_with_ranges(self, df: DataFrame, column: Series) -> Series:
-        """Convert the Series given into a category type, and assign it's values to ranges."""
-        # Make copy to restore 0 values later
-        orig_col = column.copy()  
-
-        # Replace 0's with NaN
-        rows_with_zero_index = df.loc[column == 0, column.name].index
-        df.loc[column == 0, column.name] = np.nan
-
-        # Calculate bin cutoffs for the non zero rows 
-        non_zeros = df[~df.index.isin(rows_with_zero_index)][column.name]
-        NUM_BINS = 4
-        bin_size = (non_zeros.max() - non_zeros.min()) / NUM_BINS    
-        bin_cutoffs = [int(non_zeros.max() - (bin_size * i)) for i in range(NUM_BINS, -1, -1)]
+    def int64_to_category_with_ranges(self, df: DataFrame, column: Series, refit: bool = True, inplace: bool = False) -> Series:
+        """Convert the Series given into a category type, and assign it's values to ranges. If refit is False, the bin cutoffs fitted to this column before are reused.
         
-        # Determine the labels for each category 
-        labels = [f"{math.floor(bin_cutoffs[i])}-{math.floor(bin_cutoffs[i+1])}" for i in range(NUM_BINS)]
-
-        # Split the entries into their ranges - this also converts the column to categorical 
-        column = pd.cut(column, bins=bin_cutoffs, labels=labels, include_lowest=True, right=False)
-
-        # Add 0 category and restore the original 0 values from the copy 
-        column = column.cat.add_categories("0")
-        column.loc[orig_col == 0] = "0"
+        The binned column is returned and df is not modified, unless inplace is True, when the binned column replaces the column in df instead.
+        """
+        # Calculate bin cutoffs for the non zero rows, split the entries into their ranges and give the 0's their own category 
+        binner = self._fit_or_reuse(column, RangeBinner(num_bins=4), refit)
+        binned = binner.transform(column)
+        
+        if inplace:
+            df[column.name] = binned
+            return None
 
-        return column
+        return binned
+        
+    def int64_columns_to_categories_with_ranges(self, df: DataFrame, column_names: List[str], refit: bool = True) -> DataFrame:
+        """Convert each of the columns into categories of value ranges, binning them at the same time with the executor.
+        
+        Unlike int64_to_category_with_ranges, the DataFrame is not modified.
+        """
+        binned = self._fit_transform_columns({name: df[name] for name in column_names}, RangeBinner(num_bins=4), refit)
+        return DataFrame(binned, index=df.index, copy=False)
         
     def convert_float64_columns_into_Int64s(self, columns: DataFrame) -> DataFrame:
         """Convert the specified float64 columns in a DataFrame into int64."""
         return columns.astype("Int64")
     
-    def convert_object_columns_into_categories(self, df: DataFrame, colnames: List[str]) -> DataFrame:
-        """Convert specified object columns in a DataFrame into category dtype."""
-        df[colnames] = df[colnames].astype("category")
-        return df
+    def convert_object_columns_into_categories(self, df: DataFrame, colnames: List[str], inplace: bool = True) -> DataFrame:
+        """Convert specified object columns in a DataFrame into category dtype, changing and returning df, or a new DataFrame if inplace is False."""
+        # Each column is converted on its own, as selecting them together with df[colnames] would copy them all first
+        return updated_frame(df, {name: df[name].astype("category") for name in colnames}, inplace=inplace)
+    
+    def convert_obj_columns_to_date(self, dataframe: DataFrame, column_names: List[str], current_format: str, inplace: bool = True) -> DataFrame:
+        """Convert specified object columns in a DataFrame into datetime dtype, changing and returning dataframe, or a new DataFrame if inplace is False."""
+        dates = {column_name: self.object_to_date(dataframe[column_name], current_format) for column_name in column_names}
+        return updated_frame(dataframe, dates, inplace=inplace)
+    
+    def downcast_dtypes(self, df: DataFrame, category_threshold: float = 0.05, float_rtol: float = 0, integral_floats_to_int: bool = True) -> (DataFrame, DataFrame):
+        """Return a copy of the DataFrame with every column in the smallest dtype which holds its values, and a report of the memory saved.
+        
+        Integers become int8, int16 or int32 when their range allows, and floats become float32 when every value survives the conversion 
+        at its column's precision: a column whose values have at most MAX_DECIMAL_PLACES decimal places, such as money in cents, must 
+        give back exactly the same values once float32 is rounded to those places, and any other column must round trip exactly, or 
+        within a relative tolerance of float_rtol if it is above 0. float32 holds about 7 significant digits, so money columns of 
+        $100,000 or more stay float64. Floats holding only whole numbers, such as counts with missing values, become the 
+        smallest integer dtype, using the nullable Int8/Int16/Int32 dtypes if they contain nulls. Object columns of strings become categories 
+        when the number of distinct values is no more than category_threshold times the number of rows, and the codes and categories 
+        would take less memory than the strings. Other columns are left as they are.
+        
+        The report has the dtype and memory usage in bytes of each column before and after, and the percentage of memory saved.
+        """
+        columns = {name: _downcast_column(df[name], category_threshold, float_rtol, integral_floats_to_int) for name in df.columns}
+        downcast = DataFrame(columns, index=df.index, copy=False)
+        
+        bytes_before = df.memory_usage(index=False, deep=True)
+        bytes_after = downcast.memory_usage(index=False, deep=True)
+        
+        report = DataFrame({
+            "dtype before": df.dtypes.astype(str),
+            "dtype after": downcast.dtypes.astype(str),
+            "bytes before": bytes_before,
+            "bytes after": bytes_after,
+            "% saved": round((1 - bytes_after / bytes_before) * 100, 2)
+        })
+        
+        return downcast, report
     
-    def convert_obj_columns_to_date(self, dataframe: DataFrame, column_names: List[str], current_format: str) -> DataFrame:
-        """Convert specified object columns in a DataFrame into datetime dtype."""
-        dataframe[column_names] = dataframe[column_names].apply(lambda x: pd.to_datetime(x, format=current_format))  
-        return dataframe   
+    def object_to_date(self, column: Series, current_format: str) -> Series:
+        """Convert object column to datetime dtype. 
+        
+        Formats such as '%b-%Y' only have a few hundred distinct values, so each distinct value is parsed once and looked up for every row.
+        """
+        codes, distinct_values = pd.factorize(column)
+        parsed = pd.to_datetime(distinct_values, format=current_format)
+        
+        # A code of -1 marks a null, which becomes NaT
+        return Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=column.index, name=column.name)
 
     def object_to_int(self, column: Series, mapping: dict) -> Series:
         """Convert object column to integer using mapping."""
-        return Series(column.apply(lambda x: mapping[x])).astype('int64') 
+        return _map_distinct_values_to_int(column, mapping)
     
     def float_to_money_format(self, value: float) -> str:
         """Convert a float to a string with commas to denote money."""
@@ -91,7 +152,7 @@ class DataTransform():
 
     def category_to_int(self, column: Series, mapping: dict) -> Series:
         """Convert category column to integer using mapping."""
-        return Series(column.apply(lambda x: mapping[x])).astype('int64')
+        return _map_distinct_values_to_int(column, mapping)
 
     def float64_to_int64(self, column: Series) -> Series:
         """Convert float column to integer."""
@@ -99,4 +160,172 @@ class DataTransform():
     
     def object_to_categorical(self, column: Series) -> Series:
         """Convert object column to category dtype."""
-        return column.astype("category")
\ No newline at end of file
+        return column.astype("category")
+
+
+def updated_frame(df: DataFrame, columns: Dict[str, Series] = None, dropped: List[str] = None, inplace: bool = False, share_memory: bool = False) -> DataFrame:
+    """Return the DataFrame with the columns replaced or added and the dropped columns removed.
+    
+    If inplace is False, df is left as it is, and a new DataFrame is returned which is independent of it, as df.drop's is: changing 
+    values in either, e.g. with df.loc[...] = ..., does not change the other. With pandas' copy-on-write mode on, the columns which were 
+    not replaced are shared rather than copied, as pandas copies a column only when one of the frames changes it. Otherwise they are 
+    copied, unless share_memory is True, when they are shared anyway, and changing values in one frame changes them in the other.
+    If inplace is True, df itself is changed, without copying its other columns, and returned.
+    """
+    columns = columns or {}
+    dropped = dropped or []
+    
+    missing = [name for name in dropped if name not in df.columns]
+    if missing:
+        raise Exception(f"The columns {missing} are not in the DataFrame, so cannot be dropped.")
+    
+    if inplace:
+        for name in dropped:
+            del df[name]
+        for name, column in columns.items():
+            df[name] = column
+        return df
+    
+    share_memory = share_memory or pd.get_option('mode.copy_on_write') is True
+    
+    kept = {name: columns[name] if name in columns else (df[name] if share_memory else df[name].copy()) for name in df.columns if name not in dropped}
+    added = {name: column for name, column in columns.items() if name not in kept}
+    
+    # With copy=False, each column keeps its own array rather than being copied into a block with the other columns of its dtype
+    return DataFrame({**kept, **added}, index=df.index, copy=False)
+
+
+# The integer dtypes to try, from smallest to largest
+_INT_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def _downcast_column(column: Series, category_threshold: float, float_rtol: float, integral_floats_to_int: bool) -> Series:
+    """Return the column in the smallest dtype which holds its values, or the column itself if none is smaller."""
+    dtype = column.dtype
+    
+    if pd.api.types.is_bool_dtype(dtype) or not (pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_object_dtype(dtype)):
+        return column
+    
+    if pd.api.types.is_object_dtype(dtype):
+        # Only strings are converted, as a category of mixed Python objects would not behave like the original column
+        if pd.api.types.infer_dtype(column, skipna=True) != 'string':
+            return column
+        
+        # Sorting the distinct values gives the same categories, in the same order, as column.astype('category')
+        codes, categories = pd.factorize(column, sort=True)
+        
+        if len(categories) > category_threshold * len(column):
+            return column
+        
+        # A category column holds a code per row, in the smallest integer dtype which counts the categories, and each category once,
+        # while an object column holds a pointer per row and a string for every row which is not null, as memory_usage(deep=True) counts
+        category_bytes = len(column) * np.min_scalar_type(-len(categories)).itemsize + categories.memory_usage(deep=True)
+        string_sizes = np.array([sys.getsizeof(value) for value in categories], dtype=np.int64)
+        object_bytes = column.memory_usage(index=False) + int(np.bincount(codes[codes >= 0], minlength=len(categories)) @ string_sizes)
+        
+        if category_bytes >= object_bytes:
+            return column
+        return Series(pd.Categorical.from_codes(codes, categories=categories), index=column.index, name=column.name)
+    
+    values = column.to_numpy(dtype=float, na_value=np.nan) if pd.api.types.is_float_dtype(dtype) else None
+    
+    if values is None:
+        # An integer column, either numpy's int64 or pandas' nullable Int64
+        return _to_smallest_int(column, column.min(), column.max(), nullable=not isinstance(dtype, np.dtype))
+    
+    not_null = values[~np.isnan(values)]
+    
+    if len(not_null) == 0:
+        return column
+    
+    if integral_floats_to_int and np.isfinite(not_null).all() and (not_null == np.round(not_null)).all():
+        return _to_smallest_int(column, not_null.min(), not_null.max(), nullable=len(not_null) < len(values) or not isinstance(dtype, np.dtype))
+    
+    if dtype.itemsize > 4:
+        # float32 keeps about 7 significant digits, so values are compared at the precision they were recorded with, e.g. cents
+        restored = not_null.astype(np.float32).astype(np.float64)
+        decimals = _decimal_places(not_null)
+        
+        if decimals is not None:
+            restored = np.round(restored, decimals)
+        
+        if np.allclose(restored, not_null, rtol=float_rtol, atol=0):
+            return column.astype(np.float32 if isinstance(dtype, np.dtype) else 'Float32')
+    
+    return column
+
+
+# The most decimal places a float column is treated as being recorded with by downcast_dtypes
+MAX_DECIMAL_PLACES = 6
+
+
+def _decimal_places(values: np.ndarray) -> int:
+    """Return the fewest decimal places which every value has, e.g. 2 for amounts in cents, or None if that is more than MAX_DECIMAL_PLACES."""
+    for decimals in range(MAX_DECIMAL_PLACES + 1):
+        if (np.round(values, decimals) == values).all():
+            return decimals
+    
+    return None
+
+
+def _to_smallest_int(column: Series, minimum: int, maximum: int, nullable: bool) -> Series:
+    """Convert the column into the smallest integer dtype which holds values from minimum to maximum."""
+    if pd.isna(minimum):
+        return column
+    
+    for int_dtype in _INT_DTYPES:
+        limits = np.iinfo(int_dtype)
+        if limits.min <= minimum and maximum <= limits.max:
+            break
+    else:
+        # Whole numbers too large for any integer dtype stay as floats
+        return column
+    
+    target = pd.api.types.pandas_dtype(int_dtype.__name__.capitalize()) if nullable else np.dtype(int_dtype)
+    
+    if target == column.dtype:
+        return column
+    
+    return column.astype(target)
+
+
+def _map_distinct_values_to_int(column: Series, mapping: dict) -> Series:
+    """Replace every value in the column with its integer in the mapping, looking up each distinct value only once.
+
+    Like indexing the mapping with each value, a value which is not in the mapping raises a KeyError. Nulls are looked up as the null 
+    they are, e.g. None or NaN, or else as any null key of the mapping, so {None: 0} also maps the NaN of a category column to 0.
+    """
+    # A category column already holds its distinct values and the code of each row, so only other columns need factorizing
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes, distinct_values = column.cat.codes.to_numpy(), column.cat.categories
+    else:
+        codes, distinct_values = pd.factorize(column)
+    
+    lookup = np.array([mapping[value] for value in distinct_values], dtype=np.int64)
+    mapped = lookup[codes]
+    null_rows = codes == -1
+    
+    if null_rows.any():
+        # factorize gives every kind of null the code -1, so each kind is looked up in the mapping separately
+        nulls = column.to_numpy(dtype=object)[null_rows]
+        null_lookup = {type(value): _null_mapping(value, mapping) for value in pd.unique(nulls)}
+        
+        if len(null_lookup) == 1:
+            mapped[null_rows] = next(iter(null_lookup.values()))
+        else:
+            mapped[null_rows] = [null_lookup[type(value)] for value in nulls]
+    
+    return Series(mapped, index=column.index, name=column.name)
+
+
+def _null_mapping(null: Any, mapping: dict) -> int:
+    """Return the integer the mapping gives a null value: its own entry, or else the entry of the mapping's null key."""
+    if null in mapping:
+        return mapping[null]
+    
+    null_keys = [key for key in mapping if not isinstance(key, (list, tuple)) and pd.isna(key)]
+    
+    if not null_keys:
+        raise KeyError(null)
+    
+    return mapping[null_keys[0]]
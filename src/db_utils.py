@@ -1,8 +1,37 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import numpy as np
+import os
 import pandas as pd
+import shutil
+import uuid
 import yaml 
 
-from sqlalchemy import Engine, create_engine
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import instrumented
+from lazy_imports import lazy_import
+from pandas import DataFrame
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Union
+
+if TYPE_CHECKING:
+    from sqlalchemy import Engine, Table
+    from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+# pyarrow and SQLAlchemy are only imported when the Parquet store or the database is first used
+pa = lazy_import('pyarrow')
+pc = lazy_import('pyarrow.compute')
+ds = lazy_import('pyarrow.dataset')
+pq = lazy_import('pyarrow.parquet')
+sqlalchemy = lazy_import('sqlalchemy')
+sqlalchemy_asyncio = lazy_import('sqlalchemy.ext.asyncio')
+
+# Number of rows fetched from the server-side cursor per chunk when streaming a table
+DEFAULT_CHUNKSIZE = 50_000
+
+# Where the extracted table is saved for each storage backend
+STORAGE_FILEPATHS = {'csv': 'loan_payments.csv', 'parquet': 'loan_payments.parquet'}
 
 def load_credentials() -> Any:
     """Extract credentials from the yaml file and return its contents as a dict"""
@@ -15,54 +44,495 @@ def load_credentials() -> Any:
         print("IOError: 'credentials.yaml' not found or could not be opened.")
         return None
     
-def save_to_csv(dataframe: pd.DataFrame, filepath: str) -> None:
-    """Save Pandas DataFrame to a CSV file."""
+def save_to_csv(dataframe: pd.DataFrame, filepath: str, append: bool = False) -> None:
+    """Save Pandas DataFrame to a CSV file. If append is True, the rows are added to the end of the file without repeating the header."""
+    
+    dataframe.to_csv(filepath, sep=',', mode='a' if append else 'w', header=not append)
+
+def save_to_parquet(dataframe: DataFrame, directory: str, partition_column: str = 'issue_date', date_format: str = '%b-%Y', append: bool = False) -> None:
+    """Save Pandas DataFrame to a Parquet dataset, with one partition per year of the partition_column, or unpartitioned if it is None.
+
+    The category, datetime and nullable Int64 dtypes are stored with the data, so they are restored by load_from_parquet without any parsing.
+
+    Args:
+        dataframe (DataFrame): the data to save
+        directory (str): folder holding the dataset, with one issue_year=YYYY sub-folder per partition
+        partition_column (str): datetime column, or string column in date_format, whose year decides the partition of each row, or None
+            for tables without a date, whose files are all saved directly in the directory
+        date_format (str): format of partition_column when it has not yet been converted to datetime
+        append (bool): add the rows to an existing dataset as new files, rather than replacing it
+    """
+    
+    if not append and os.path.exists(directory):
+        shutil.rmtree(directory)
+    
+    if partition_column is None:
+        os.makedirs(directory, exist_ok=True)
+        dataframe.to_parquet(os.path.join(directory, f"part-{uuid.uuid4().hex}-0.parquet"), engine='pyarrow')
+        return
+    
+    dates = dataframe[partition_column]
+    
+    # The raw extract stores dates as strings such as 'Jan-2021', which are parsed only to find the year
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format=date_format, errors='coerce')
+    
+    # A unique file name per call stops appended chunks from overwriting the files already in a partition
+    dataframe.assign(issue_year=dates.dt.year.astype('Int64')).to_parquet(
+        directory, engine='pyarrow', partition_cols=['issue_year'], basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet"
+    )
+
+def load_from_parquet(directory: str, columns: List[str] = None, filters: List[tuple] = None, years: List[int] = None) -> DataFrame:
+    """Load a Parquet dataset written by save_to_parquet, reading only the columns, rows and years which are asked for.
+
+    Args:
+        directory (str): folder holding the dataset
+        columns (List[str]): columns to read, or None for every column
+        filters (List[tuple]): row predicates such as [('loan_status', '==', 'Default')], which skip the files and row groups that cannot match
+        years (List[int]): issue_date years to read, or None for every year. Other years' partitions are never opened
+
+    Returns:
+        df (DataFrame): the selected data, with the dtypes it was saved with
+    """
+    
+    filters = list(filters or [])
+    
+    if years is not None:
+        filters.append(('issue_year', 'in', list(years)))
+    
+    # Declaring the partition's type stops pyarrow reading issue_year back as a dictionary, which cannot be restored as Int64
+    partitioning = ds.partitioning(pa.schema([('issue_year', pa.int64())]), flavor='hive')
+    
+    df = pd.read_parquet(directory, engine='pyarrow', columns=columns, filters=filters or None, partitioning=partitioning)
+    
+    # issue_year only exists to partition the files, so it is dropped unless it was asked for
+    if 'issue_year' in df.columns and (columns is None or 'issue_year' not in columns):
+        df = df.drop('issue_year', axis=1)
+        
+    return df
+
+def remove_rows_from_csv(filepath: str, ids: Iterable[Any], chunksize: int = DEFAULT_CHUNKSIZE) -> None:
+    """Remove the rows with the given ids from a CSV file indexed by id, streaming it through chunksize rows at a time.
+
+    The rows which are kept are read and written back as text, so they are saved exactly as they were.
+    """
+    
+    ids = {str(row_id) for row_id in ids}
+    temporary_filepath = f"{filepath}.tmp"
+    
+    # id is read as a column, as pandas would parse it as a number when it is the index
+    chunks = pd.read_csv(filepath, dtype=str, keep_default_na=False, chunksize=chunksize)
+    
+    for number, chunk in enumerate(chunks):
+        save_to_csv(chunk[~chunk['id'].isin(ids)].set_index('id'), temporary_filepath, append=number > 0)
+        
+    os.replace(temporary_filepath, filepath)
+
+def remove_rows_from_parquet(directory: str, ids: Iterable[Any]) -> None:
+    """Remove the rows with the given ids from a Parquet dataset written by save_to_parquet, rewriting only the files which hold them.
+
+    The id column of every file is read to find them, while the other columns are only read from the files which are rewritten.
+    """
+    
+    ids = pa.array(list(ids), type=pa.int64())
+    
+    for path in ds.dataset(directory, format='parquet').files:
+        if not pc.any(pc.is_in(pq.read_table(path, columns=['id'])['id'].cast(pa.int64()), value_set=ids)).as_py():
+            continue
+        
+        # The file is read and written without the dataset's partitioning, so its issue_year stays in the directory name
+        table = pq.read_table(path)
+        pq.write_table(table.filter(pc.invert(pc.is_in(table['id'].cast(pa.int64()), value_set=ids))), path)
+
+def column_dtypes(columns: Iterable[Any]) -> (dict, list):
+    """Return a dict mapping column names to pandas dtypes, and a list of the date columns, based on the SQL type of each column.
+
+    The columns can be those of a reflected Table, or the selected_columns of a query built with sqlalchemy.select.
+    """
+    
+    dtypes = {}
+    date_columns = []
+    
+    for column in columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            # Leave columns with custom SQL types for pandas to infer
+            continue
+        
+        # Nullable types are used so that a chunk with missing values has the same dtype as one without
+        if python_type is bool:
+            dtypes[column.name] = 'boolean'
+        elif python_type is int:
+            dtypes[column.name] = 'Int64'
+        elif python_type.__name__ in ['float', 'Decimal']:
+            dtypes[column.name] = 'float64'
+        elif python_type.__name__ in ['date', 'datetime']:
+            date_columns.append(column.name)
+        else:
+            dtypes[column.name] = 'object'
+            
+    return dtypes, date_columns
+
+def watermark_value(value: Any, column: Any) -> Any:
+    """Convert a watermark into a plain Python value of the column's type, which yaml can save and the database compares like the column.
+
+    A Timestamp becomes a date for a DATE column and a datetime for a TIMESTAMP column, and numpy scalars become ints or floats.
+    """
+    
+    if isinstance(value, datetime.datetime) and column.type.python_type is datetime.date:
+        return value.date()
+    
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    
+    if hasattr(value, 'item'):
+        return value.item()
     
-    dataframe.to_csv(filepath, sep=',')
+    return value
 
+def load_watermark(filepath: str) -> Any:
+    """Extract the high-water mark saved by the last incremental sync from the yaml file, or return None if there is no previous sync."""
+    
+    try:
+        with open(filepath, 'r') as f:
+            return yaml.safe_load(f)
+    except IOError:
+        return None
+
+def save_watermark(watermark: dict, filepath: str) -> None:
+    """Save the high-water mark of an incremental sync to a yaml file."""
+    
+    with open(filepath, 'w') as f:
+        yaml.safe_dump(watermark, f)
+
+def save_chunks_to_csv(chunks: Iterator[DataFrame], filepath: str) -> int:
+    """Write each DataFrame chunk to a CSV file as it arrives, and return the total number of rows written."""
+    
+    rows_written = 0
+    
+    for chunk in chunks:
+        # The first chunk creates the file and writes the header, every chunk after it is appended
+        save_to_csv(chunk, filepath, append=rows_written > 0)
+        rows_written += len(chunk)
+        
+    return rows_written
+
+def save_chunks_to_parquet(chunks: Iterator[DataFrame], directory: str) -> int:
+    """Write each DataFrame chunk to a Parquet dataset as it arrives, and return the total number of rows written."""
+    
+    rows_written = 0
+    
+    for chunk in chunks:
+        # The first chunk replaces any existing dataset, every chunk after it adds new files
+        save_to_parquet(chunk, directory, append=rows_written > 0)
+        rows_written += len(chunk)
+        
+    return rows_written
+
+@instrumented
 class RDSDatabaseConnector():
-    """Connects to an RDS database, extracts data as a DataFrame and saves to CSV.
+    """Connects to an RDS database, extracts data as a DataFrame and saves to CSV or Parquet.
 
     Attributes:
         None
     
     Methods:
-        __init__(credentials):
-            Initializes the RDS engine, extracts data as DF and saves to CSV.
+        __init__(credentials, chunksize, num_workers, pool_size, incremental, watermark_column, storage):
+            Initializes the RDS engine, extracts data as DF and saves to CSV or Parquet.
         extract_sql_as_df(engine):
             Uses engine to get SQL data from table as a pandas DataFrame.
+        stream_table_as_dataframes(engine, table_name, chunksize):
+            Uses a server-side cursor to yield the table as typed DataFrame chunks.
+        extract_table_in_parallel(engine, table_name, key, num_workers):
+            Reads key ranges of the table concurrently over pooled connections and merges them in key order.
+        get_key_ranges(engine, table, key, num_partitions):
+            Splits the span of an integer key column into contiguous ranges.
+        read_key_range(engine, table, key, key_range):
+            Reads the rows whose key falls in one range.
+        sync_table_incrementally(engine, filepath, watermark_path, table_name, watermark_column, storage):
+            Fetches only the rows at or past the saved high-water mark, and new rows without one, and upserts them into the local copy.
+        extract_rows_since_watermark(engine, table, watermark_column, watermark, last_id):
+            Reads the rows whose watermark column has reached the high-water mark.
+        get_column_dtypes(table):
+            Maps the SQL type of each column to the pandas dtype used for every chunk.
         init_SQL_alchemy_engine(credentials):
             Creates SQLAlchemy engine using credentials dict.
 
     """
     
-    def __init__(self, credentials: dict):
-        """Initializes the RDS engine, extracts data as DF and saves to CSV"""
-        # Get an engine to connect to the SQL database
-        engine = self.init_SQL_alchemy_engine(credentials)
+    def __init__(self, credentials: dict, chunksize: int = None, num_workers: int = None, pool_size: int = None, incremental: bool = False, 
+                 watermark_column: str = 'id', storage: str = 'csv'):
+        """Initializes the RDS engine, extracts data as DF and saves to CSV or Parquet. 
+        
+        If chunksize is given, the table is streamed and saved one chunk at a time, so peak memory is bounded by the chunk size rather than the table size.
+        If num_workers is given, the table is split into id ranges which are read concurrently over a pool of pool_size connections (defaults to num_workers).
+        If incremental is True, only rows added since the last run are fetched and upserted into the existing local copy. With the default
+        watermark_column of 'id' that is only new loans. To also fetch loans which changed, use a column which every update moves forward, e.g.
+        last_payment_date, which must then be a DATE or TIMESTAMP column in the database: the raw extract's '%b-%Y' text dates are rejected.
+        The storage is either 'csv' (loan_payments.csv) or 'parquet' (the loan_payments.parquet dataset, partitioned by issue_date year).
+        """
+        if [chunksize is not None, num_workers is not None, incremental].count(True) > 1:
+            raise Exception("RDSDatabaseConnector accepts only one of chunksize, num_workers or incremental.")
+        
+        if storage not in STORAGE_FILEPATHS:
+            raise Exception(f"The parameter 'storage' accepts either 'csv' or 'parquet'. You entered '{storage}'.")
+        
+        filepath = STORAGE_FILEPATHS[storage]
         
-        # Use the engine to extract data and convert it into a DataFrame
-        dataframe = self.extract_table_as_dataframe(engine)
+        # Get an engine to connect to the SQL database, with enough pooled connections for every worker
+        engine = self.init_SQL_alchemy_engine(credentials, pool_size=pool_size or num_workers or 5)
         
-        # Save the DataFrame into a csv file
-        save_to_csv(dataframe, "loan_payments.csv")
+        if incremental:
+            # Fetch the delta since the saved watermark and merge it into the local copy
+            self.sync_table_incrementally(engine, filepath=filepath, watermark_column=watermark_column, storage=storage)
+        elif chunksize is not None:
+            # Save each chunk as soon as it is fetched
+            chunks = self.stream_table_as_dataframes(engine, chunksize=chunksize)
+            
+            if storage == 'csv':
+                save_chunks_to_csv(chunks, filepath)
+            else:
+                save_chunks_to_parquet(chunks, filepath)
+        else:
+            # Use the engine to extract data and convert it into a DataFrame
+            if num_workers is None:
+                dataframe = self.extract_table_as_dataframe(engine)
+            else:
+                dataframe = self.extract_table_in_parallel(engine, num_workers=num_workers)
+            
+            # Save the DataFrame into a csv file or parquet dataset
+            if storage == 'csv':
+                save_to_csv(dataframe, filepath)
+            else:
+                save_to_parquet(dataframe, filepath)
             
     def extract_table_as_dataframe(self, engine: Engine):
         """Extract SQL data and return it as a Pandas DataFrame."""
         
         df = pd.read_sql_table('loan_payments', engine).set_index('id')
         return df
+    
+    def stream_table_as_dataframes(self, engine: Engine, table_name: str = 'loan_payments', chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[DataFrame]:
+        """Yield the table as DataFrames of at most chunksize rows, read through a server-side cursor.
+
+        Args:
+            engine (Engine): object to allow interaction with the database
+            table_name (str): name of the table to extract
+            chunksize (int): number of rows fetched from the cursor and held in memory at once
+
+        Yields:
+            chunk (DataFrame): the next chunksize rows, indexed by id, with the same dtypes as every other chunk
+        """
+        
+        # Reflect the table so each chunk is given dtypes from the schema, rather than inferred from the rows it happens to contain
+        table = sqlalchemy.Table(table_name, sqlalchemy.MetaData(), autoload_with=engine)
+        dtypes, date_columns = self.get_column_dtypes(table)
+        
+        # stream_results asks the driver for a server-side cursor, so rows are fetched as they are consumed instead of all at once
+        with engine.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as connection:
+            chunks = pd.read_sql_query(sqlalchemy.select(table), connection, chunksize=chunksize, dtype=dtypes, parse_dates=date_columns)
+            
+            for chunk in chunks:
+                yield chunk.set_index('id')
+    
+    def extract_table_in_parallel(self, engine: Engine, table_name: str = 'loan_payments', key: str = 'id', num_workers: int = 4) -> DataFrame:
+        """Read the table as num_workers key ranges over concurrent connections, and return the merged DataFrame.
+
+        Args:
+            engine (Engine): object to allow interaction with the database, whose pool should hold at least num_workers connections
+            table_name (str): name of the table to extract
+            key (str): integer column used to split the table, e.g. 'id' or 'member_id'
+            num_workers (int): number of ranges read at the same time
+
+        Returns:
+            df (DataFrame): every row of the table indexed by id, in ascending order of key
+        """
+        
+        table = sqlalchemy.Table(table_name, sqlalchemy.MetaData(), autoload_with=engine)
+        
+        if key not in table.columns or table.columns[key].type.python_type is not int:
+            raise Exception(f"The key '{key}' must be an integer column of {table_name}.")
+        
+        key_ranges = self.get_key_ranges(engine, table, key, num_workers)
+        
+        # Rows with a NULL key fall outside every range, so they are read as an extra partition at the end
+        if table.columns[key].nullable:
+            key_ranges.append(None)
+        
+        # Each worker checks out its own connection from the pool; map returns the partitions in the order of key_ranges
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            partitions = list(executor.map(lambda key_range: self.read_key_range(engine, table, key, key_range), key_ranges))
+        
+        return pd.concat(partitions).set_index('id')
+    
+    def get_key_ranges(self, engine: Engine, table: Table, key: str, num_partitions: int) -> List[tuple]:
+        """Return up to num_partitions contiguous (start, end) ranges which together cover every value of the key column, with start inclusive and end exclusive."""
+        
+        with engine.connect() as connection:
+            min_key, max_key = connection.execute(sqlalchemy.select(sqlalchemy.func.min(table.c[key]), sqlalchemy.func.max(table.c[key]))).one()
+        
+        # An empty table has no ranges to read
+        if min_key is None:
+            return []
+        
+        # Evenly spaced cutoffs, with duplicates removed for tables with fewer keys than partitions
+        cutoffs = np.unique(np.linspace(min_key, max_key + 1, num_partitions + 1).astype(np.int64))
+        
+        return [(int(cutoffs[i]), int(cutoffs[i + 1])) for i in range(len(cutoffs) - 1)]
+    
+    def read_key_range(self, engine: Engine, table: Table, key: str, key_range: tuple) -> DataFrame:
+        """Return the rows whose key is in the (start, end) key_range, ordered by key. A key_range of None reads the rows whose key is NULL."""
+        
+        dtypes, date_columns = self.get_column_dtypes(table)
+        
+        if key_range is None:
+            query = sqlalchemy.select(table).where(table.c[key].is_(None))
+        else:
+            start, end = key_range
+            query = sqlalchemy.select(table).where(table.c[key] >= start, table.c[key] < end).order_by(table.c[key])
+        
+        with engine.connect() as connection:
+            return pd.read_sql_query(query, connection, dtype=dtypes, parse_dates=date_columns)
+    
+    def sync_table_incrementally(self, engine: Engine, filepath: str = 'loan_payments.csv', watermark_path: str = 'watermark.yaml', 
+                                 table_name: str = 'loan_payments', watermark_column: str = 'id', storage: str = 'csv') -> int:
+        """Upsert the rows which are new or changed since the last sync into the local copy, and save the new high-water mark.
+
+        The first sync, or one whose saved watermark is for a different table or column or has no local copy, downloads the whole table.
+        After that, rows whose id is above the highest id synced before are new, and are appended to the local copy without reading it,
+        as rows of the CSV file or new files of the Parquet dataset. Rows with lower ids have changed, so their old versions are removed
+        first: the CSV file is streamed through once, while only the Parquet files holding those ids are rewritten.
+
+        A date watermark fetches the rows on the boundary date again, as rows may have changed to it after the last sync. Nothing is 
+        saved unless some row is beyond the boundary, so a sync in which nothing changed writes nothing, and rows which changed to the 
+        boundary date are saved by the next sync which finds newer rows. Rows whose watermark column is NULL, e.g. loans without a 
+        last_payment_date yet, are fetched when they are new, as they can never reach the watermark.
+
+        Args:
+            engine (Engine): object to allow interaction with the database
+            filepath (str): the local copy of the table, indexed by id
+            storage (str): 'csv' if filepath is a CSV file, or 'parquet' if it is a dataset written by save_to_parquet
+            watermark_path (str): yaml file holding the high-water mark and the highest id synced between runs
+            table_name (str): name of the table to sync
+            watermark_column (str): an integer, date or timestamp column which increases when a row is added or changed, e.g. 'id' or 'last_payment_date'
 
-    def init_SQL_alchemy_engine(self, credentials: dict) -> Engine:
+        Returns:
+            rows_fetched (int): the number of rows transferred from the database
+        """
+        
+        table = sqlalchemy.Table(table_name, sqlalchemy.MetaData(), autoload_with=engine)
+        column = table.columns[watermark_column]
+        
+        # Text columns compare alphabetically in SQL (e.g. 'Jan-2022' < 'Mar-2021'), so they cannot be used as a watermark
+        if column.type.python_type is str:
+            raise Exception(f"The watermark column '{watermark_column}' must be an integer, date or timestamp column, not text.")
+        
+        previous = load_watermark(watermark_path)
+        
+        if previous is None or previous['table'] != table_name or previous['column'] != watermark_column or not os.path.exists(filepath):
+            # There is no usable watermark, so start from a full copy of the table
+            delta = self.extract_rows_since_watermark(engine, table, watermark_column, None)
+            
+            if storage == 'csv':
+                save_to_csv(delta.set_index('id'), filepath)
+            else:
+                save_to_parquet(delta.set_index('id'), filepath)
+                
+            self._save_sync_watermark(delta, table, watermark_column, None, watermark_path)
+            return len(delta)
+        
+        value, last_id = previous['value'], previous.get('last_id')
+        delta = self.extract_rows_since_watermark(engine, table, watermark_column, value, last_id)
+        
+        # Rows on the boundary were saved by the last sync, so the local copy is only changed if some row is past it
+        values = delta[watermark_column]
+        boundary = pd.Timestamp(value) if pd.api.types.is_datetime64_any_dtype(values) and value is not None else value
+        beyond = values.notna() if boundary is None else (values > boundary).fillna(False)
+        is_new = delta['id'] > last_id if last_id is not None else pd.Series(False, index=delta.index)
+        
+        if not (beyond | is_new).any():
+            return len(delta)
+        
+        # Remove the old versions of the rows which changed, then add every row of the delta to the end of the local copy
+        changed_ids = delta.loc[~is_new, 'id'].tolist()
+        
+        if storage == 'csv':
+            if changed_ids:
+                remove_rows_from_csv(filepath, changed_ids)
+            save_to_csv(delta.set_index('id'), filepath, append=True)
+        else:
+            if changed_ids:
+                remove_rows_from_parquet(filepath, changed_ids)
+            save_to_parquet(delta.set_index('id'), filepath, append=True)
+        
+        self._save_sync_watermark(delta, table, watermark_column, previous, watermark_path)
+        return len(delta)
+    
+    def extract_rows_since_watermark(self, engine: Engine, table: Table, watermark_column: str, watermark: Any, last_id: int = None) -> DataFrame:
+        """Return the rows of the table which have reached the watermark, or every row if the watermark and last_id are None.
+        
+        Rows equal to the watermark are fetched again when it is not the id, since other rows may have changed to the same value (e.g. the same last_payment_date) after the previous sync.
+        Rows whose watermark column is NULL are fetched if their id is above last_id, the highest id synced before, and every row with a 
+        value is fetched if the watermark is None but last_id is not, i.e. no row had a value at the previous sync.
+        """
+        
+        dtypes, date_columns = self.get_column_dtypes(table)
+        column = table.c[watermark_column]
+        
+        if watermark is None and last_id is None:
+            query = sqlalchemy.select(table)
+        elif watermark_column == 'id':
+            query = sqlalchemy.select(table).where(column > sqlalchemy.literal(watermark_value(watermark, column), column.type))
+        else:
+            # Binding the watermark with the column's type makes it compare as the column's values do, e.g. as a date rather than a timestamp
+            reached = column.isnot(None) if watermark is None else column >= sqlalchemy.literal(watermark_value(watermark, column), column.type)
+            
+            # NULL never compares as reaching the watermark, so new rows without a value are asked for by their id
+            if last_id is not None:
+                reached = sqlalchemy.or_(reached, sqlalchemy.and_(column.is_(None), table.c['id'] > last_id))
+                
+            query = sqlalchemy.select(table).where(reached)
+        
+        with engine.connect() as connection:
+            return pd.read_sql_query(query, connection, dtype=dtypes, parse_dates=date_columns)
+    
+    def _save_sync_watermark(self, delta: DataFrame, table: Table, watermark_column: str, previous: dict, watermark_path: str) -> None:
+        """Save the highest watermark and id of the rows synced so far, keeping the previous ones if the delta has no higher value."""
+        
+        value = previous['value'] if previous is not None else None
+        last_id = previous.get('last_id') if previous is not None else None
+        
+        # NULLs are skipped by max, and leave the watermark where it was
+        if delta[watermark_column].notna().any():
+            delta_value = watermark_value(delta[watermark_column].max(), table.columns[watermark_column])
+            value = delta_value if value is None else max(value, delta_value)
+            
+        if len(delta) > 0:
+            delta_id = int(delta['id'].max())
+            last_id = delta_id if last_id is None else max(last_id, delta_id)
+        
+        save_watermark({'table': str(table.name), 'column': watermark_column, 'value': value, 'last_id': last_id}, watermark_path)
+    
+    def get_column_dtypes(self, table: Table) -> (dict, list):
+        """Return a dict mapping column names to pandas dtypes, and a list of the date columns, based on the SQL type of each column."""
+        
+        return column_dtypes(table.columns)
+
+    def init_SQL_alchemy_engine(self, credentials: dict, pool_size: int = 5) -> Engine:
         """Use credentials to initialise an SQLAlchemy engine. 
 
         Args:
-            credentials (dict): credentials to connect to an SQLAlchemy database
+            credentials (dict): credentials to connect to an SQLAlchemy database. An 'RDS_URL' entry is used as the connection url as-is, e.g. to point at a local Postgres or SQLite copy
+            pool_size (int): number of connections kept open in the engine's pool
 
         Returns:
             engine (Engine): object to allow interaction with the database
         """
         
+        if 'RDS_URL' in credentials:
+            return sqlalchemy.create_engine(credentials['RDS_URL'], pool_size=pool_size)
+        
         # Extract each credential field from the dictionary and format into a connection_url
         HOST = credentials['RDS_HOST']
         PASSWORD = credentials['RDS_PASSWORD']
@@ -71,14 +541,233 @@ class RDSDatabaseConnector():
         PORT = credentials['RDS_PORT']
 
         connection_url = f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
-        engine = create_engine(connection_url)
+        engine = sqlalchemy.create_engine(connection_url, pool_size=pool_size)
         
         return engine 
     
+class AsyncRDSLoader():
+    """Loads several tables or queries from the database at the same time with SQLAlchemy's asyncio engine, streaming each one into the local store.
+
+    Related tables, such as payment histories or customer details, can be extracted alongside loan_payments, and one slow table no longer
+    holds up the others. Each source is read through a server-side cursor, and each chunk of rows is saved to the source's own file as it
+    arrives, so memory is bounded by chunksize per source rather than by the size of the tables. The files are written in a thread, so the
+    event loop carries on fetching the other sources meanwhile.
+
+    At most max_connections sources are read at once, over a pool of as many connections. A source whose connection or next chunk takes
+    longer than timeout, or whose connection fails, is read again from the start after an exponential backoff, rewriting its file, up to
+    retries times. The other sources are still saved when one fails, and the failures are raised together at the end.
+
+    The connection url must use an async driver: postgresql+asyncpg:// is built from the RDS_ credentials, and an 'RDS_URL' entry is used
+    as-is, e.g. sqlite+aiosqlite:///loans.db to test against a local copy.
+
+    Attributes:
+        credentials (dict): credentials to connect to the database.
+        max_connections (int): number of sources read at the same time, and size of the connection pool.
+        timeout (float): seconds to wait for a connection, the query to start, or the next chunk of rows, before an attempt fails.
+        retries (int): number of times a failed source is read again.
+        retry_delay (float): seconds to wait before the first retry, doubled before each one after it.
+        chunksize (int): number of rows fetched from the cursor and saved at once.
+        storage (str): 'csv' to save each source as <name>.csv, or 'parquet' as the <name>.parquet dataset.
+        directory (str): folder the files are saved in.
+
+    Methods:
+        load(sources):
+            Loads every source concurrently and returns the number of rows saved for each.
+        load_async(sources):
+            The coroutine run by load, for code which is already inside an event loop.
+        load_source(engine, name, source, semaphore):
+            Streams one source into its file, retrying it when it fails.
+        stream_source(engine, source, filepath):
+            Makes one attempt at streaming a source into its file.
+        get_filepath(name):
+            Returns where a source is saved.
+        init_async_engine(credentials, pool_size, timeout):
+            Creates an SQLAlchemy async engine using credentials dict.
+
+    """
+    
+    def __init__(self, credentials: dict, max_connections: int = 5, timeout: float = 60, retries: int = 3, retry_delay: float = 1.0, 
+                 chunksize: int = DEFAULT_CHUNKSIZE, storage: str = 'csv', directory: str = '.'):
+        if storage not in STORAGE_FILEPATHS:
+            raise Exception(f"The parameter 'storage' accepts either 'csv' or 'parquet'. You entered '{storage}'.")
+        
+        self.credentials = credentials
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.chunksize = chunksize
+        self.storage = storage
+        self.directory = directory
+        
+    def load(self, sources: Union[Dict[str, Any], List[str]]) -> Dict[str, int]:
+        """Load every source concurrently into the local store, and return the number of rows saved for each.
+
+        Args:
+            sources (Dict[str, Any]): the sources keyed by the name they are saved under. A source is the name of a table, or a query built
+                with sqlalchemy.select or sqlalchemy.text, e.g. {'loan_payments': 'loan_payments', 'defaults': select(table).where(...)}.
+                A list of table names saves each table under its own name
+
+        Returns:
+            rows_saved (Dict[str, int]): the number of rows saved for each source, in the order of sources
+        """
+        
+        return asyncio.run(self.load_async(sources))
+    
+    async def load_async(self, sources: Union[Dict[str, Any], List[str]]) -> Dict[str, int]:
+        """Load every source concurrently, as load does, from inside a running event loop."""
+        
+        if not isinstance(sources, dict):
+            sources = {table_name: table_name for table_name in sources}
+        
+        engine = self.init_async_engine(self.credentials, pool_size=self.max_connections, timeout=self.timeout)
+        
+        # Sources beyond max_connections wait here for a free slot, rather than timing out while waiting for the pool
+        semaphore = asyncio.Semaphore(self.max_connections)
+        
+        try:
+            results = await asyncio.gather(*(self.load_source(engine, name, source, semaphore) for name, source in sources.items()), return_exceptions=True)
+        finally:
+            await engine.dispose()
+        
+        failures = [f"'{name}': {result}" for name, result in zip(sources, results) if isinstance(result, BaseException)]
+        
+        if failures:
+            raise Exception(f"{len(failures)} of {len(sources)} sources could not be loaded. " + "; ".join(failures))
+        
+        return dict(zip(sources, results))
+    
+    async def load_source(self, engine: AsyncEngine, name: str, source: Any, semaphore: asyncio.Semaphore) -> int:
+        """Stream the source into the file for name, retrying it after a timeout or a database error, and return the number of rows saved."""
+        
+        filepath = self.get_filepath(name)
+        
+        # Timeouts, dropped connections and errors raised by the database or its driver are worth another attempt
+        retryable_errors = (asyncio.TimeoutError, OSError, sqlalchemy.exc.OperationalError, sqlalchemy.exc.InterfaceError, sqlalchemy.exc.TimeoutError)
+        
+        for attempt in range(self.retries + 1):
+            try:
+                async with semaphore:
+                    return await self.stream_source(engine, source, filepath)
+            except retryable_errors as error:
+                if attempt == self.retries:
+                    raise Exception(f"failed after {attempt + 1} attempts, with {type(error).__name__}: {error or f'no response within {self.timeout} seconds'}") from error
+            except Exception as error:
+                # Anything else, such as a table which does not exist, would fail again
+                raise Exception(f"failed with {type(error).__name__}: {error}") from error
+            
+            # The slot is given up while waiting, so another source can use the connection
+            await asyncio.sleep(self.retry_delay * 2 ** attempt)
+    
+    async def stream_source(self, engine: AsyncEngine, source: Any, filepath: str) -> int:
+        """Read the source through a server-side cursor, save each chunk to filepath as it arrives, and return the number of rows saved.
+
+        The first chunk replaces anything already at filepath, so a failed attempt's rows are overwritten by the next one. Chunks are indexed
+        by id when the source has an id column, as RDSDatabaseConnector saves loan_payments, and by row number otherwise.
+        """
+        
+        connection = await asyncio.wait_for(engine.connect().start(), self.timeout)
+        
+        try:
+            query, dtypes, date_columns = await self._get_typed_query(connection, source)
+            
+            result = await asyncio.wait_for(connection.stream(query, execution_options={'max_row_buffer': self.chunksize}), self.timeout)
+            columns = list(result.keys())
+            partitions = result.partitions(self.chunksize)
+            rows_saved = 0
+            
+            while True:
+                try:
+                    rows = await asyncio.wait_for(partitions.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    break
+                
+                chunk = self._to_typed_chunk(rows, columns, dtypes, date_columns, start=rows_saved)
+                await asyncio.to_thread(self._save_chunk, chunk, filepath, append=rows_saved > 0)
+                rows_saved += len(chunk)
+            
+            # An empty CSV still gets its header, so the file exists for every source which was loaded
+            if rows_saved == 0 and self.storage == 'csv':
+                chunk = self._to_typed_chunk([], columns, dtypes, date_columns, start=0)
+                await asyncio.to_thread(self._save_chunk, chunk, filepath, append=False)
+            
+            return rows_saved
+        finally:
+            await connection.close()
+    
+    def get_filepath(self, name: str) -> str:
+        """Return where the source saved under name is stored: <name>.csv or the <name>.parquet dataset in the directory."""
+        
+        return os.path.join(self.directory, f"{name}.{self.storage}")
+    
+    async def _get_typed_query(self, connection: AsyncConnection, source: Any) -> (Any, dict, list):
+        """Return the query for the source, with the pandas dtypes and date columns of its result.
+
+        A table is reflected to find its column types. A query built with sqlalchemy.select already knows them, while a text query's dtypes
+        are left for pandas to infer.
+        """
+        
+        if isinstance(source, str):
+            table = await connection.run_sync(lambda sync_connection: sqlalchemy.Table(source, sqlalchemy.MetaData(), autoload_with=sync_connection))
+            source = sqlalchemy.select(table)
+        
+        dtypes, date_columns = column_dtypes(getattr(source, 'selected_columns', []))
+        
+        return source, dtypes, date_columns
+    
+    def _to_typed_chunk(self, rows: List[Any], columns: List[str], dtypes: dict, date_columns: list, start: int) -> DataFrame:
+        """Convert fetched rows into a DataFrame with the source's dtypes, indexed by id, or by row number counted from start."""
+        
+        chunk = DataFrame(rows, columns=columns).astype({column: dtype for column, dtype in dtypes.items() if column in columns})
+        
+        for column in date_columns:
+            chunk[column] = pd.to_datetime(chunk[column])
+        
+        if 'id' in columns:
+            return chunk.set_index('id')
+        
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        return chunk
+    
+    def _save_chunk(self, chunk: DataFrame, filepath: str, append: bool) -> None:
+        """Save the chunk to the source's file. Parquet datasets are partitioned by issue_date year when the source has one."""
+        
+        if self.storage == 'csv':
+            save_to_csv(chunk, filepath, append=append)
+        else:
+            save_to_parquet(chunk, filepath, partition_column='issue_date' if 'issue_date' in chunk.columns else None, append=append)
+    
+    def init_async_engine(self, credentials: dict, pool_size: int = 5, timeout: float = 30) -> AsyncEngine:
+        """Use credentials to initialise an SQLAlchemy async engine.
+
+        Args:
+            credentials (dict): credentials to connect to the database. An 'RDS_URL' entry is used as the connection url as-is, and must name an async driver, e.g. sqlite+aiosqlite:///loans.db
+            pool_size (int): number of connections kept in the engine's pool, which is never exceeded
+            timeout (float): seconds to wait for a connection from the pool
+
+        Returns:
+            engine (AsyncEngine): object to allow concurrent interaction with the database
+        """
+        
+        if 'RDS_URL' in credentials:
+            connection_url = credentials['RDS_URL']
+        else:
+            # Extract each credential field from the dictionary and format into a connection_url for the asyncpg driver
+            HOST = credentials['RDS_HOST']
+            PASSWORD = credentials['RDS_PASSWORD']
+            DATABASE = credentials['RDS_DATABASE']
+            USER = credentials['RDS_USER']
+            PORT = credentials['RDS_PORT']
+            
+            connection_url = f"postgresql+asyncpg://{USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
+        
+        # The queue pool is named because some async drivers, such as aiosqlite, otherwise default to opening a connection per checkout
+        return sqlalchemy_asyncio.create_async_engine(connection_url, poolclass=sqlalchemy.pool.AsyncAdaptedQueuePool, pool_size=pool_size, 
+                                                      max_overflow=0, pool_timeout=timeout)
+    
 if __name__ == '__main__':
     # Extract connection details into dictionary 
     credentials_dict = load_credentials()
     
     # Use details to connect to the RDSDatabase with the loan data
     RDSDatabaseConnector(credentials_dict)
-    
\ No newline at end of file
@@ -1,17 +1,71 @@
 import pandas as pd    
 import numpy as np
+from instrumentation import instrumented
 from pandas import Series, DataFrame
+from result_cache import ResultCache, cached
 
 from typing import List
 
 
+def _numeric_column_names(dataframe: DataFrame) -> List[str]:
+    """Return the names of the columns which dataframe.skew(numeric_only=True) reads, i.e. the numeric and boolean columns."""
+    return [name for name, dtype in dataframe.dtypes.items() if pd.api.types.is_numeric_dtype(dtype)]
+
+
+def _null_counts_and_skew(dataframe: DataFrame, columns: List[str]) -> (Series, Series):
+    """Return the null count and skew of each of the numeric columns of a DataFrame, reading each column once.
+
+    The nulls of each column are counted and dropped from one float64 array of its values, whose deviations from the mean are then
+    summed, and the skew uses the same bias-adjusted formula as pandas, so it matches dataframe.skew(numeric_only=True).
+    """
+    null_counts = {}
+    skew = {}
+
+    for name in columns:
+        values = dataframe[name].to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(values)
+        null_counts[name] = int(missing.sum())
+
+        if null_counts[name] > 0:
+            values = values[~missing]
+
+        count = len(values)
+
+        if count < 3:
+            skew[name] = np.nan
+            continue
+
+        deviations = values - values.mean()
+        powers = deviations * deviations
+        m2 = powers.sum()
+        powers *= deviations
+        m3 = powers.sum()
+
+        # pandas treats sums this close to 0 as rounding errors, so a constant column has a skew of 0
+        m2 = 0 if abs(m2) < 1e-14 else m2
+        m3 = 0 if abs(m3) < 1e-14 else m3
+        skew[name] = 0.0 if m2 == 0 else (count * (count - 1) ** 0.5 / (count - 2)) * (m3 / m2 ** 1.5)
+
+    return Series(null_counts, index=columns, dtype=np.int64), Series(skew, index=columns, dtype=float)
+
+
+@instrumented
 class DataFrameInfo():
     """A class for generating descriptive statistics and information about a pandas DataFrame.
+    
+    If a cache_max_bytes budget is given, the statistics are memoized against a fingerprint of the DataFrame or Series they were 
+    calculated from, which reads every value. Asking the same question about an unchanged frame then returns the cached answer, while
+    any change to its shape, dtypes or values recalculates it, including values edited in place with df.loc[...] = .... Methods which
+    take a single pass over one column, such as count_nulls_in_column, cost about as much as fingerprinting it and are not cached, and
+    the null percentage and skew methods read the cached profile of the frame rather than caching their own results. The least
+    recently used answers are evicted to stay in budget.
 
     Attributes:
-        None
+        cache (ResultCache): the memoized results, or None when caching is off.
 
     Methods:
+        profile:
+            Calculate null counts, null percentages, dtypes, skew and cardinality of every column in one pass.
         measure_skew_for_all_columns: 
             Calculate skew for all numeric columns.
         print_null_removal_progress: 
@@ -57,13 +111,43 @@ class DataFrameInfo():
         
     """
 
-    def __init__(self):
+    def __init__(self, cache_max_bytes: int = None):
         print("Loaded DataFrameInfo()...")
+        self.cache = None if cache_max_bytes is None else ResultCache(cache_max_bytes)
+        
+    @cached
+    def profile(self, dataframe: DataFrame, cardinality: bool = True) -> 'DataFrameProfile':
+        """Return a DataFrameProfile holding the null count, dtype, skew and number of distinct values of every column.
+        
+        Each numeric column is read once, and its null count and skew are calculated together from one float64 array of its values,
+        while the other columns are only read to count their nulls. Counting distinct values needs a hash table per column, so
+        it is skipped with cardinality=False. The null methods below read such a profile of the frame, and the skew methods one of its
+        numeric columns, so with a cache they share one profile instead of each scanning the frame again.
+        """
+        numeric = _numeric_column_names(dataframe)
+        other = dataframe.columns.difference(numeric, sort=False)
+        
+        null_counts, skew = _null_counts_and_skew(dataframe, numeric)
+        null_counts = pd.concat([null_counts, Series({name: dataframe[name].isna().sum() for name in other}, dtype=np.int64)])
+        
+        return DataFrameProfile(
+            row_count=len(dataframe), 
+            null_counts=null_counts.reindex(dataframe.columns).astype(np.int64), 
+            dtypes=dataframe.dtypes, 
+            skew=skew, 
+            cardinality=dataframe.nunique() if cardinality else None
+        )
 
     def measure_skew_for_all_columns(self, dataframe: DataFrame, sort=False) -> Series:
         """Return a Series showing the skew value for each column in the DataFrame. Only applies to numeric columns."""
         
-        skewness = dataframe.skew(numeric_only=True)
+        # Only the numeric columns are profiled, so the skew does not wait for the nulls of the others to be counted. The selection is
+        # made with copy-on-write so it shares their memory, which is safe as it is only read
+        with pd.option_context('mode.copy_on_write', True):
+            numeric = dataframe[_numeric_column_names(dataframe)]
+        
+        # Copied, as the profile may be cached
+        skewness = self.profile(numeric, cardinality=False).skew.copy()
         
         if sort:
             return skewness.sort_values(ascending=False)
@@ -73,11 +157,9 @@ class DataFrameInfo():
     def print_null_removal_progress(self, dataframe: DataFrame) -> (str, DataFrame): 
         """Display a DataFrame containing the null percentage and null count for each column in the DataFrame, along with a progress message."""
         
-        # Extract only those columns with null values
-        columns_with_nulls = self.get_columns_with_nulls(dataframe)
-
         # This displays both the # and % of nulls in the columns with nulls, good for debugging and tracking progress 
-        null_info = self.combine_null_percentage_and_count(columns_with_nulls)
+        null_info = self.combine_null_percentage_and_count(dataframe)
+        null_info = null_info[null_info["# of nulls"] > 0]
         
         message = f"There are {len(null_info)} columns with null values left:\n"
         
@@ -86,10 +168,10 @@ class DataFrameInfo():
     def combine_null_percentage_and_count(self, columns: DataFrame) -> DataFrame:
         """Return a DataFrame containing the null percentage and null count for each column in the DataFrame."""
         
-        # Create two Series objects containing the count and percentage of nulls in those columns 
-        percent_of_nulls = self.percentage_of_nulls_in_data_frame(dataframe=columns, sort=True)
+        # Create two Series objects containing the count and percentage of nulls in those columns, from one profile of them
+        number_of_nulls = self.profile(columns, cardinality=False).null_counts
         
-        number_of_nulls = columns.isnull().sum()
+        percent_of_nulls = round(number_of_nulls * 100 / len(columns), 2).sort_values(ascending=False)
         
         # Combine that data to display a DataFrame 
         data = {
@@ -111,7 +193,7 @@ class DataFrameInfo():
     def percentage_of_nulls_in_data_frame(self, dataframe: DataFrame, precision=2, sort=True) -> Series:
         """Returns a Series showing the percentage of null values for every column in the DataFrame."""        
         
-        null_percentages = round(dataframe.isnull().sum() * 100 / len(dataframe), precision)
+        null_percentages = round(self.profile(dataframe, cardinality=False).null_counts * 100 / len(dataframe), precision)
         
         if sort:
             return null_percentages.sort_values(ascending=False)
@@ -145,6 +227,7 @@ class DataFrameInfo():
         """Returns the standard deviation of the column whose name matches the column_name parameter."""
         return round(column.std(), precision)
     
+    @cached
     def describe_all(self, df: DataFrame) -> DataFrame:
         """Returns the count, mean, std, 25%/50%/75% quartiles, and maximum for every column, as a DataFrame."""
         return df.describe()
@@ -153,6 +236,7 @@ class DataFrameInfo():
         """Returns a Series of data types indexed with the column names."""
         return df.dtypes
 
+    @cached
     def describe_column(self, column: Series) -> Series:
         """For numerical columns, this returns the count, mean, std, 25%/50%/75% quartiles, and maximum for the given column, as a Series.
         
@@ -160,6 +244,7 @@ class DataFrameInfo():
         """
         return column.describe()
     
+    @cached
     def get_column_median(self, column: Series) -> float:
         """Returns the median value of the column whose name matches the column_name parameter."""
         return column.median()
@@ -168,6 +253,7 @@ class DataFrameInfo():
         """Returns the mean value of the column whose name matches the column_name parameter."""
         return round(column.mean(), precision)
     
+    @cached
     def get_column_mode(self, column: Series) -> Series:
         """Returns the mode of the column whose name matches the column_name parameter."""
         return column.mode()
@@ -178,13 +264,11 @@ class DataFrameInfo():
     
     def print_skew_and_dtype(self, dataframe: DataFrame) -> DataFrame:
         """Returns a DataFrame showing the skew value and data type for each in the provided DataFrame."""
-        skew_series = dataframe.skew(numeric_only=True).sort_values(ascending=False)
-        
-        columns = dataframe[list(skew_series.index)]
+        skew_series = self.measure_skew_for_all_columns(dataframe, sort=True)
         
         data = {
             "skewness": skew_series,
-            "dtype": columns.dtypes
+            "dtype": dataframe.dtypes[skew_series.index]
         }
         
         return pd.concat(data, axis=1)   
@@ -210,4 +294,44 @@ class DataFrameInfo():
         if column.name not in category_columns_list:
             raise Exception(f"The column {column.name} is not of type category.")
         else:
-            return list(column.unique())
\ No newline at end of file
+            return list(column.unique())
+
+
+class DataFrameProfile():
+    """Statistics of every column of a DataFrame, calculated once by DataFrameInfo.profile.
+
+    The null, percentage and skew methods of DataFrameInfo read these statistics from the profile of the DataFrame they are given.
+
+    Attributes:
+        row_count (int): number of rows in the DataFrame.
+        null_counts (Series): number of nulls in each column.
+        dtypes (Series): dtype of each column.
+        skew (Series): skew of each numeric column.
+        cardinality (Series): number of distinct non-null values in each column, or None if they were not counted.
+
+    Methods:
+        summary:
+            Return every statistic as one DataFrame, with a row per column.
+
+    """
+
+    def __init__(self, row_count: int, null_counts: Series, dtypes: Series, skew: Series, cardinality: Series = None):
+        self.row_count = row_count
+        self.null_counts = null_counts
+        self.dtypes = dtypes
+        self.skew = skew
+        self.cardinality = cardinality
+
+    def summary(self) -> DataFrame:
+        """Return a DataFrame with the dtype, null count, null percentage, skew and cardinality of each column."""
+        data = {
+            "dtype": self.dtypes,
+            "# of nulls": self.null_counts,
+            "% of nulls": round(self.null_counts * 100 / self.row_count, 2),
+            "skewness": self.skew
+        }
+
+        if self.cardinality is not None:
+            data["cardinality"] = self.cardinality
+
+        return pd.concat(data, axis=1)
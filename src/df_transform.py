@@ -1,28 +1,59 @@
 import pandas as pd
 import numpy as np
 
+from column_executor import ColumnExecutor
+from data_transform import updated_frame
+from fitted_transformers import BoxCoxTransformer, FittedTransformer, LabelEncoderTransformer, LogTransformer, NullImputer, TransformerStore, YeoJohnsonTransformer
+from functools import partial
+from instrumentation import instrumented
 from pandas import DataFrame, Series
-from scipy import stats
-from sklearn.preprocessing import LabelEncoder
-from typing import List
+from typing import Dict, List
 
     
     
-class DataFrameTransform():
+@instrumented
+class DataFrameTransform(TransformerStore):
     """A class containing methods to transform pandas DataFrames.
 
+    The Box-Cox, Yeo-Johnson, imputation and label encoding methods keep the transformer they fit to each column.
+    Calling them again with refit=False reuses those parameters instead of refitting, e.g. after load_fitted_transformers().
+    
+    The methods which work on several columns spread them across cores when an executor of 'thread' or 'process' is chosen.
+    
+    The methods which change a DataFrame keep the behaviour they always had by default: replace_column_after_box_cox and 
+    apply_label_encoder_to_df change the DataFrame passed in and return it, so only the new columns take memory, while the drop methods 
+    return a new, independent DataFrame, as df.drop does. inplace chooses the other behaviour. A new DataFrame copies the columns it 
+    keeps unless pandas' copy-on-write mode is on, when it shares their memory until one of them is modified. A changed DataFrame is 
+    always returned as well, so df = transform(df, ...) works either way.
+    
+    reduce_skew chooses a transform for every skewed column automatically. Each candidate is fitted to a stratified sample of the 
+    column, and only the one leaving the least skew is applied to the full column and kept in fitted_transformers.
+
     Attributes:
-        None
+        fitted_transformers (dict): the transformer last fitted to each column, keyed by column name.
+        executor (ColumnExecutor): runs the per-column work of the methods which take several columns.
     
     Methods:
         replace_column_after_box_cox: 
-            Replaces a DataFrame column with a transformed version, handling dtype changes and NaN values.
+            Replaces a DataFrame column with a transformed version, filling its NaN values with the mean.
         calculate_revenue:
             Use revenue formula to get the sum of revenues for a Series of loans.
+        portfolio_metrics:
+            Calculate revenue, recovery, six month projections and potential loss for every loan status in one pass.
+        portfolio_metric_sums:
+            Calculate the metrics of portfolio_metrics which are sums, which can be added up across partitions of the loan book.
+        portfolio_metrics_from_sums:
+            Complete the portfolio_metrics table from its sums.
         box_cox_transform: 
             Applies a Box-Cox transform to a Series and returns the result.
         yeo_johnson_transform: 
             Applies a Yeo-Johnson transform to a Series and returns the result. 
+        box_cox_transform_columns:
+            Applies a Box-Cox transform to several columns at once and returns the results.
+        yeo_johnson_transform_columns:
+            Applies a Yeo-Johnson transform to several columns at once and returns the results.
+        reduce_skew:
+            Applies the transform which leaves the least skew to every skewed column, and reports the choices.
         drop_column: 
             Drops a specified column from a DataFrame.
         drop_columns: 
@@ -35,78 +66,224 @@ class DataFrameTransform():
             Return DataFrame with non-numeric values converted to numeric ones.
         log_transform: 
             Applies a log transform to a Series and returns the result.
+        save_fitted_transformers:
+            Save the fitted lambdas, imputation values and label vocabularies to a yaml file.
+        load_fitted_transformers:
+            Load fitted transformers to reuse them with refit=False.
 
     """
     
-    def __init__(self):
+    # The groups of loan statuses compared in the notebook, which portfolio_metrics uses when group_statuses is True
+    LOAN_STATUS_GROUPS = {
+        'Fully Paid': 'Up to date', 'Current': 'Up to date', 'Default': 'Defaulted', 'Charged Off': 'Charged off',
+        'Late (16-30 days)': 'Late', 'Late (31-120 days)': 'Late'
+    }
+    
+    # The transforms reduce_skew can choose from, by name
+    SKEW_TRANSFORMS = {'box_cox': BoxCoxTransformer, 'yeo_johnson': YeoJohnsonTransformer, 'log': LogTransformer}
+    
+    # The transforms reduce_skew tries when it is not given candidates
+    SKEW_CANDIDATES = ['box_cox', 'yeo_johnson', 'log']
+    
+    def __init__(self, executor: str = 'serial', max_workers: int = None):
         print("Loaded DataFrameTransform()...")
+        self.executor = ColumnExecutor(executor, max_workers)
         
-    def replace_column_after_box_cox(self, df: DataFrame, original_column: Series, new_column: Series) -> DataFrame:
-        """Replace a DataFrame column with a transformed version."""
-        original_column_name = original_column.name
+    def replace_column_after_box_cox(self, df: DataFrame, original_column: Series, new_column: Series, inplace: bool = True) -> DataFrame:
+        """Replace a DataFrame column with a transformed version, filling any nulls in it with its mean. Changes and returns df, or a new DataFrame if inplace is False."""
+        # The transformed column replaces the original outright, so the original never needs converting to its dtype first
+        if new_column.isna().any():
+            new_column = new_column.fillna(new_column.mean())
         
-        # update original column's type to match the transformed data type
-        df[original_column_name] = df[original_column_name].astype(str(new_column.dtype))
-
-        # reassign the transformed data to the original column
-        df[original_column_name] = new_column
-
-        # replace any NA values introduced with the mean
-        df[original_column_name].fillna(new_column.mean(), inplace=True)
-        
-        return df
+        return updated_frame(df, {original_column.name: new_column}, inplace=inplace)
     
     def calculate_revenue(self, data: DataFrame) -> int:
         """Use revenue formula to get the sum of revenues for a Series of loans."""
         return pd.Series(data['loan_amount'] * (data['int_rate'] / 12) * data['term']).sum()
+    
+    def portfolio_metrics(self, df: DataFrame, by: List[str] = None, group_statuses: bool = False) -> DataFrame:
+        """Return a table of loan portfolio metrics for every loan_status, optionally broken down further by the columns in by, 
+        e.g. ['sub_grade'], ['purpose'] or ['term']. With group_statuses, statuses are combined as in LOAN_STATUS_GROUPS.
         
-    def box_cox_transform(self, column_data: Series) -> Series:
-        """Apply a Box-Cox transform to a Series."""
-        return Series(stats.boxcox(column_data)[0])
+        Every metric is calculated for each loan in one vectorized pass, then summed for all the groups at once, using the 
+        same formulas as the notebook:
+            funding, amount_recovered: the sums of funded_amount_inv and total_payment.
+            percentage_recovered: amount_recovered as a percentage of funding.
+            paid_off_count, paid_off_percentage: the loans which have recovered 100% of their funding.
+            six_month_projection: the amount recovered in six months, once the loans not yet paid off pay six more monthly instalments.
+            projected_percentage_recovered: six_month_projection as a percentage of funding.
+            projected_paid_off_count: the loans not yet paid off which will be in six months.
+            revenue, revenue_percentage: loan_amount x (int_rate / 12) x term, and its share of the total revenue.
+            potential_loss: the interest lost over the months left in the term, if the loans were charged off.
+        
+        The term column must hold the number of months, as it does after cleaning.
+        """
+        return self.portfolio_metrics_from_sums(self.portfolio_metric_sums(df, by, group_statuses))
     
-    def yeo_johnson_transform(self, column: Series) -> Series:
-        """Apply a Yeo-Johnson transform to a Series."""
-        return Series(stats.yeojohnson(column)[0])
+    def portfolio_metric_sums(self, df: DataFrame, by: List[str] = None, group_statuses: bool = False) -> DataFrame:
+        """Return the metrics of portfolio_metrics which are sums, for every loan_status and the columns in by, before any percentages.
+        
+        Sums of different sets of loans, e.g. partitions of the loan book, add up to the sums of all of them, so they can be added 
+        together and passed to portfolio_metrics_from_sums.
+        """
+        by = by or []
+        
+        values = {name: df[name].to_numpy(dtype=float, na_value=np.nan) for name in ['funded_amount_inv', 'total_payment', 'instalment', 'loan_amount', 'int_rate', 'term']}
+        funding, recovered, instalment = values['funded_amount_inv'], values['total_payment'], values['instalment']
+        monthly_interest = values['loan_amount'] * values['int_rate'] / 12
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            paid_off = np.round(recovered / funding * 100, 2) >= 100
+            
+            # Loans which are not paid off recover six more monthly instalments
+            projection = np.where(paid_off, recovered, recovered + instalment * 6)
+            projected_paid_off = ~paid_off & (np.round(projection / funding * 100, 2) >= 100)
+            
+            months_left = values['term'] - np.round(recovered / instalment)
+        
+        loans = DataFrame({
+            'loan_count': np.ones(len(df), dtype=np.int64),
+            'funding': funding,
+            'amount_recovered': recovered,
+            'paid_off_count': paid_off,
+            'six_month_projection': projection,
+            'projected_paid_off_count': projected_paid_off,
+            'revenue': monthly_interest * values['term'],
+            'potential_loss': np.round(monthly_interest * months_left, 2)
+        }, index=df.index)
+        
+        statuses = df['loan_status']
+        if group_statuses:
+            statuses = _rename_values(statuses, self.LOAN_STATUS_GROUPS)
+        
+        keys = [statuses] + [df[name] for name in by]
+        return loans.groupby(keys, observed=True, sort=True).sum()
     
-    def drop_column(self, df: DataFrame, column_to_drop: Series) -> DataFrame:
-        """Drop a specified column from a DataFrame."""
-        return df.drop(column_to_drop.name, axis=1)
+    def portfolio_metrics_from_sums(self, sums: DataFrame) -> DataFrame:
+        """Complete the table of portfolio_metrics from the sums returned by portfolio_metric_sums, adding the percentages."""
+        metrics = sums.copy()
+        
+        # Percentages of the group totals, rather than averages of each loan's percentage
+        metrics['percentage_recovered'] = round(metrics['amount_recovered'] / metrics['funding'] * 100, 2)
+        metrics['paid_off_percentage'] = round(metrics['paid_off_count'] / metrics['loan_count'] * 100, 2)
+        metrics['projected_percentage_recovered'] = round(metrics['six_month_projection'] / metrics['funding'] * 100, 2)
+        metrics['revenue_percentage'] = round(metrics['revenue'] / metrics['revenue'].sum() * 100, 2)
+        
+        order = ['loan_count', 'funding', 'amount_recovered', 'percentage_recovered', 'paid_off_count', 'paid_off_percentage', 'six_month_projection', 
+                 'projected_percentage_recovered', 'projected_paid_off_count', 'revenue', 'revenue_percentage', 'potential_loss']
         
-    def drop_columns(self, df: DataFrame, column_names: List[str]) -> DataFrame:
-        """Drop specified columns from a DataFrame."""
-        return df.drop(column_names, axis=1)
+        return metrics[order].reset_index()
+        
+    def box_cox_transform(self, column_data: Series, refit: bool = True) -> Series:
+        """Apply a Box-Cox transform to a Series. If refit is False, the lambda fitted to this column before is reused."""
+        return self._fit_or_reuse(column_data, BoxCoxTransformer(), refit).transform(column_data)
+    
+    def yeo_johnson_transform(self, column: Series, refit: bool = True) -> Series:
+        """Apply a Yeo-Johnson transform to a Series. If refit is False, the lambda fitted to this column before is reused."""
+        return self._fit_or_reuse(column, YeoJohnsonTransformer(), refit).transform(column)
+    
+    def box_cox_transform_columns(self, df: DataFrame, column_names: List[str], refit: bool = True) -> DataFrame:
+        """Apply a Box-Cox transform to each of the columns, fitting their lambdas at the same time with the executor. The DataFrame is not modified."""
+        transformed = self._fit_transform_columns({name: df[name] for name in column_names}, BoxCoxTransformer(), refit)
+        return DataFrame(transformed, index=df.index, copy=False)
+    
+    def yeo_johnson_transform_columns(self, df: DataFrame, column_names: List[str], refit: bool = True) -> DataFrame:
+        """Apply a Yeo-Johnson transform to each of the columns, fitting their lambdas at the same time with the executor. The DataFrame is not modified."""
+        transformed = self._fit_transform_columns({name: df[name] for name in column_names}, YeoJohnsonTransformer(), refit)
+        return DataFrame(transformed, index=df.index, copy=False)
     
-    def drop_rows_of_null_column_entries(self, df: DataFrame, column_names: List[str]) -> DataFrame:
-        """Drop rows with NaN values in DataFrame columns specified by column_names."""
+    def reduce_skew(self, df: DataFrame, threshold: float = 0.5, to_drop: List[str] = None, candidates: List[str] = None, 
+                    sample_size: int = 100_000, seed: int = 0, refit: bool = True) -> (DataFrame, DataFrame):
+        """Return a copy of the DataFrame with every numeric column whose skew is above the threshold (either way) transformed by 
+        whichever candidate leaves it least skewed, and a report of the choices. Columns in to_drop are left alone. The candidates are 
+        SKEW_CANDIDATES unless they are given.
         
-        for column_name in column_names:
-            column = df[column_name]
+        Each candidate is fitted to, and judged on, a sample of up to sample_size values holding one value from each of sample_size 
+        equally sized quantile ranges of the column, so the tails which cause the skew are always represented. Box-Cox is only tried 
+        on columns whose values are all positive. The winner is applied to the full column and kept in fitted_transformers, so 
+        with refit=False the columns which have a kept transformer are transformed with it again, without a search.
+        
+        The report has the skew of each column before, the skew of each candidate on the sample, the chosen transform and its 
+        lambda, and the skew of the full column after.
+        """
+        to_drop = to_drop or []
+        candidates = self.SKEW_CANDIDATES if candidates is None else candidates
+        
+        # Raise an error if a candidate transform is not recognised
+        for candidate in candidates:
+            if candidate not in self.SKEW_TRANSFORMS:
+                raise Exception(f"Unknown transform '{candidate}'. Candidates must be from {list(self.SKEW_TRANSFORMS)}.")
+        
+        numeric = [name for name in df.columns if name not in to_drop and pd.api.types.is_numeric_dtype(df[name]) and not pd.api.types.is_bool_dtype(df[name])]
+        
+        if refit:
+            skew_before = Series({name: df[name].skew() for name in numeric}, dtype=float)
+            skewed = {name: df[name] for name in numeric if abs(skew_before[name]) > threshold}
+            
+            # Search every skewed column at the same time with the executor
+            searches = self.executor.map(partial(_search_skew_transforms, candidates=candidates, transforms=self.SKEW_TRANSFORMS, sample_size=sample_size, seed=seed), skewed)
             
-            if str(column.dtype) == 'Int64':
-                df = df[~df[column.name].isna()]
-            else:    
-                to_drop = df[column.isnull()].index
-                df = df.drop(to_drop, axis=0) 
-                
-        return df
-        
-    def impute_nulls_in_column(self, column: Series, strategy: str) -> Series:
-        """Impute NaN values in a Series using mean, median or mode."""
-        
-        # Raise an error if the imputation strategy is not recognised
-        if strategy not in ['mean', 'median', 'mode']:
-            raise Exception(f"The parameter 'replace_with' accepts either 'mean', 'median' or 'mode'. You entered '{strategy}'.")  
-              
-        if strategy == 'mean':
-            column = column.fillna(column.mean()[0])
-        elif strategy == 'median':
-            if column.dtype in ['float64', 'int64']:
-                column = column.fillna(column.median())
-            else:
-                column = column.fillna(column.median()[0])
+            searches = {name: search for name, search in searches.items() if search[0] is not None}
+            
+            for name, (transformer, _) in searches.items():
+                self.fitted_transformers[name] = transformer
         else:
-            # Mode imputation
-            column = column.fillna(column.mode()[0])
+            skewed = {name: df[name] for name in numeric if isinstance(self.fitted_transformers.get(name), tuple(self.SKEW_TRANSFORMS.values()))}
+            skew_before = Series({name: column.skew() for name, column in skewed.items()}, dtype=float)
+            searches = {name: (self.fitted_transformers[name], {}) for name in skewed}
+        
+        columns = {name: df[name] for name in df.columns}
+        transform_names = {transform: name for name, transform in self.SKEW_TRANSFORMS.items()}
+        report = {}
+        
+        for name, (transformer, sample_skews) in searches.items():
+            columns[name] = transformer.transform(df[name])
+            
+            report[name] = {
+                "skew before": skew_before[name],
+                **{f"{candidate} sample skew": sample_skews.get(candidate, np.nan) for candidate in candidates},
+                "transform": transform_names[type(transformer)],
+                "lambda": transformer.params.get('lmbda', np.nan),
+                "skew after": columns[name].skew()
+            }
+        
+        return DataFrame(columns, index=df.index, copy=False), DataFrame.from_dict(report, orient='index')
+    
+    def drop_column(self, df: DataFrame, column_to_drop: Series, inplace: bool = False) -> DataFrame:
+        """Drop a specified column from a DataFrame, returning a new DataFrame unless inplace is True."""
+        return updated_frame(df, dropped=[column_to_drop.name], inplace=inplace)
+        
+    def drop_columns(self, df: DataFrame, column_names: List[str], inplace: bool = False) -> DataFrame:
+        """Drop specified columns from a DataFrame, returning a new DataFrame unless inplace is True."""
+        return updated_frame(df, dropped=list(column_names), inplace=inplace)
+    
+    def drop_rows_of_null_column_entries(self, df: DataFrame, column_names: List[str], inplace: bool = False) -> DataFrame:
+        """Drop rows with NaN values in DataFrame columns specified by column_names, returning a new DataFrame unless inplace is True.
+        
+        Removing rows writes every column once, whether or not inplace is True. If no row has a null, the columns are copied only when
+        inplace is False and pandas' copy-on-write mode is off.
+        """
+        # Find the rows with a null in any of the columns first, so the rows are removed in one pass rather than one per column
+        has_null = np.zeros(len(df), dtype=bool)
+        
+        for column_name in column_names:
+            has_null |= df[column_name].isna().to_numpy()
+        
+        if not has_null.any():
+            return updated_frame(df, inplace=inplace)
+        
+        if inplace:
+            df.drop(df.index[has_null], axis=0, inplace=True)
+            return df
+        
+        return df[~has_null]
+        
+    def impute_nulls_in_column(self, column: Series, strategy: str, refit: bool = True) -> Series:
+        """Impute NaN values in a Series using mean, median or mode. If refit is False, the value fitted to this column before is reused."""
+        
+        # NullImputer raises an error if the imputation strategy is not recognised
+        imputer = self._fit_or_reuse(column, NullImputer(strategy), refit)
+        column = imputer.transform(column)
             
         # Raise an error if the above failed to remove all nulls from the column
         if column.isnull().sum() != 0:
@@ -114,24 +291,73 @@ class DataFrameTransform():
         
         return column
     
-    def apply_label_encoder_to_df(self, data: DataFrame, features: List[str]) -> DataFrame:
-        """Use a LabelEncoder to convert non-numeric values into numeric ones."""
-        encoder = LabelEncoder()
+    def apply_label_encoder_to_df(self, data: DataFrame, features: List[str], refit: bool = True, inplace: bool = True) -> DataFrame:
+        """Use a LabelEncoder to convert non-numeric values into numeric ones, changing and returning data, or a new DataFrame if inplace is False. 
+        If refit is False, the vocabularies fitted before are reused."""
         
-        #Fit label encoder and return encoded labels
-        for column in features:
-            data[column] = encoder.fit_transform(data[column])
+        #Fit label encoder and return encoded labels, encoding the features at the same time with the executor
+        encoded = self._fit_transform_columns({column: data[column] for column in features}, LabelEncoderTransformer(), refit)
             
-        return data
+        return updated_frame(data, encoded, inplace=inplace)
 
     ########## ########## ##########
     # The following functions may have been used at some point in the project, but do not feature in the current EDA Notebook.    
     ########## ########## #########
 
     def log_transform(self, column: Series) -> Series:
-        """Apply a log transform to a Series."""
-        if column.dtype == 'float64':
-            new_column = column.map(lambda i: np.log(i) if i > 0.0 else 0.0)
-        else:
-            new_column = column.map(lambda i: np.log(i) if i > 0 else 0)      
-        return new_column
\ No newline at end of file
+        """Apply a log transform to a Series. Values which are 0, negative or null become 0."""
+        return LogTransformer().transform(column)
+
+
+
+def _rename_values(column: Series, names: dict) -> Series:
+    """Return the column as a category, with each value which is in names replaced by its new name. Each distinct value is only renamed once."""
+    codes, distinct_values = pd.factorize(column)
+    group_codes, groups = pd.factorize(np.array([names.get(value, value) for value in distinct_values], dtype=object), sort=True)
+    
+    # Appending -1 means a null's code of -1 looks up -1 again
+    codes = np.append(group_codes, -1)[codes]
+    
+    return Series(pd.Categorical.from_codes(codes, categories=groups), index=column.index, name=column.name)
+
+
+def _search_skew_transforms(column: Series, candidates: List[str], transforms: Dict[str, type], sample_size: int, seed: int) -> (FittedTransformer, Dict[str, float]):
+    """Fit each candidate transform to a quantile-stratified sample of the column, and return the one which leaves the sample 
+    least skewed, along with the skew each candidate left. The transformer is None if no candidate could be used.
+    """
+    values = column.to_numpy(dtype=float, na_value=np.nan)
+    values = np.sort(values[~np.isnan(values)])
+    
+    # Box-Cox is only defined for positive values, which is checked on the full column as the sample may miss its minimum
+    all_positive = len(values) > 0 and values[0] > 0
+    
+    # Take one value at random from each of sample_size equally sized ranges of the sorted values
+    if len(values) > sample_size:
+        offsets = np.random.default_rng(seed).random(sample_size)
+        values = values[((np.arange(sample_size) + offsets) * len(values) / sample_size).astype(np.int64)]
+    
+    sample = Series(values, name=column.name)
+    fitted, sample_skews = {}, {}
+    
+    for candidate in candidates:
+        if candidate == 'box_cox' and not all_positive:
+            continue
+        
+        transformer = transforms[candidate]().fit(sample)
+        transformed = transformer.transform(sample)
+        
+        # A transform which merges distinct values, as log does with 0 and 1, loses information however little skew it leaves
+        if transformed.nunique() < sample.nunique():
+            continue
+        
+        fitted[candidate] = transformer
+        sample_skews[candidate] = transformed.skew()
+    
+    # Leave the column alone if no candidate could be used
+    if not sample_skews:
+        return None, sample_skews
+    
+    # A transform which overflows leaves a skew of NaN, so it can never be chosen
+    best = min(sample_skews, key=lambda candidate: np.nan_to_num(abs(sample_skews[candidate]), nan=np.inf))
+    
+    return fitted[best], sample_skews
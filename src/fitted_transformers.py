@@ -0,0 +1,289 @@
+import copy
+import numpy as np
+import pandas as pd
+import yaml
+
+from functools import partial
+from lazy_imports import lazy_import
+from pandas import Series
+from typing import Any, Dict, List
+
+# scipy is only imported when a Box-Cox or Yeo-Johnson transformer is first used
+special = lazy_import('scipy.special')
+stats = lazy_import('scipy.stats')
+
+
+class FittedTransformer():
+    """Base class for transforms whose parameters are learnt once from a column, then reused on any number of new columns.
+
+    fit() calculates the parameters from the data, transform() applies them with a vectorized operation and no refitting,
+    so a fresh batch of loans is transformed exactly like the data the parameters were learnt from.
+
+    Attributes:
+        params (dict): the fitted parameters, as plain Python values that can be saved to yaml.
+
+    Methods:
+        fit:
+            Learn the parameters from a column.
+        transform:
+            Apply the fitted parameters to a column.
+        fit_transform:
+            Fit to a column, then transform it.
+        is_fitted:
+            Check whether the parameters have been learnt.
+
+    """
+
+    def __init__(self, **params):
+        self.params = params
+
+    def fit(self, column: Series) -> 'FittedTransformer':
+        """Learn the parameters from the column and return the transformer."""
+        raise NotImplementedError
+
+    def transform(self, column: Series) -> Series:
+        """Apply the fitted parameters to the column and return the result."""
+        raise NotImplementedError
+
+    def fit_transform(self, column: Series) -> Series:
+        """Fit to the column, then transform it."""
+        return self.fit(column).transform(column)
+
+    def is_fitted(self) -> bool:
+        """Return True once every parameter has been learnt."""
+        return all(value is not None for value in self.params.values())
+
+    def __repr__(self) -> str:
+        params = ", ".join(f"{name}={value!r}" for name, value in self.params.items())
+        return f"{type(self).__name__}({params})"
+
+
+class BoxCoxTransformer(FittedTransformer):
+    """Box-Cox transform with a fitted lambda. Nulls are filled with the mean of the transformed data the lambda was fitted on."""
+
+    def __init__(self, lmbda: float = None, fill_value: float = None):
+        super().__init__(lmbda=lmbda, fill_value=fill_value)
+
+    def fit(self, column: Series) -> 'BoxCoxTransformer':
+        transformed, lmbda = stats.boxcox(column.dropna().to_numpy(dtype=float))
+        self.params = {'lmbda': float(lmbda), 'fill_value': float(transformed.mean())}
+        return self
+
+    def transform(self, column: Series) -> Series:
+        values = special.boxcox(column.to_numpy(dtype=float, na_value=np.nan), self.params['lmbda'])
+        return Series(values, index=column.index, name=column.name).fillna(self.params['fill_value'])
+
+
+class YeoJohnsonTransformer(FittedTransformer):
+    """Yeo-Johnson transform with a fitted lambda. Nulls are left as they are."""
+
+    def __init__(self, lmbda: float = None):
+        super().__init__(lmbda=lmbda)
+
+    def fit(self, column: Series) -> 'YeoJohnsonTransformer':
+        self.params = {'lmbda': float(stats.yeojohnson(column.dropna().to_numpy(dtype=float))[1])}
+        return self
+
+    def transform(self, column: Series) -> Series:
+        values = column.to_numpy(dtype=float, na_value=np.nan)
+        not_null = ~np.isnan(values)
+
+        transformed = np.full(len(values), np.nan)
+        transformed[not_null] = stats.yeojohnson(values[not_null], lmbda=self.params['lmbda'])
+
+        return Series(transformed, index=column.index, name=column.name)
+
+
+class LogTransformer(FittedTransformer):
+    """Natural log transform, which has nothing to fit. Values which are 0, negative or null become 0."""
+
+    def fit(self, column: Series) -> 'LogTransformer':
+        return self
+
+    def transform(self, column: Series) -> Series:
+        values = column.to_numpy(dtype=float, na_value=np.nan)
+
+        # Only take the log of positive values, leaving the rest as 0
+        transformed = np.zeros(len(values))
+        np.log(values, out=transformed, where=values > 0)
+
+        return Series(transformed, index=column.index, name=column.name)
+
+
+class RangeBinner(FittedTransformer):
+    """Converts an integer column into categories of value ranges, with 0 kept as a category of its own.
+
+    The cutoffs split the range of the non-zero values into num_bins equal widths, as in DataTransform.int64_to_category_with_ranges.
+    Values outside the fitted cutoffs become null.
+    """
+
+    def __init__(self, num_bins: int = 4, bin_cutoffs: List[int] = None, labels: List[str] = None):
+        super().__init__(num_bins=num_bins, bin_cutoffs=bin_cutoffs, labels=labels)
+
+    def fit(self, column: Series) -> 'RangeBinner':
+        non_zeros = column[column != 0]
+        num_bins = self.params['num_bins']
+
+        bin_size = (non_zeros.max() - non_zeros.min()) / num_bins
+        bin_cutoffs = [int(non_zeros.max() - (bin_size * i)) for i in range(num_bins, -1, -1)]
+        labels = [f"{bin_cutoffs[i]}-{bin_cutoffs[i+1]}" for i in range(num_bins)]
+
+        self.params = {'num_bins': num_bins, 'bin_cutoffs': bin_cutoffs, 'labels': labels}
+        return self
+
+    def transform(self, column: Series) -> Series:
+        # Zeros are binned as nulls, then given their own "0" category
+        binned = pd.cut(column.mask(column == 0), bins=self.params['bin_cutoffs'], labels=self.params['labels'], include_lowest=True, right=False)
+        binned = binned.cat.add_categories("0")
+        binned[column == 0] = "0"
+
+        return binned
+
+
+class NullImputer(FittedTransformer):
+    """Fills nulls with the mean, median or mode learnt from the fitted column."""
+
+    def __init__(self, strategy: str = 'median', value: Any = None):
+        # Raise an error if the imputation strategy is not recognised
+        if strategy not in ['mean', 'median', 'mode']:
+            raise Exception(f"The parameter 'strategy' accepts either 'mean', 'median' or 'mode'. You entered '{strategy}'.")
+
+        super().__init__(strategy=strategy, value=value)
+
+    def fit(self, column: Series) -> 'NullImputer':
+        strategy = self.params['strategy']
+
+        if strategy == 'mean':
+            value = column.mean()
+        elif strategy == 'median':
+            value = column.median()
+        else:
+            value = column.mode()[0]
+
+        self.params = {'strategy': strategy, 'value': _to_python(value)}
+        return self
+
+    def transform(self, column: Series) -> Series:
+        return column.fillna(self.params['value'])
+
+
+class LabelEncoderTransformer(FittedTransformer):
+    """Encodes each value as its position in the sorted vocabulary of fitted values, like sklearn's LabelEncoder.
+
+    Values which were not seen when fitting, and nulls, are encoded as -1 rather than raising an error.
+    """
+
+    def __init__(self, classes: List[Any] = None):
+        super().__init__(classes=classes)
+
+    def fit(self, column: Series) -> 'LabelEncoderTransformer':
+        self.params = {'classes': [_to_python(value) for value in np.sort(column.dropna().unique())]}
+        return self
+
+    def transform(self, column: Series) -> Series:
+        codes = pd.Categorical(column, categories=self.params['classes']).codes
+        return Series(codes.astype(np.int64), index=column.index, name=column.name)
+
+
+# The transformer classes which can be saved and loaded, by name
+TRANSFORMERS = {cls.__name__: cls for cls in [BoxCoxTransformer, YeoJohnsonTransformer, LogTransformer, RangeBinner, NullImputer, LabelEncoderTransformer]}
+
+
+def transformers_to_dict(transformers: Dict[str, FittedTransformer]) -> dict:
+    """Convert a dict of fitted transformers into plain Python data which yaml can save."""
+    return {key: {'type': type(transformer).__name__, 'params': transformer.params} for key, transformer in transformers.items()}
+
+
+def transformers_from_dict(data: dict) -> Dict[str, FittedTransformer]:
+    """Rebuild the dict of fitted transformers converted by transformers_to_dict."""
+    return {key: TRANSFORMERS[entry['type']](**entry['params']) for key, entry in data.items()}
+
+
+def save_transformers(transformers: Dict[str, FittedTransformer], filepath: str) -> None:
+    """Save a dict of fitted transformers, e.g. keyed by column name, to a yaml file."""
+    with open(filepath, 'w') as f:
+        yaml.safe_dump(transformers_to_dict(transformers), f, sort_keys=False)
+
+
+def load_transformers(filepath: str) -> Dict[str, FittedTransformer]:
+    """Load a dict of fitted transformers saved by save_transformers."""
+    with open(filepath, 'r') as f:
+        return transformers_from_dict(yaml.safe_load(f) or {})
+
+
+def _to_python(value: Any) -> Any:
+    """Convert numpy and pandas scalars into plain Python values, which yaml can save."""
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+class TransformerStore():
+    """Mixin for the transform classes, which keeps the transformer last fitted to each column so it can be reused or saved.
+
+    Classes using it set self.executor to a ColumnExecutor, which fits and applies transformers to several columns at once.
+
+    Attributes:
+        fitted_transformers (Dict[str, FittedTransformer]): the transformer last fitted to each column, keyed by column name.
+
+    Methods:
+        save_fitted_transformers:
+            Save every fitted transformer to a yaml file.
+        load_fitted_transformers:
+            Load transformers saved by save_fitted_transformers, to reuse them without refitting.
+
+    """
+
+    @property
+    def fitted_transformers(self) -> Dict[str, FittedTransformer]:
+        if not hasattr(self, '_fitted_transformers'):
+            self._fitted_transformers = {}
+        return self._fitted_transformers
+
+    def save_fitted_transformers(self, filepath: str) -> None:
+        """Save every fitted transformer to a yaml file."""
+        save_transformers(self.fitted_transformers, filepath)
+
+    def load_fitted_transformers(self, filepath: str) -> None:
+        """Load transformers saved by save_fitted_transformers. Methods called with refit=False then reuse them."""
+        self.fitted_transformers.update(load_transformers(filepath))
+
+    def _fit_or_reuse(self, column: Series, transformer: FittedTransformer, refit: bool) -> FittedTransformer:
+        """Return the transformer fitted to the column, fitting the new transformer to it if refit is True or there is none to reuse."""
+        fitted = self.fitted_transformers.get(column.name)
+
+        if refit or fitted is None:
+            fitted = self.fitted_transformers[column.name] = transformer.fit(column)
+        elif type(fitted) is not type(transformer):
+            raise Exception(f"The transformer fitted to {column.name} is a {type(fitted).__name__}, not a {type(transformer).__name__}.")
+
+        return fitted
+
+    def _fit_transform_columns(self, columns: Dict[str, Series], transformer: FittedTransformer, refit: bool) -> Dict[str, Series]:
+        """Fit a copy of the transformer to each column, or reuse the one fitted before if refit is False, and return the transformed
+        columns. The columns are processed at the same time by self.executor.
+        """
+        reused = {}
+
+        if not refit:
+            for name in columns:
+                fitted = self.fitted_transformers.get(name)
+                if fitted is not None and type(fitted) is not type(transformer):
+                    raise Exception(f"The transformer fitted to {name} is a {type(fitted).__name__}, not a {type(transformer).__name__}.")
+                if fitted is not None:
+                    reused[name] = fitted
+
+        results = self.executor.map(partial(_fit_and_transform, transformer=transformer, reused=reused), columns)
+
+        for name, (fitted, _) in results.items():
+            self.fitted_transformers[name] = fitted
+
+        return {name: transformed for name, (_, transformed) in results.items()}
+
+
+def _fit_and_transform(column: Series, transformer: FittedTransformer, reused: Dict[str, FittedTransformer]) -> (FittedTransformer, Series):
+    """Return the transformer for the column, fitting a copy of the given one unless one is reused, and the transformed column."""
+    fitted = reused.get(column.name) or copy.deepcopy(transformer).fit(column)
+    return fitted, fitted.transform(column)
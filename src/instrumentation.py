@@ -0,0 +1,258 @@
+import contextlib
+import functools
+import inspect
+import json
+import numpy as np
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from pandas import DataFrame, Series
+from types import FunctionType
+from typing import Any, Callable, Dict, Iterator
+
+try:
+    import resource
+except ImportError:
+    # The resource module is not available on Windows, where peak RSS is not recorded
+    resource = None
+
+
+class Tracer():
+    """Records a span for every call to an instrumented method made while it is active, to show where the time and memory of a run go.
+
+    Instrumentation is opt-in: the classes decorated with @instrumented only check whether a Tracer is active, and do nothing more
+    unless one is. Use a Tracer as a context manager around the code to trace:
+
+        with Tracer() as tracer:
+            df = pipeline.run(df)
+        tracer.to_chrome_trace('trace.json')
+
+    Each span records the wall time of the call, the rows of the first DataFrame or Series passed in and of the one returned, the
+    process' peak RSS when the call finished, and whether the returned frame copied the data of the frame passed in rather than sharing
+    it. With trace_allocations, each span also records the peak bytes allocated during the call, using tracemalloc, which makes the
+    traced code several times slower. Calls made inside another instrumented call are recorded as its children, with a greater depth.
+    Only calls in this process are traced, so work sent to 'process' workers by a ColumnExecutor is part of its caller's span. Calls
+    made from several threads at once are each recorded, but tracemalloc counts every thread's allocations, so their bytes overlap.
+    A method returning an iterator, such as stream_table_as_dataframes, is timed until it returns the iterator.
+
+    Attributes:
+        trace_allocations (bool): whether bytes allocated are recorded.
+        spans (List[dict]): the spans recorded so far, in the order the calls finished.
+
+    Methods:
+        span:
+            Record a span for a block of code, e.g. a step of a pipeline.
+        summary:
+            Return the number of calls, total and mean seconds and largest allocation of each method.
+        to_json:
+            Save the spans to a json file.
+        to_chrome_trace:
+            Save the spans in the Chrome trace event format, to be opened in chrome://tracing or Perfetto.
+
+    """
+
+    def __init__(self, trace_allocations: bool = False):
+        self.trace_allocations = trace_allocations
+        self.spans = []
+        self._local = threading.local()
+        self._started_tracemalloc = False
+
+    def __enter__(self) -> 'Tracer':
+        global _active_tracer
+
+        if _active_tracer is not None:
+            raise Exception("A Tracer is already active. Tracers cannot be nested.")
+
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+        self._origin = time.perf_counter()
+        _active_tracer = self
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        global _active_tracer
+        _active_tracer = None
+
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @contextlib.contextmanager
+    def span(self, name: str, data: Any = None) -> Iterator[dict]:
+        """Record a span named name for the block of code inside the with statement, with data as the frame passed in.
+
+        Yields the span's record, so the block can add to it, e.g. its 'rows out'.
+        """
+        # Each thread has its own stack of the spans it is inside
+        stack = self._local.__dict__.setdefault('stack', [])
+        record = {'name': name, 'depth': len(stack), 'rows in': _row_count(data), 'rows out': None, 'copied': None}
+
+        if self.trace_allocations:
+            record['_allocated before'] = tracemalloc.get_traced_memory()[0]
+            record['_child peak'] = 0
+            tracemalloc.reset_peak()
+
+        stack.append(record)
+        start = time.perf_counter()
+
+        try:
+            yield record
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+
+            record['start (s)'] = start - self._origin
+            record['seconds'] = end - start
+            record['peak RSS (MB)'] = _peak_rss_mb()
+
+            if self.trace_allocations:
+                # Children reset the peak, so the peak of this call is the greater of the peak since the last child and the children's peaks
+                peak = max(tracemalloc.get_traced_memory()[1], record.pop('_child peak'))
+                record['bytes allocated'] = peak - record.pop('_allocated before')
+
+                if stack:
+                    stack[-1]['_child peak'] = max(stack[-1]['_child peak'], peak)
+
+            record['thread'] = threading.get_ident()
+            self.spans.append(record)
+
+    def summary(self) -> DataFrame:
+        """Return the number of calls, total and mean seconds, and largest bytes allocated and rows in, of each method or span name,
+        sorted by total seconds. A call's time includes the time of any instrumented calls it made.
+        """
+        spans = DataFrame(self.spans, columns=['name', 'seconds', 'rows in', 'bytes allocated'])
+        summary = spans.groupby('name').agg(calls=('seconds', 'size'), total_seconds=('seconds', 'sum'), mean_seconds=('seconds', 'mean'),
+                                            max_bytes_allocated=('bytes allocated', 'max'), max_rows_in=('rows in', 'max'))
+
+        return summary.sort_values('total_seconds', ascending=False)
+
+    def to_json(self, filepath: str) -> None:
+        """Save the spans to a json file, as a list of records."""
+        with open(filepath, 'w') as f:
+            json.dump(self.spans, f, indent=2, default=_to_json_value)
+
+    def to_chrome_trace(self, filepath: str) -> None:
+        """Save the spans as complete ('X') events of the Chrome trace event format, timed in microseconds, with the rest of each
+        span's record as its args.
+        """
+        events = [{
+            'name': record['name'],
+            'cat': record['name'].split('.')[0].split(' ')[0],
+            'ph': 'X',
+            'ts': record['start (s)'] * 1e6,
+            'dur': record['seconds'] * 1e6,
+            'pid': os.getpid(),
+            'tid': record['thread'],
+            'args': {key: value for key, value in record.items() if key not in ['name', 'start (s)', 'seconds', 'thread']},
+        } for record in self.spans]
+
+        with open(filepath, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=_to_json_value)
+
+
+# The Tracer recording calls, or None when instrumentation is off
+_active_tracer = None
+
+
+def span(name: str, data: Any = None) -> contextlib.AbstractContextManager:
+    """Record a span for a block of code with the active Tracer, or do nothing if no Tracer is active."""
+    return contextlib.nullcontext() if _active_tracer is None else _active_tracer.span(name, data)
+
+
+def instrumented(cls: type) -> type:
+    """Class decorator which records a span for each call to a public method of the class while a Tracer is active."""
+    for name in dir(cls):
+        # Inherited methods are wrapped too, under this class' name, but static and class methods and properties are not
+        method = inspect.getattr_static(cls, name)
+
+        if not name.startswith('_') and isinstance(method, FunctionType):
+            setattr(cls, name, _instrument_method(f"{cls.__name__}.{name}", method))
+
+    return cls
+
+
+def _instrument_method(span_name: str, method: Callable) -> Callable:
+    """Wrap the method so that each call records a span, named span_name, when a Tracer is active."""
+
+    @functools.wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if _active_tracer is None:
+            return method(*args, **kwargs)
+
+        # The first DataFrame or Series argument after self is the data the method works on
+        data = next((arg for arg in list(args[1:]) + list(kwargs.values()) if isinstance(arg, (DataFrame, Series))), None)
+
+        with _active_tracer.span(span_name, data) as record:
+            result = method(*args, **kwargs)
+
+            output = next((value for value in result if isinstance(value, (DataFrame, Series))), None) if isinstance(result, tuple) else result
+            record['rows out'] = _row_count(output)
+            record['copied'] = _copied(data, output)
+
+        return result
+
+    return wrapper
+
+
+def _row_count(data: Any) -> int:
+    """Return the number of rows of a DataFrame or Series, or None for anything else."""
+    return len(data) if isinstance(data, (DataFrame, Series)) else None
+
+
+def _copied(data: Any, output: Any) -> bool:
+    """Return whether any column of the output holds a copy of the data of the same column of the input, rather than sharing its memory.
+
+    Returns None if either is not a DataFrame or Series, or they have no columns in common.
+    """
+    if not isinstance(data, (DataFrame, Series)) or not isinstance(output, (DataFrame, Series)):
+        return None
+
+    if output is data:
+        return False
+
+    inputs, outputs = _columns(data), _columns(output)
+    common = [name for name in outputs if name in inputs]
+
+    if not common:
+        return None
+
+    return any(not np.may_share_memory(_buffer(inputs[name]), _buffer(outputs[name])) for name in common)
+
+
+def _columns(data: Any) -> Dict[Any, Series]:
+    """Return the columns of a DataFrame, or a Series as its only column, keyed by name."""
+    return dict(data.items()) if isinstance(data, DataFrame) else {data.name: data}
+
+
+def _buffer(column: Series) -> np.ndarray:
+    """Return the numpy array holding the values of the column, without copying it: the codes of a category column, the values of
+    a nullable column, or the values of any other column.
+    """
+    values = column.array
+
+    for attribute in ['_ndarray', '_codes', '_data']:
+        if isinstance(getattr(values, attribute, None), np.ndarray):
+            return getattr(values, attribute)
+
+    return np.asarray(values)
+
+
+def _peak_rss_mb() -> float:
+    """Return the largest resident set size this process has had so far, in MB, or None where it cannot be measured."""
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports the peak in kilobytes, and macOS in bytes
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def _to_json_value(value: Any) -> Any:
+    """Convert the numpy values of a span, e.g. numpy integers, into their Python equivalents."""
+    return value.item() if isinstance(value, np.generic) else str(value)
@@ -0,0 +1,28 @@
+import importlib
+
+from types import ModuleType
+from typing import Any
+
+
+class LazyModule(ModuleType):
+    """A stand-in for a module which is only imported when one of its attributes is first used.
+
+    Heavy dependencies such as scipy, matplotlib and pyarrow take seconds to import, so modules which only need them in some methods
+    hold a LazyModule instead. Code using it is unchanged, e.g. stats.boxcox(...) imports scipy.stats on its first call.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._module = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        # Only called for attributes which are not set on the stand-in itself, i.e. those of the real module
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+
+        return getattr(self._module, attribute)
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a stand-in for the module, which imports it when it is first used."""
+    return LazyModule(name)
@@ -0,0 +1,460 @@
+import numpy as np
+import pandas as pd
+
+from cleaning_pipeline import CleaningPipeline, _kept_rows
+from db_utils import save_chunks_to_csv, save_chunks_to_parquet
+from functools import partial
+from fitted_transformers import FittedTransformer, LabelEncoderTransformer, NullImputer, RangeBinner, _to_python
+from instrumentation import span
+from pandas import DataFrame, Series
+from streaming_stats import HeavyHitterSketch, MomentSketch, QuantileSketch, ReservoirSample
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List
+
+if TYPE_CHECKING:
+    from partitioned import Scheduler
+
+
+class OutOfCorePipeline():
+    """Runs a CleaningPipeline over a loan book which is read one chunk at a time, so the whole table never has to fit in memory.
+
+    Several steps need statistics of every row before any chunk can be cleaned: the modes and medians of impute, the bin cutoffs,
+    the Box-Cox and Yeo-Johnson lambdas, the label_encode vocabularies, the null percentages of drop_null_columns, and the categories
+    of to_category, which must be the same in every chunk written out. So the chunks are read in two phases:
+
+        1. fit() reads every chunk through the steps and adds each chunk to mergeable sketches of those statistics, which are then
+           turned into the pipeline's fitted transformers. Means, null percentages, bin cutoffs, vocabularies and categories are exact.
+           Medians come from a QuantileSketch, modes from a HeavyHitterSketch, and lambdas are fitted to a ReservoirSample of
+           sample_size rows. Each is exact while the column has no more than quantile_k values, heavy_hitter_capacity distinct
+           values or sample_size values, and approximate beyond that.
+        2. transform() applies the fitted steps to each chunk in turn, and run_to_csv()/run_to_parquet() write them out as they go.
+
+    A statistic fitted to a column changed by an earlier fitted step, e.g. a Box-Cox lambda of an imputed column, can only be sketched
+    once the earlier one is known, so fit() reads the chunks again for each such level of dependency. Which rows are null mostly does
+    not depend on the fitted values, so rows and columns can be dropped in the same pass. The exception is bin, which makes values
+    outside its cutoffs null: statistics fitted to the rows kept by a drop_null_rows on a binned column wait for the next pass, so
+    loan_payments_cleaning.yaml is fitted in two passes.
+
+    Chunks are given as a function returning a fresh iterator over them, because they are read more than once, e.g.
+        lambda: pd.read_csv('loan_payments.csv', chunksize=100_000)
+    After fit(), pipeline.save_fitted() saves the statistics, and pipeline.transform() applies them to an extract held in memory.
+
+    Attributes:
+        pipeline (CleaningPipeline): the pipeline whose steps are run, and which holds the fitted statistics.
+        quantile_k (int): the size of each level of the median sketches.
+        heavy_hitter_capacity (int): the number of values counted by the mode sketches.
+        sample_size (int): the number of values sampled to fit each lambda.
+        seed (int): the seed of the median sketches and lambda samples.
+        categories (Dict[str, pd.CategoricalDtype]): the categories of each to_category column, keyed by '<step number>:<column name>'.
+        passes (int): the number of times fit() read the chunks.
+
+    Methods:
+        fit:
+            Read the chunks and fit every statistic of the pipeline.
+        transform:
+            Apply the fitted pipeline to each chunk, one at a time.
+        run_to_csv:
+            Fit to the chunks, then write them to a CSV file once cleaned.
+        run_to_parquet:
+            Fit to the chunks, then write them to a Parquet dataset once cleaned.
+
+    """
+
+    def __init__(self, pipeline: CleaningPipeline, quantile_k: int = 1000, heavy_hitter_capacity: int = 1000, sample_size: int = 100_000, seed: int = 0):
+        self.pipeline = pipeline
+        self.quantile_k = quantile_k
+        self.heavy_hitter_capacity = heavy_hitter_capacity
+        self.sample_size = sample_size
+        self.seed = seed
+        self.categories = {}
+        self.passes = 0
+
+    def fit(self, chunks: Callable[[], Iterable[DataFrame]], scheduler: 'Scheduler' = None) -> 'OutOfCorePipeline':
+        """Read every chunk returned by chunks() to fit the statistics of each step, reading them again while any depend on another.
+
+        With a scheduler from the partitioned module, chunks() returns a dict of partitions instead, each a DataFrame or a function
+        loading one. Every pass then sketches the partitions at the same time with scheduler.map, and merges their sketches.
+        """
+        self.pipeline.fitted, self.pipeline.dropped_null_columns, self.categories = {}, {}, {}
+        self.passes = 0
+
+        sketching = _SketchingPipeline(self)
+
+        while True:
+            with span(f"OutOfCorePipeline fit pass {self.passes}"):
+                sketching.start_pass()
+
+                if scheduler is None:
+                    for chunk in chunks():
+                        sketching.sketch(chunk)
+                else:
+                    # Each partition's samples are drawn with their own seed, so they are independent of each other
+                    tasks = {name: (number, partition) for number, (name, partition) in enumerate(chunks().items())}
+
+                    for sketched in scheduler.map(partial(_sketch_partition, executor=self), tasks).values():
+                        sketching.merge(sketched)
+
+                fitted_any = sketching.finish_pass()
+
+            self.passes += 1
+
+            if not sketching.deferred:
+                return self
+
+            # Each pass can fit at least the first statistic which was deferred, so a pass fitting nothing means the steps are wrong
+            if not fitted_any:
+                raise Exception("A pass over the chunks did not fit any of the remaining statistics of the pipeline.")
+
+    def transform(self, chunks: Iterable[DataFrame]) -> Iterator[DataFrame]:
+        """Clean each chunk with the fitted statistics, and yield it. Only one chunk is held in memory at a time."""
+        if self.passes == 0:
+            raise Exception("The pipeline has not been fitted to the chunks. Call fit() before transform().")
+
+        cleaning = _ChunkPipeline(self)
+
+        for chunk in chunks:
+            yield cleaning._apply(chunk, refit=False)
+
+    def run_to_csv(self, chunks: Callable[[], Iterable[DataFrame]], filepath: str) -> int:
+        """Fit the pipeline to the chunks, then clean them one at a time into a CSV file. Returns the number of rows written."""
+        self.fit(chunks)
+        return save_chunks_to_csv(_non_empty(self.transform(chunks())), filepath)
+
+    def run_to_parquet(self, chunks: Callable[[], Iterable[DataFrame]], directory: str) -> int:
+        """Fit the pipeline to the chunks, then clean them one at a time into a Parquet dataset partitioned by issue year.
+        Returns the number of rows written.
+        """
+        self.fit(chunks)
+        return save_chunks_to_parquet(_non_empty(self.transform(chunks())), directory)
+
+
+class _ChunkPipeline(CleaningPipeline):
+    """The steps of an OutOfCorePipeline's pipeline, applied to one chunk with its fitted statistics.
+
+    The fitted transformers are shared with the pipeline rather than copied. to_category uses the categories of the whole table,
+    so the category columns of every chunk have the same dtype.
+    """
+
+    def __init__(self, executor: OutOfCorePipeline):
+        super().__init__(executor.pipeline.steps)
+        self.fitted = executor.pipeline.fitted
+        self.dropped_null_columns = executor.pipeline.dropped_null_columns
+        self.categories = executor.categories
+
+    def _to_category(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            columns[name] = columns[name].astype(self.categories.get(f"{self._step_number}:{name}", 'category'))
+        return keep
+
+
+# What each step does to the nulls of a column: 'kept' where a null stays a null and a value stays a value, 'cleared' where no nulls
+# are left, and 'unknown' for bin, whose values outside the fitted cutoffs become null
+NULLS_AFTER_STEP = {'to_datetime': 'kept', 'to_category': 'kept', 'to_Int64': 'kept', 'map': 'cleared', 'impute': 'cleared', 'bin': 'unknown',
+                    'box_cox': 'cleared', 'yeo_johnson': 'kept', 'log': 'cleared', 'label_encode': 'cleared'}
+
+# Steps with statistics to fit, counting the categories of to_category
+FITTED_STEPS = ['to_category', 'impute', 'bin', 'box_cox', 'yeo_johnson', 'label_encode']
+
+# Steps which only look at whether values are null, or drop columns, so they run on the whole frame
+ROW_AND_COLUMN_STEPS = ['drop_columns', 'drop_null_columns', 'drop_null_rows']
+
+
+class _SketchingPipeline(_ChunkPipeline):
+    """The steps of an OutOfCorePipeline's pipeline, run over each chunk to add it to the sketches of the statistics not fitted yet.
+
+    A statistic which is not fitted yet is sketched from the column as it reaches the step, and the values the step gives the column
+    are then pending until the end of the pass. A pending column only keeps track of which of its rows are null, which is all that
+    dropping rows and columns needs, unless a bin step has left that unknown too. Statistics of pending columns, and those fitted to
+    rows kept by a drop_null_rows on a column whose nulls are unknown, are deferred to the next pass.
+    """
+
+    def __init__(self, executor: OutOfCorePipeline, seed: int = None):
+        super().__init__(executor)
+        self.executor = executor
+        self.seed = executor.seed if seed is None else seed
+        self.deferred = False
+
+    def start_pass(self) -> None:
+        """Start a new pass over the chunks, with empty sketches."""
+        self.sketches = {}
+        self.null_counts = {}
+        self.vocabularies = {}
+        self.deferred = False
+
+    def sketch(self, chunk: DataFrame) -> None:
+        """Run the steps over the chunk, adding it to the sketches of the statistics not fitted yet."""
+        self.pending = set()
+        self.unknown_nulls = set()
+        self.keep_pending = False
+        self.pending_null_columns = False
+        self._apply_steps(chunk, refit=False)
+
+    def merge(self, other: '_SketchingPipeline') -> None:
+        """Combine the sketches of a pass over other chunks into those of this pass."""
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = sketch
+
+        for number, null_counts in other.null_counts.items():
+            if number in self.null_counts:
+                self.null_counts[number].merge(null_counts)
+            else:
+                self.null_counts[number] = null_counts
+
+        for key, categories in other.vocabularies.items():
+            self.vocabularies[key] = self.vocabularies[key].union(categories) if key in self.vocabularies else categories
+
+        self.deferred |= other.deferred
+
+    def finish_pass(self) -> bool:
+        """Turn the sketches of this pass into fitted statistics, and return whether there were any."""
+        for key, sketch in self.sketches.items():
+            self.fitted[key] = sketch.fitted()
+
+        for number, null_counts in self.null_counts.items():
+            self.dropped_null_columns[number] = null_counts.columns_to_drop(self.steps[number]['threshold'])
+
+        for key, categories in self.vocabularies.items():
+            self.categories[key] = pd.CategoricalDtype(categories)
+
+        return bool(self.sketches or self.null_counts or self.vocabularies)
+
+    def _run_step(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        if step['step'] in ROW_AND_COLUMN_STEPS:
+            return super()._run_step(step, columns, keep)
+
+        # Run the step one column at a time, so only the columns whose values are not known are left pending
+        for name in step['columns'] if 'columns' in step else [step['column']]:
+            if name not in self.pending:
+                keep = super()._run_step(dict(step, columns=[name]) if 'columns' in step else step, columns, keep)
+                continue
+
+            # Statistics fitted to the column have to wait until its values are known
+            key = f"{self._step_number}:{name}"
+            if step['step'] in FITTED_STEPS and key not in self.fitted and key not in self.categories:
+                self.deferred = True
+
+            columns[name] = self._leave_pending(name, columns[name])
+
+        return keep
+
+    def _fitted_transformer(self, name: str, transformer: FittedTransformer, column: Series, keep: np.ndarray) -> FittedTransformer:
+        key = f"{self._step_number}:{name}"
+
+        if key in self.fitted:
+            return self.fitted[key]
+
+        # Rows are only dropped on the right nulls once every bin before them is fitted
+        if self.keep_pending:
+            self.deferred = True
+        else:
+            self.sketches.setdefault(key, _sketch_for(transformer, self.executor, self.seed)).update(_kept_rows(column, keep))
+
+        return _PendingTransformer(self, name)
+
+    def _leave_pending(self, name: str, column: Series) -> Series:
+        """Return the stand-in for the column the current step gives, whose values are pending, holding only which rows are null."""
+        nulls = NULLS_AFTER_STEP[self.steps[self._step_number]['step']]
+        self.pending.add(name)
+
+        if nulls == 'unknown':
+            self.unknown_nulls.add(name)
+        elif nulls == 'cleared':
+            self.unknown_nulls.discard(name)
+
+        values = np.zeros(len(column)) if nulls == 'cleared' else np.where(column.isna().to_numpy(), np.nan, 0.0)
+        return Series(values, index=column.index, name=column.name)
+
+    def _to_category(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        for name in step['columns']:
+            key = f"{self._step_number}:{name}"
+
+            if key not in self.categories:
+                # As astype('category') does on the whole column, the categories include the values of rows which are dropped later
+                categories = pd.Index(columns[name].dropna().unique())
+                self.vocabularies[key] = self.vocabularies[key].union(categories) if key in self.vocabularies else categories.sort_values()
+
+        return super()._to_category(step, columns, keep)
+
+    def _drop_null_columns(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        if self._step_number in self.dropped_null_columns:
+            return super()._drop_null_columns(step, columns, keep)
+
+        # The null percentages cannot be counted while the kept rows, the nulls of a column, or the columns an earlier
+        # drop_null_columns removes are not known
+        if self.keep_pending or self.unknown_nulls or self.pending_null_columns:
+            self.deferred = True
+            return keep
+
+        # Nothing is dropped until the end of the pass, as the null percentages of the whole table are not known before then
+        self.null_counts.setdefault(self._step_number, _NullCountSketch()).update(columns, keep)
+        self.pending_null_columns = True
+        return keep
+
+    def _drop_null_rows(self, step: dict, columns: Dict[str, Series], keep: np.ndarray) -> np.ndarray:
+        if any(name in self.unknown_nulls for name in step['columns']):
+            self.keep_pending = True
+
+        return super()._drop_null_rows(step, columns, keep)
+
+
+class _PendingTransformer(FittedTransformer):
+    """Stands in for a transformer whose statistics are still being sketched, giving a column which only shows which rows are null."""
+
+    def __init__(self, sketching: _SketchingPipeline, name: str):
+        super().__init__()
+        self.sketching = sketching
+        self.name = name
+
+    def transform(self, column: Series) -> Series:
+        return self.sketching._leave_pending(self.name, column)
+
+
+def load_chunk(chunk: Any) -> DataFrame:
+    """Return the chunk, calling it first if it is a function which loads one, as the partitions given to a scheduler may be."""
+    return chunk() if callable(chunk) else chunk
+
+
+def _sketch_partition(task: (int, Any), executor: OutOfCorePipeline) -> _SketchingPipeline:
+    """Sketch the statistics which the executor has not fitted yet of one numbered partition, in a scheduler's worker."""
+    number, partition = task
+    sketching = _SketchingPipeline(executor, seed=int(np.random.SeedSequence([executor.seed, number]).generate_state(1)[0]))
+    sketching.start_pass()
+    sketching.sketch(load_chunk(partition))
+    return sketching
+
+
+def _non_empty(chunks: Iterable[DataFrame]) -> Iterator[DataFrame]:
+    """Yield the chunks which still have rows, as a chunk whose rows were all dropped has nothing to write."""
+    return (chunk for chunk in chunks if len(chunk) > 0)
+
+
+########## ########## ##########
+# Sketches of the statistic each kind of fitted transformer learns, which give the fitted transformer at the end of a pass.
+########## ########## #########
+
+def _sketch_for(transformer: FittedTransformer, executor: OutOfCorePipeline, seed: int) -> '_ImputerSketch':
+    """Return an empty sketch of the statistic the transformer learns, with the sizes set by the executor."""
+    if isinstance(transformer, NullImputer):
+        return _ImputerSketch(transformer.params['strategy'], executor, seed)
+    if isinstance(transformer, RangeBinner):
+        return _RangeSketch(transformer.params['num_bins'])
+    if isinstance(transformer, LabelEncoderTransformer):
+        return _VocabularySketch()
+
+    # The Box-Cox and Yeo-Johnson lambdas are fitted to a sample of the values
+    return _SampleSketch(transformer, executor, seed)
+
+
+class _ImputerSketch():
+    """The value a NullImputer fills nulls with: the exact mean, a median from a QuantileSketch, or a mode from a HeavyHitterSketch."""
+
+    def __init__(self, strategy: str, executor: OutOfCorePipeline, seed: int):
+        self.strategy = strategy
+
+        if strategy == 'mean':
+            self.sketch = MomentSketch()
+        elif strategy == 'median':
+            self.sketch = QuantileSketch(executor.quantile_k, seed)
+        else:
+            self.sketch = HeavyHitterSketch(executor.heavy_hitter_capacity)
+
+    def update(self, column: Series) -> None:
+        if self.strategy == 'mode':
+            self.sketch.update(column.dropna().to_numpy())
+        else:
+            self.sketch.update(column.to_numpy(dtype=float, na_value=np.nan))
+
+    def merge(self, other: '_ImputerSketch') -> None:
+        self.sketch.merge(other.sketch)
+
+    def fitted(self) -> NullImputer:
+        if self.strategy == 'mean':
+            value = self.sketch.mean if self.sketch.count else np.nan
+        elif self.strategy == 'median':
+            value = self.sketch.median()
+        else:
+            value = self.sketch.mode()
+
+        return NullImputer(self.strategy, _to_python(value))
+
+
+class _RangeSketch():
+    """The smallest and largest non-zero values of a column, which are all RangeBinner needs to find its cutoffs."""
+
+    def __init__(self, num_bins: int):
+        self.num_bins = num_bins
+        self.min, self.max = np.nan, np.nan
+
+    def update(self, column: Series) -> None:
+        values = column.to_numpy(dtype=float, na_value=np.nan)
+        values = values[(values != 0) & ~np.isnan(values)]
+
+        if len(values):
+            self.min, self.max = np.fmin(self.min, values.min()), np.fmax(self.max, values.max())
+
+    def merge(self, other: '_RangeSketch') -> None:
+        self.min, self.max = np.fmin(self.min, other.min), np.fmax(self.max, other.max)
+
+    def fitted(self) -> RangeBinner:
+        return RangeBinner(self.num_bins).fit(Series([self.min, self.max]))
+
+
+class _VocabularySketch():
+    """Every distinct value of a column, which is the vocabulary a LabelEncoderTransformer learns."""
+
+    def __init__(self):
+        self.values = set()
+
+    def update(self, column: Series) -> None:
+        self.values.update(column.dropna().unique())
+
+    def merge(self, other: '_VocabularySketch') -> None:
+        self.values.update(other.values)
+
+    def fitted(self) -> LabelEncoderTransformer:
+        return LabelEncoderTransformer().fit(Series(list(self.values), dtype=object))
+
+
+class _SampleSketch():
+    """A ReservoirSample of a column, to fit a transformer such as a BoxCoxTransformer to once the pass is over."""
+
+    def __init__(self, transformer: FittedTransformer, executor: OutOfCorePipeline, seed: int):
+        self.transformer = transformer
+        self.sample = ReservoirSample(executor.sample_size, seed)
+
+    def update(self, column: Series) -> None:
+        self.sample.update(column.to_numpy(dtype=float, na_value=np.nan))
+
+    def merge(self, other: '_SampleSketch') -> None:
+        self.sample.merge(other.sample)
+
+    def fitted(self) -> FittedTransformer:
+        return self.transformer.fit(Series(self.sample.values))
+
+
+class _NullCountSketch():
+    """The number of kept rows, and of nulls in each column among them, which decide the columns a drop_null_columns step removes."""
+
+    def __init__(self):
+        self.rows = 0
+        self.null_counts = {}
+
+    def update(self, columns: Dict[str, Series], keep: np.ndarray) -> None:
+        self.rows += len(next(iter(columns.values()))) if keep is None else int(keep.sum())
+
+        for name, column in columns.items():
+            self.null_counts[name] = self.null_counts.get(name, 0) + int(_kept_rows(column.isna(), keep).sum())
+
+    def merge(self, other: '_NullCountSketch') -> None:
+        self.rows += other.rows
+
+        for name, count in other.null_counts.items():
+            self.null_counts[name] = self.null_counts.get(name, 0) + count
+
+    def columns_to_drop(self, threshold: float) -> List[str]:
+        if self.rows == 0:
+            return []
+
+        return [name for name, count in self.null_counts.items() if count / self.rows * 100 > threshold]
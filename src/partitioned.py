@@ -0,0 +1,194 @@
+import os
+import pandas as pd
+import re
+
+from cleaning_pipeline import CleaningPipeline
+from column_executor import ColumnExecutor
+from db_utils import load_from_parquet
+from df_transform import DataFrameTransform
+from functools import partial
+from instrumentation import instrumented
+from out_of_core import OutOfCorePipeline, load_chunk
+from pandas import DataFrame
+from streaming_stats import StreamingDataFrameInfo
+from typing import Any, Callable, Dict, List
+
+
+class Scheduler():
+    """Decides where the tasks of a PartitionedRunner run. This is the seam for a distributed backend.
+
+    A task is a picklable function and one partition, which the function is called on. A subclass only has to implement map(),
+    e.g. by submitting each task to a Dask or Ray cluster and gathering the results. Partitions sent to other machines should be
+    functions which load the data, such as those made by PartitionedRunner.from_parquet, rather than DataFrames.
+
+    Methods:
+        map:
+            Call a function on each partition and return the results, keyed by partition name.
+
+    """
+
+    def map(self, func: Callable[[Any], Any], partitions: Dict[str, Any]) -> Dict[str, Any]:
+        """Call func on each partition and return the results in a dict keyed by partition name, in the same order as partitions."""
+        raise NotImplementedError
+
+
+class LocalScheduler(Scheduler):
+    """Runs the tasks on this machine, in worker processes by default, using a ColumnExecutor.
+
+    Forked workers read DataFrame partitions through copy-on-write memory, so only the results are sent back. With kind='serial',
+    everything runs in this process, which gives the same results and is easier to debug.
+
+    Attributes:
+        executor (ColumnExecutor): runs the tasks.
+
+    Methods:
+        map:
+            Call a function on each partition and return the results, keyed by partition name.
+
+    """
+
+    def __init__(self, kind: str = 'process', max_workers: int = None):
+        self.executor = ColumnExecutor(kind, max_workers)
+
+    def map(self, func: Callable[[Any], Any], partitions: Dict[str, Any]) -> Dict[str, Any]:
+        return self.executor.map(func, partitions)
+
+
+@instrumented
+class PartitionedRunner():
+    """Runs the profiling, cleaning and metrics of the EDA on partitions of the loan book, e.g. one per issue_date year, and combines
+    the results as if they had been run on the whole table.
+
+    Each partition is processed by a task of the scheduler, and the partial results are merged in this process:
+        profile: each partition's StreamingDataFrameInfo, whose null counts are summed and moments merged, for null percentages and skew.
+        clean: a CleaningPipeline fitted through an OutOfCorePipeline, whose sketches of each partition are merged into statistics
+               of the whole table. Every partition is then cleaned with the same statistics, and the cleaned partitions concatenated.
+        portfolio_metrics: each partition's DataFrameTransform.portfolio_metric_sums, which are added up before the percentages.
+    map_partitions runs any other function on every partition.
+
+    Partitions are DataFrames, or functions returning one, which are only called by the task reading them.
+
+    Attributes:
+        partitions (Dict[str, Any]): the partitions, keyed by name, e.g. 'issue_year=2021'.
+        scheduler (Scheduler): runs the tasks, a LocalScheduler using worker processes by default.
+
+    Methods:
+        from_dataframe:
+            Partition a DataFrame by the year of a date column.
+        from_parquet:
+            Make one partition for each year of a Parquet dataset written by save_to_parquet.
+        map_partitions:
+            Call a function on every partition.
+        profile:
+            Return the null counts, moments and approximate quantiles of the whole table.
+        clean:
+            Fit a CleaningPipeline to the whole table, and return every partition cleaned with it.
+        portfolio_metrics:
+            Return DataFrameTransform.portfolio_metrics of the whole table.
+
+    """
+
+    def __init__(self, partitions: Dict[str, Any], scheduler: Scheduler = None):
+        print("Loaded PartitionedRunner()...")
+
+        self.partitions = partitions
+        self.scheduler = scheduler or LocalScheduler()
+
+    @classmethod
+    def from_dataframe(cls, df: DataFrame, partition_column: str = 'issue_date', date_format: str = '%b-%Y', scheduler: Scheduler = None) -> 'PartitionedRunner':
+        """Partition the DataFrame by the year of partition_column, a datetime column or a string column in date_format, as
+        save_to_parquet does. Rows without a year go into the partition 'issue_year=None'.
+        """
+        dates = df[partition_column]
+
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, format=date_format, errors='coerce')
+
+        years = dates.dt.year.astype('Int64')
+        partitions = {f"issue_year={year}": partition for year, partition in df.groupby(years, sort=True)}
+
+        if years.isna().any():
+            partitions['issue_year=None'] = df[years.isna().to_numpy()]
+
+        return cls(partitions, scheduler)
+
+    @classmethod
+    def from_parquet(cls, directory: str, columns: List[str] = None, scheduler: Scheduler = None) -> 'PartitionedRunner':
+        """Make one partition for each issue_year folder of a dataset written by save_to_parquet. Each task loads its own year,
+        so the table is never loaded into this process.
+        """
+        years = sorted(int(match.group(1)) for match in (re.fullmatch(r'issue_year=(\d+)', name) for name in os.listdir(directory)) if match)
+        partitions = {f"issue_year={year}": partial(load_from_parquet, directory, columns=columns, years=[year]) for year in years}
+
+        return cls(partitions, scheduler)
+
+    def map_partitions(self, func: Callable[[DataFrame], Any]) -> Dict[str, Any]:
+        """Call func on every partition with the scheduler, and return the results keyed by partition name.
+
+        For worker processes, func must be picklable, e.g. a module level function, or a partial of one.
+        """
+        return self.scheduler.map(partial(_call_on_partition, func), self.partitions)
+
+    def profile(self, quantile_k: int = 1000) -> StreamingDataFrameInfo:
+        """Profile every partition, and return the merged StreamingDataFrameInfo of the whole table. Null counts and moments, and
+        so null percentages and skew, are exact, and quantiles are approximate.
+        """
+        profile = StreamingDataFrameInfo(quantile_k)
+
+        for partition_profile in self.map_partitions(partial(_profile_partition, quantile_k=quantile_k)).values():
+            profile.merge(partition_profile)
+
+        return profile
+
+    def clean(self, pipeline: CleaningPipeline, **sketch_options: Any) -> DataFrame:
+        """Fit the pipeline to the whole table, then clean every partition with it and return them concatenated in partition order.
+
+        The statistics are fitted from sketches of every partition, as OutOfCorePipeline.fit does, and are left in the pipeline, so
+        pipeline.save_fitted() can save them. sketch_options, such as sample_size, are passed to the OutOfCorePipeline.
+        """
+        executor = OutOfCorePipeline(pipeline, **sketch_options).fit(lambda: self.partitions, self.scheduler)
+        cleaned = self.scheduler.map(partial(_clean_partition, executor=executor), self.partitions)
+
+        return pd.concat(cleaned.values())
+
+    def portfolio_metrics(self, by: List[str] = None, group_statuses: bool = False) -> DataFrame:
+        """Return DataFrameTransform.portfolio_metrics of the whole table, from the sums of each partition. The partitions must be
+        cleaned, as for portfolio_metrics.
+        """
+        sums = pd.concat(self.map_partitions(partial(_portfolio_metric_sums, by=by, group_statuses=group_statuses)).values())
+
+        # The partitions' groups overlap, e.g. every year has Fully Paid loans, so the sums of each group are added together
+        sums = sums.groupby(level=list(range(sums.index.nlevels)), observed=True, sort=True).sum()
+
+        return _df_transform().portfolio_metrics_from_sums(sums)
+
+
+def _call_on_partition(func: Callable[[DataFrame], Any], partition: Any) -> Any:
+    """Load the partition if it is not a DataFrame already, and call func on it."""
+    return func(load_chunk(partition))
+
+
+def _profile_partition(df: DataFrame, quantile_k: int) -> StreamingDataFrameInfo:
+    return StreamingDataFrameInfo(quantile_k).update(df)
+
+
+def _clean_partition(partition: Any, executor: OutOfCorePipeline) -> DataFrame:
+    return next(executor.transform([load_chunk(partition)]))
+
+
+def _portfolio_metric_sums(df: DataFrame, by: List[str], group_statuses: bool) -> DataFrame:
+    return _df_transform().portfolio_metric_sums(df, by, group_statuses)
+
+
+# The DataFrameTransform used by this process, created when it is first needed
+_transform = None
+
+
+def _df_transform() -> DataFrameTransform:
+    """Return a DataFrameTransform, creating it only once in each process."""
+    global _transform
+
+    if _transform is None:
+        _transform = DataFrameTransform()
+
+    return _transform
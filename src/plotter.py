@@ -1,18 +1,35 @@
-import matplotlib.pyplot as plt
-import missingno as msno 
 import numpy as np
-import seaborn as sns
+import pandas as pd
 
+from instrumentation import instrumented
+from lazy_imports import lazy_import
 from pandas import DataFrame, Series
-from statsmodels.graphics.gofplots import qqplot
 from typing import List
 
+# The plotting libraries are only imported when the first plot is drawn
+plt = lazy_import('matplotlib.pyplot')
+msno = lazy_import('missingno')
+sns = lazy_import('seaborn')
+stats = lazy_import('scipy.stats')
+gofplots = lazy_import('statsmodels.graphics.gofplots')
 
+
+@instrumented
 class Plotter():
     """A class for generating plots to visualise aspects of a DataFrame. 
     
+    Histograms, Q-Q plots and pair plots of large columns can be drawn from a summary of the data rather than every value, so 
+    they take about the same time to draw whatever the number of rows. In 'binned' mode, histograms are counted with numpy, the 
+    KDE curve is estimated by convolving the binned counts with a Gaussian kernel using an FFT, Q-Q plots are drawn from a fixed 
+    number of quantiles, and pair plots are drawn from a sample of rows. 'exact' mode passes every value to seaborn and statsmodels, 
+    as before, and 'auto' uses binned mode for columns with more than exact_max_rows rows.
+    
     Attributes:
-        None
+        render_mode (str): 'auto', 'binned' or 'exact'.
+        exact_max_rows (int): the most rows 'auto' mode draws exactly.
+        quantile_points (int): the number of quantiles in a binned Q-Q plot.
+        pair_plot_sample (int): the number of rows sampled for a binned pair plot.
+        show (bool): whether finished figures are shown. Set to False when figures are saved instead, e.g. by a ReportBuilder.
         
     Methods:
         plot_histogram_quad: 
@@ -29,6 +46,8 @@ class Plotter():
             Generate a bar plot of the DataFrame, for columns x and y.
         correlation_matrix: 
             Computes and plots correlation matrix, and returns the numerical matrix.
+        plot_correlation_matrix:
+            Plots a correlation matrix which has already been computed, e.g. by a CorrelationEngine.
         show_null_bar_chart: 
             Generates bar chart showing null values for each column in the DataFrame.
         stacked_bar_plot:
@@ -46,9 +65,19 @@ class Plotter():
                 
     """
     
-    def __init__(self):
+    def __init__(self, render_mode: str = 'auto', exact_max_rows: int = 100_000, quantile_points: int = 1000, pair_plot_sample: int = 5000, show: bool = True):
         print("Loaded Plotter()...")    
         
+        # Raise an error if the render mode is not recognised
+        if render_mode not in ['auto', 'binned', 'exact']:
+            raise Exception(f"The parameter 'render_mode' accepts either 'auto', 'binned' or 'exact'. You entered '{render_mode}'.")
+        
+        self.render_mode = render_mode
+        self.exact_max_rows = exact_max_rows
+        self.quantile_points = quantile_points
+        self.pair_plot_sample = pair_plot_sample
+        self.show = show
+        
     def plot_histogram_quad(self, df: DataFrame):
         """Plots histograms for 4 columns in a quadrant."""
         fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(8, 8))
@@ -65,7 +94,7 @@ class Plotter():
         t4.legend()
         
         plt.tight_layout()
-        plt.show()
+        self._show()
         
     def plot_histogram_before_and_after_transform(self, column_before: Series, column_after: Series, transform_name: str):
         """Plots histograms before and after a transform."""
@@ -85,7 +114,7 @@ class Plotter():
         t2.legend()
             
         plt.tight_layout()
-        plt.show()
+        self._show()
         
     def plot_histogram_and_qq(self, column: Series):
         """Plots histogram and Q-Q plot for column."""
@@ -105,14 +134,20 @@ class Plotter():
     def qq_plot(self, column_data: Series, ax=None):
         """Generates Q-Q plot for column data."""
 
+        if self._use_binned(column_data):
+            return _binned_qq_plot(column_data, self.quantile_points, ax)
+        
         if ax is None:
-            qqplot(column_data , scale=1 ,line='q', fit=True)
+            gofplots.qqplot(column_data , scale=1 ,line='q', fit=True)
         else:
-            qqplot(column_data, scale=1, line='q', fit=True, ax=ax)        
+            gofplots.qqplot(column_data, scale=1, line='q', fit=True, ax=ax)        
         
     def histogram(self, data: Series, bins=15, kde=True, ax=None, label=None):
         """Plots a histogram for provided data."""
         
+        if self._use_binned(data):
+            return _binned_histogram(data, bins, kde, ax, label)
+        
         if ax is None:
             return sns.histplot(data, bins=bins, kde=kde, label=label)
         else:
@@ -127,6 +162,13 @@ class Plotter():
 
         # Compute the correlation matrix
         corr = data.corr()
+        
+        self.plot_correlation_matrix(corr, title)
+        
+        return corr
+    
+    def plot_correlation_matrix(self, corr: DataFrame, title: str="Correlation matrix"):
+        """Plots a correlation matrix which has already been computed, e.g. by CorrelationEngine.compute()."""
 
         # Generate a mask for the upper triangle
         mask = np.zeros_like(corr, dtype=np.bool_)
@@ -142,9 +184,7 @@ class Plotter():
         # Draw the heatmap
         sns.heatmap(corr, mask=mask, square=True, linewidths=.5, annot=True, cmap=cmap, fmt='.2f')
         
-        plt.show()
-        
-        return corr
+        self._show()
         
     def show_null_bar_chart(self, dataframe: DataFrame):
         """Generates bar chart showing null values for each column in the DataFrame."""
@@ -155,7 +195,7 @@ class Plotter():
         # Plot bar plot
         data.plot(x='Data', kind='bar', stacked=True, title=title)
 
-        plt.show()
+        self._show()
     
     ########## ########## ##########
     # The following functions may have been used at some point in the project, but do not feature in the current EDA Notebook.    
@@ -176,7 +216,10 @@ class Plotter():
         return skew, ax
     
     def pair_plot(self, dataframe: DataFrame):
-        """Creates pairwise plot of all columns."""
+        """Creates pairwise plot of all columns. In binned mode, only a sample of pair_plot_sample rows is plotted."""
+        if self.render_mode != 'exact' and len(dataframe) > self.pair_plot_sample and (self.render_mode == 'binned' or len(dataframe) > self.exact_max_rows):
+            dataframe = dataframe.sample(self.pair_plot_sample, random_state=0)
+            
         return sns.pairplot(dataframe)
     
     def box_and_whiskers(self, column: Series, ax=None):
@@ -195,4 +238,101 @@ class Plotter():
         self.histogram(column, 15, ax=ax2)
         
         plt.tight_layout()
-        plt.show()
\ No newline at end of file
+        self._show()
+    
+    def _show(self):
+        """Show the finished figure, unless show is False, in which case it is left open to be saved."""
+        if self.show:
+            plt.show()
+    
+    def _use_binned(self, column: Series) -> bool:
+        """Return True if the numeric column should be drawn from a summary rather than every value."""
+        if self.render_mode == 'exact' or not pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+            return False
+        
+        return self.render_mode == 'binned' or len(column) > self.exact_max_rows
+
+
+def _finite_values(column: Series) -> np.ndarray:
+    """Return the finite values of a numeric column as floats, leaving out nulls and infinities."""
+    values = column.to_numpy(dtype=float, na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+def _binned_histogram(column: Series, bins: int, kde: bool, ax, label: str):
+    """Plot a histogram from counts made with numpy, and a KDE curve estimated from the binned values, in the style of sns.histplot."""
+    values = _finite_values(column)
+    counts, edges = np.histogram(values, bins=bins)
+    
+    # Seaborn draws the pre-counted bars when each bin centre is weighted by its count
+    bars = DataFrame({column.name: (edges[:-1] + edges[1:]) / 2, 'count': counts})
+    ax = sns.histplot(bars, x=column.name, weights='count', bins=list(edges), ax=ax, label=label)
+    
+    if kde:
+        # sns.histplot stops its KDE curve at the smallest and largest values
+        curve = _binned_kde(values, cut=0)
+        
+        if curve is not None:
+            grid, density = curve
+            # Scale the density to the bar heights, as sns.histplot does for counts
+            ax.plot(grid, density * len(values) * (edges[1] - edges[0]), color=ax.patches[0].get_facecolor()[:3] if ax.patches else None)
+    
+    return ax
+
+
+def _binned_kde(values: np.ndarray, grid_size: int = 200, cut: float = 3):
+    """Return a grid and the Gaussian KDE of the values on it, with Scott's bandwidth as seaborn uses, or None if there is no spread.
+    
+    The values are shared linearly between their two nearest grid points, then the grid counts are convolved with the kernel using 
+    an FFT. This takes one pass over the values, and a convolution whose size depends only on grid_size.
+    """
+    if len(values) < 2 or values.std() == 0:
+        return None
+    
+    bandwidth = values.std(ddof=1) * len(values) ** (-1 / 5)
+    low, high = values.min() - cut * bandwidth, values.max() + cut * bandwidth
+    grid, step = np.linspace(low, high, grid_size, retstep=True)
+    
+    # Share each value between the grid points either side of it, in proportion to how close it is
+    position = (values - low) / step
+    left = np.minimum(position.astype(np.int64), grid_size - 2)
+    right_share = position - left
+    counts = np.bincount(left, weights=1 - right_share, minlength=grid_size) + np.bincount(left + 1, weights=right_share, minlength=grid_size)
+    
+    # The kernel at every distance between two grid points, from -(grid_size - 1) to grid_size - 1 steps
+    offsets = np.arange(-(grid_size - 1), grid_size) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    
+    # Zero padding to at least the length of the full convolution stops the FFT wrapping around
+    length = 1 << int(np.ceil(np.log2(3 * grid_size - 2)))
+    convolved = np.fft.irfft(np.fft.rfft(counts, length) * np.fft.rfft(kernel, length), length)
+    
+    return grid, convolved[grid_size - 1:2 * grid_size - 1] / len(values)
+
+
+def _binned_qq_plot(column: Series, quantile_points: int, ax):
+    """Plot a normal Q-Q plot from a fixed number of quantiles of the column, standardised and with a line through the quartiles, as 
+    qqplot(line='q', fit=True) draws them.
+    """
+    values = _finite_values(column)
+    probabilities = (np.arange(1, quantile_points + 1) - 0.5) / quantile_points
+    
+    sample = (np.quantile(values, probabilities) - values.mean()) / values.std()
+    theoretical = stats.norm.ppf(probabilities)
+    
+    if ax is None:
+        ax = plt.figure().add_subplot()
+    
+    ax.plot(theoretical, sample, marker='o', linestyle='none', markerfacecolor='C0', markeredgecolor='C0')
+    
+    # The line through the first and third quartiles of both
+    sample_quartiles = (np.quantile(values, [0.25, 0.75]) - values.mean()) / values.std()
+    theoretical_quartiles = stats.norm.ppf([0.25, 0.75])
+    slope = np.diff(sample_quartiles)[0] / np.diff(theoretical_quartiles)[0]
+    intercept = sample_quartiles[0] - slope * theoretical_quartiles[0]
+    ax.plot(theoretical, intercept + slope * theoretical, 'r-')
+    
+    ax.set_xlabel("Theoretical Quantiles")
+    ax.set_ylabel("Sample Quantiles")
+    
+    return ax
@@ -0,0 +1,177 @@
+import base64
+import html
+import matplotlib.pyplot as plt
+import os
+import re
+
+from column_executor import ColumnExecutor
+from functools import partial
+from plotter import Plotter
+from typing import Any, Dict, List
+
+
+class ReportBuilder():
+    """Renders Plotter figures to image files, and optionally a single HTML report, without a display, for scheduled EDA runs.
+
+    Each figure is added as a Plotter method name and its arguments, then render() calls the methods on a Plotter with show=False, 
+    saves every figure they draw and closes it, so memory does not grow however many charts are made. Figures are independent, so 
+    with executor='process' they are drawn in parallel worker processes, which read their arguments through the ColumnExecutor's 
+    forked copy-on-write memory. Only those workers switch to the non-interactive Agg backend, so the backend of the process using 
+    the ReportBuilder, e.g. a notebook's, is left as it is, and figures drawn in it are closed before they can be shown. Plotter draws 
+    through pyplot, whose current figure and list of open figures are shared by every thread of a process, so figures cannot be 
+    drawn by threads at once and executor='thread' is not accepted.
+
+    Attributes:
+        output_directory (str): the directory the images and report are written to.
+        formats (List[str]): the image formats to save, from 'png' and 'svg'.
+        html_report (bool): whether to also write report.html, holding every figure.
+        dpi (int): the resolution of png images.
+        plotter_options (dict): the arguments used to create the Plotter, e.g. {'render_mode': 'binned'}.
+        executor (ColumnExecutor): draws the figures, one per task.
+        figures (List[dict]): the figures added so far.
+
+    Methods:
+        add:
+            Add a figure drawn by a Plotter method.
+        render:
+            Draw every figure, save the images and write the report.
+
+    """
+
+    FORMATS = ['png', 'svg']
+    EXECUTORS = ['serial', 'process']
+
+    def __init__(self, output_directory: str, formats: List[str] = None, html_report: bool = True, dpi: int = 100,
+                 plotter_options: dict = None, executor: str = 'process', max_workers: int = None):
+        print("Loaded ReportBuilder()...")
+        
+        formats = ['png'] if formats is None else formats
+        
+        # Threads would draw on, save and close each other's figures, as pyplot's state belongs to the whole process
+        if executor not in self.EXECUTORS:
+            raise Exception(f"The parameter 'executor' accepts either 'serial' or 'process'. You entered '{executor}'.")
+
+        # Raise an error if an image format is not recognised
+        for image_format in formats:
+            if image_format not in self.FORMATS:
+                raise Exception(f"Unknown image format '{image_format}'. Formats must be from {self.FORMATS}.")
+
+        self.output_directory = output_directory
+        self.formats = formats
+        self.html_report = html_report
+        self.dpi = dpi
+        self.plotter_options = plotter_options or {}
+        self.executor = ColumnExecutor(executor, max_workers)
+        self.figures = []
+
+    def add(self, title: str, method: str, *args: Any, **kwargs: Any) -> None:
+        """Add a figure drawn by calling the Plotter method with the arguments, e.g. add("Loan amounts", 'histogram', df['loan_amount'])."""
+        if not callable(getattr(Plotter, method, None)):
+            raise Exception(f"Plotter has no method '{method}'.")
+
+        self.figures.append({'title': title, 'method': method, 'args': args, 'kwargs': kwargs})
+
+    def render(self) -> Dict[str, List[str]]:
+        """Draw every figure added, save them in each format and write report.html if html_report is True.
+
+        Returns the paths of the images saved for each figure, keyed by the file name they start with, which is the position and title
+        of the figure. A Plotter method which draws several figures saves each of them.
+        """
+        os.makedirs(self.output_directory, exist_ok=True)
+
+        # Name each file by the figure's position as well as its title, so figures with the same title are kept apart
+        stems = [f"{number:03d}_{_slug(figure['title'])}" for number, figure in enumerate(self.figures)]
+        tasks = {stem: dict(figure, stem=stem) for stem, figure in zip(stems, self.figures)}
+
+        render = partial(_render_figure, plotter_options=self.plotter_options, directory=self.output_directory, formats=self.formats, dpi=self.dpi, 
+                         use_agg=self.executor.kind == 'process')
+        results = self.executor.map(render, tasks)
+
+        if self.html_report:
+            self._write_html(tasks, results)
+
+        return {stem: [path for paths in images for path in paths] for stem, (images, _) in results.items()}
+
+    def _write_html(self, tasks: Dict[str, dict], results: Dict[str, tuple]) -> None:
+        """Write report.html, embedding the first image format of every figure, with any message its Plotter method returned."""
+        sections = []
+
+        for name, (images, message) in results.items():
+            sections.append(f"<h2>{html.escape(tasks[name]['title'])}</h2>")
+
+            if message:
+                sections.append(f"<p>{html.escape(message)}</p>")
+
+            for paths in images:
+                sections.append(_embed_image(paths[0]))
+
+        with open(os.path.join(self.output_directory, 'report.html'), 'w') as f:
+            f.write("<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><title>EDA report</title></head>\n<body>\n")
+            f.write("\n".join(sections))
+            f.write("\n</body>\n</html>\n")
+
+
+def _render_figure(figure: dict, plotter_options: dict, directory: str, formats: List[str], dpi: int, use_agg: bool = False) -> (List[List[str]], str):
+    """Call the figure's Plotter method, save every figure it draws in each format, then close them.
+
+    use_agg switches this process to the Agg backend first, for worker processes, which may have inherited a GUI backend that cannot
+    be used after forking. Returns the image paths of each figure drawn, and the method's return value if it is a message.
+    """
+    if use_agg and plt.get_backend().lower() != 'agg':
+        plt.switch_backend('Agg')
+    
+    existing = set(plt.get_fignums())
+
+    try:
+        returned = getattr(_get_plotter(plotter_options), figure['method'])(*figure['args'], **figure['kwargs'])
+
+        new_figures = [number for number in plt.get_fignums() if number not in existing]
+        images = []
+
+        for count, number in enumerate(new_figures):
+            stem = figure['stem'] if len(new_figures) == 1 else f"{figure['stem']}_{count + 1}"
+            paths = [os.path.join(directory, f"{stem}.{image_format}") for image_format in formats]
+
+            for path, image_format in zip(paths, formats):
+                plt.figure(number).savefig(path, format=image_format, dpi=dpi, bbox_inches='tight')
+
+            images.append(paths)
+    finally:
+        # Close the figures drawn here, as pyplot keeps every open figure in memory until it is closed
+        for number in plt.get_fignums():
+            if number not in existing:
+                plt.close(number)
+
+    return images, returned if isinstance(returned, str) else None
+
+
+# The Plotter used by this process, and the options it was created with
+_plotter, _plotter_options = None, None
+
+
+def _get_plotter(plotter_options: dict) -> Plotter:
+    """Return a Plotter with show=False and the options, creating it only once in each process."""
+    global _plotter, _plotter_options
+
+    if _plotter is None or _plotter_options != plotter_options:
+        _plotter, _plotter_options = Plotter(**plotter_options, show=False), plotter_options
+
+    return _plotter
+
+
+def _embed_image(path: str) -> str:
+    """Return the html showing an image file inside the report, inlining svg and base64 encoding png."""
+    if path.endswith('.svg'):
+        with open(path, 'r') as f:
+            svg = f.read()
+
+        # The xml declaration and doctype before the svg element are not allowed inside html
+        return svg[svg.find('<svg'):]
+
+    with open(path, 'rb') as f:
+        return f'<img src="data:image/png;base64,{base64.b64encode(f.read()).decode()}">'
+
+
+def _slug(title: str) -> str:
+    """Convert a title into a file name."""
+    return re.sub(r'[^A-Za-z0-9]+', '_', title).strip('_').lower() or 'figure'
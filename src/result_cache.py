@@ -0,0 +1,315 @@
+import functools
+import inspect
+import itertools
+import numpy as np
+import pandas as pd
+import sys
+import weakref
+
+from collections import OrderedDict
+from pandas import DataFrame, Series
+from typing import Any, Callable, List
+
+
+def fingerprint(data: Any, columns: List[Any] = None) -> tuple:
+    """Return a hashable fingerprint of a DataFrame or Series, which changes whenever its shape, labels, dtypes or index change, or
+    any of its values changes, however it was changed, e.g. by df.loc[i, 'x'] = ... as well as by the transform classes.
+
+    Every value is read: numeric, datetime and categorical columns are summed as 64-bit words at memory speed, while the values of
+    object columns are hashed by pandas once, and that hash is reused until one of the objects held by the column is replaced. Two
+    frames holding the same values have the same fingerprint, so a copy reuses the results of the original. Mutable objects such
+    as lists changed without being reassigned, e.g. by df.at[i, 'x'].append(...), are not noticed.
+
+    If columns is given, only those columns' values are read, while the labels and dtypes of every column are still included. A
+    method reading only some columns, such as the numeric ones, then keeps its results when the others are changed.
+    """
+    if isinstance(data, DataFrame):
+        labels = (tuple(data.columns), tuple(str(dtype) for dtype in data.dtypes))
+        positions = range(data.shape[1]) if columns is None else data.columns.get_indexer_for(columns)
+        checksums = tuple(_column_checksum(data.iloc[:, i]) for i in positions)
+    else:
+        labels = (data.name, str(data.dtype))
+        checksums = (_column_checksum(data),)
+
+    return (type(data).__name__, data.shape, labels, _index_checksum(data.index), checksums)
+
+
+def _index_checksum(index: pd.Index) -> Any:
+    """Return a checksum of an index: the bounds of a RangeIndex, or the serial number of any other index."""
+    if isinstance(index, pd.RangeIndex):
+        return (index.start, index.stop, index.step)
+
+    # Indexes are immutable, so the same object always holds the same labels
+    return _serial_number(index)
+
+
+def _column_checksum(column: Series) -> Any:
+    """Return a 64-bit checksum of every value of a column, or a tuple of them for columns held in several arrays."""
+    values = column.array
+
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # The codes say which category each row holds, and the categories say what those are
+        return (_array_checksum(values.codes), _object_checksum(values.categories))
+
+    if isinstance(column.dtype, np.dtype):
+        array = column.to_numpy()
+
+        if array.dtype.kind in 'biufcmM':
+            return _array_checksum(array)
+
+        return _object_column_checksum(array)
+
+    if isinstance(getattr(values, '_mask', None), np.ndarray) and isinstance(values._data, np.ndarray):
+        # Nullable Int64, Float64 and boolean columns hold their values and missing flags in two numpy arrays
+        return (_array_checksum(values._data), _array_checksum(values._mask))
+
+    # Other extension arrays, e.g. those backed by pyarrow, are hashed by pandas on every call
+    return _object_checksum(column)
+
+
+# The hash of the values of each object column fingerprinted, keyed by the array holding it and the address of its values, with the
+# checksum of the objects' addresses it was calculated from and a copy of those addresses. The copy keeps the objects alive, so an
+# object created later cannot take the address of one which was replaced, and the same addresses always mean the same objects
+_object_hashes = {}
+
+
+def _object_column_checksum(array: np.ndarray) -> int:
+    """Return the hash of an object column's values, hashing them again only if one of the objects it holds has been replaced."""
+    key = _address(array)
+    addresses = _array_checksum(array)
+
+    if key not in _object_hashes or _object_hashes[key][0] != addresses:
+        _object_hashes[key] = (addresses, array.copy(), _object_checksum(Series(array, copy=False)))
+
+    return _object_hashes[key][2]
+
+
+# Serial numbers of the arrays and indexes which have been fingerprinted, keyed by id while each is alive, so an object created later
+# at the same address gets a new number
+_serial_numbers = {}
+_next_serial_number = itertools.count()
+
+
+def _serial_number(owner: Any) -> int:
+    """Return a number which identifies the object for as long as it is alive, and is never given to another object."""
+    if id(owner) not in _serial_numbers:
+        _serial_numbers[id(owner)] = next(_next_serial_number)
+        weakref.finalize(owner, _forget, id(owner), _serial_numbers[id(owner)])
+
+    return _serial_numbers[id(owner)]
+
+
+def _forget(identity: int, serial_number: int) -> None:
+    """Drop the serial number of an object which no longer exists, and the hashes of the object columns it held."""
+    _serial_numbers.pop(identity, None)
+
+    for key in [key for key in _object_hashes if key[0] == serial_number]:
+        del _object_hashes[key]
+
+
+def _address(array: np.ndarray) -> tuple:
+    """Return the serial number of the array owning a numpy array's memory, and the address of its first value within it."""
+    owner = array
+
+    # A DataFrame's columns are views of the 2D arrays holding its blocks, which are made afresh each time a column is read
+    while isinstance(owner.base, np.ndarray):
+        owner = owner.base
+
+    return (_serial_number(owner), array.__array_interface__['data'][0])
+
+
+def _array_checksum(values: np.ndarray) -> int:
+    """Return the sum of the bytes of each value multiplied by a random odd weight for its position, wrapping at 64 bits.
+
+    Because every weight is odd, changing any single value always changes the sum, and the weights differ by position, so
+    moving values between rows changes it too.
+    """
+    if values.dtype.kind == 'c':
+        # Complex values are summed as their real and imaginary parts
+        return hash((_array_checksum(values.real), _array_checksum(values.imag)))
+
+    if values.dtype.kind == 'f' and values.dtype.itemsize > 8:
+        # Extended precision floats have padding bytes with undefined contents, so they are split into a float64 and the remainder
+        high = values.astype(np.float64)
+        return hash((_array_checksum(high), _array_checksum((values - high).astype(np.float64))))
+
+    values = np.ascontiguousarray(values)
+
+    if values.dtype.kind == 'O':
+        # Object arrays are summed as the addresses of the objects they hold, which numpy will not view as integers directly
+        words = _object_addresses(values)
+    elif values.dtype.itemsize == 8:
+        words = values.view(np.uint64)
+    elif values.dtype.itemsize in [1, 2, 4]:
+        words = values.view(np.dtype(f"u{values.dtype.itemsize}")).astype(np.uint64)
+    else:
+        return _object_checksum(Series(values.astype(object)))
+
+    return int(np.dot(words, _position_weights(len(words))))
+
+
+def _object_addresses(values: np.ndarray) -> np.ndarray:
+    """Return the addresses of the objects held by a contiguous object array, as a view of its memory."""
+    view = {'data': (values.__array_interface__['data'][0], True), 'shape': values.shape, 'typestr': np.dtype(np.uintp).str, 'version': 3}
+    return np.asarray(_ArrayInterface(view, values)).astype(np.uint64, copy=False)
+
+
+class _ArrayInterface():
+    """Exposes memory to numpy through the array interface, keeping the array which owns it alive."""
+
+    def __init__(self, interface: dict, owner: np.ndarray):
+        self.__array_interface__ = interface
+        self.owner = owner
+
+
+def _object_checksum(values: Any) -> int:
+    """Return a checksum of non-numeric values, using pandas' per-value hashes."""
+    return _array_checksum(pd.util.hash_pandas_object(values, index=False).to_numpy())
+
+
+_weights = np.empty(0, dtype=np.uint64)
+
+
+def _position_weights(length: int) -> np.ndarray:
+    """Return the random odd weights of the first length positions, which are the same on every call."""
+    global _weights
+
+    if len(_weights) < length:
+        _weights = np.random.default_rng(0).integers(0, 2 ** 63, length, dtype=np.uint64) * 2 + 1
+
+    return _weights[:length]
+
+
+def size_in_bytes(value: Any) -> int:
+    """Estimate the memory held by a cached result, including the contents of pandas objects."""
+    if isinstance(value, DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(size_in_bytes(item) for item in value)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + sum(size_in_bytes(item) for item in vars(value).values())
+    return sys.getsizeof(value)
+
+
+class ResultCache():
+    """A least-recently-used cache of results which stays under a memory budget.
+
+    Attributes:
+        max_bytes (int): the most memory the cached results may hold.
+        total_bytes (int): the memory held by the cached results.
+        hits, misses (int): how many lookups found, or did not find, a cached result.
+
+    Methods:
+        get:
+            Return whether a key is cached, and its result.
+        put:
+            Cache a result, evicting the least recently used results to stay under the budget.
+        clear:
+            Remove every cached result.
+
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> (bool, Any):
+        """Return (True, result) if the key is cached, marking it as most recently used, or (False, None) if not."""
+        if key not in self._entries:
+            self.misses += 1
+            return False, None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return True, self._entries[key][0]
+
+    def put(self, key: tuple, value: Any) -> None:
+        """Cache the result under the key, then evict the least recently used results until the cache fits in max_bytes."""
+        size = size_in_bytes(value)
+
+        # A result bigger than the whole budget would only evict everything else, so it is not cached
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self.total_bytes -= self._entries.pop(key)[1]
+
+        self._entries[key] = (value, size)
+        self.total_bytes += size
+
+        while self.total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def clear(self) -> None:
+        """Remove every cached result."""
+        self._entries.clear()
+        self.total_bytes = 0
+
+
+def cached(method: Callable = None, reads: Callable[[DataFrame], List[Any]] = None) -> Callable:
+    """Decorate a method so its results are memoized in self.cache, keyed on the method, the fingerprint of each DataFrame or Series
+    argument, and the value of every other argument. Nothing is cached when self.cache is None.
+
+    reads is a function returning the columns of a DataFrame argument which the method reads, e.g. its numeric columns, so that only
+    those are fingerprinted. It is used as @cached(reads=...), while @cached fingerprints every column.
+
+    A copy of each cached pandas result is returned, so callers can modify what they are given without changing the cache.
+    Cached methods called while another one is calculating its result are run directly, as only the outer result is reused.
+    """
+    if method is None:
+        return functools.partial(cached, reads=reads)
+
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self, 'cache', None) is None or getattr(self, '_calculating', False):
+            return method(self, *args, **kwargs)
+
+        arguments = signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+        key = (method.__name__,) + tuple(_argument_key(value, reads) for name, value in arguments.arguments.items() if name != 'self')
+
+        found, result = self.cache.get(key)
+
+        if not found:
+            self._calculating = True
+            try:
+                result = method(self, *args, **kwargs)
+            finally:
+                self._calculating = False
+
+            self.cache.put(key, result)
+
+        return _copy_result(result)
+
+    return wrapper
+
+
+def _argument_key(value: Any, reads: Callable[[DataFrame], List[Any]] = None) -> Any:
+    """Convert an argument into a hashable part of a cache key, fingerprinting only the columns of a DataFrame which are read."""
+    if isinstance(value, DataFrame):
+        return fingerprint(value, None if reads is None else reads(value))
+    if isinstance(value, Series):
+        return fingerprint(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_argument_key(item) for item in value)
+    return value
+
+
+def _copy_result(value: Any) -> Any:
+    """Copy pandas objects, and tuples of them, so cached results cannot be modified by the caller."""
+    if isinstance(value, (DataFrame, Series)):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_copy_result(item) for item in value)
+    return value
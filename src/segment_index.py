@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+from pandas import DataFrame
+from typing import Any, Dict, List
+
+
+class SegmentIndex():
+    """An index of the rows holding each value of categorical columns such as loan_status, sub_grade, purpose and home_ownership.
+
+    The position of every row holding each value is found once, when the index is built. Selecting the rows with one or more values
+    is then a lookup, combining values of one column is a union of their positions, and combining columns is an intersection,
+    so a subset such as the late loans is taken without comparing every row of the DataFrame.
+
+    select() also takes a DataFrame holding only some of the indexed rows, e.g. df[df['loan_amount'] > 5000], and finds where the
+    matching rows are in it by their row labels, which must be unique for this. The index itself is not changed, so it can be used
+    with the full DataFrame again afterwards. When rows are dropped from the indexed DataFrame for good, e.g. by
+    drop_rows_of_null_column_entries, call realign() with the smaller DataFrame, so that later selections are positional again. The
+    index holds the values the columns had when it was built, so it should be rebuilt if the values of an indexed column are changed.
+
+    Attributes:
+        columns (List[str]): the indexed columns.
+        segments (Dict[str, Dict[Any, np.ndarray]]): the sorted positions of the rows holding each value, for each column.
+
+    Methods:
+        positions:
+            Return the positions of the rows matching every criterion.
+        select:
+            Return the rows of a DataFrame matching every criterion.
+        counts:
+            Return the number of rows holding each value of a column.
+        realign:
+            Drop the rows which are no longer in a DataFrame from the index.
+
+    """
+
+    def __init__(self, df: DataFrame, columns: List[str]):
+        if not df.index.is_unique:
+            raise Exception("SegmentIndex needs a DataFrame with unique row labels, so dropped rows can be found. Call reset_index() first.")
+
+        self.columns = list(columns)
+        self.segments = {name: _segment_positions(df[name]) for name in self.columns}
+        self._index = df.index
+
+    def positions(self, **criteria: Any) -> np.ndarray:
+        """Return the sorted positions of the rows matching every criterion, where each criterion gives a column and a value, or a list
+        of values, e.g. positions(loan_status=['Late (16-30 days)', 'Late (31-120 days)'], term=36).
+        """
+        matches = None
+
+        for name, values in criteria.items():
+            if name not in self.segments:
+                raise Exception(f"The column '{name}' is not in the SegmentIndex. Indexed columns are {self.columns}.")
+
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            segments = self.segments[name]
+
+            # Each row holds one value, so the union of the values' positions only needs sorting
+            found = np.sort(np.concatenate([segments.get(value, np.empty(0, dtype=np.int64)) for value in values]))
+
+            matches = found if matches is None else np.intersect1d(matches, found, assume_unique=True)
+
+        return np.arange(len(self._index)) if matches is None else matches
+
+    def select(self, df: DataFrame, **criteria: Any) -> DataFrame:
+        """Return the rows of the DataFrame matching every criterion, as in positions(). The DataFrame is either the indexed one, or one
+        holding some of its rows, in which case the matching rows it does not hold are skipped. The index is not changed.
+        """
+        positions = self.positions(**criteria)
+
+        if df.index is self._index or df.index.equals(self._index):
+            return df.iloc[positions]
+
+        # Where each matching row is in the DataFrame, or -1 if it does not hold it
+        found = df.index.get_indexer(self._index[positions])
+        return df.iloc[found[found != -1]]
+
+    def counts(self, column: str) -> pd.Series:
+        """Return the number of rows holding each value of the column."""
+        return pd.Series({value: len(positions) for value, positions in self.segments[column].items()}, name=column, dtype=np.int64)
+
+    def realign(self, df: DataFrame) -> None:
+        """Make the index match the rows of the DataFrame, which must be the indexed DataFrame with some of its rows dropped, so the
+        rows it no longer holds are dropped from the index for good.
+        """
+        if df.index is self._index or df.index.equals(self._index):
+            self._index = df.index
+            return
+
+        # Where each indexed row is in the DataFrame now, or -1 if it has been dropped
+        new_positions = df.index.get_indexer(self._index)
+
+        if (new_positions == -1).sum() != len(self._index) - len(df.index):
+            raise Exception("The DataFrame has rows which are not in the SegmentIndex. Build a new SegmentIndex for it.")
+
+        for name, segments in self.segments.items():
+            for value, positions in segments.items():
+                moved = new_positions[positions]
+                segments[value] = np.sort(moved[moved != -1])
+
+        self._index = df.index
+
+
+def _segment_positions(column: pd.Series) -> Dict[Any, np.ndarray]:
+    """Return the sorted positions of the rows holding each value of the column. Nulls are not indexed."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes, distinct_values = column.cat.codes.to_numpy(), column.cat.categories
+    else:
+        codes, distinct_values = pd.factorize(column)
+
+    # A stable sort by code lists the positions of each value in order, one value after another
+    order = np.argsort(codes, kind='stable')
+    boundaries = np.searchsorted(codes[order], np.arange(-1, len(distinct_values) + 1))
+
+    return {value: order[boundaries[code + 1]:boundaries[code + 2]] for code, value in enumerate(distinct_values)}
@@ -0,0 +1,449 @@
+import numpy as np
+import pandas as pd
+
+from pandas import DataFrame, Series
+from typing import Any, Dict, Iterable, List
+
+
+class MomentSketch():
+    """Count, mean, central moments, min and max of a stream of numbers, updated one chunk at a time.
+
+    Two sketches of different chunks can be merged into the sketch of both, so chunks can be profiled in any order or in parallel.
+    The skew and kurtosis use the same bias-adjusted formulas as pandas, so they match DataFrame.skew() and DataFrame.kurt().
+
+    Attributes:
+        count (int): number of non-null values seen.
+        mean (float): mean of the values.
+        m2, m3, m4 (float): sums of the 2nd, 3rd and 4th powers of the deviations from the mean.
+        min, max (float): smallest and largest value.
+
+    Methods:
+        update:
+            Add a chunk of values to the sketch.
+        merge:
+            Combine another sketch into this one.
+        variance, std, skew, kurtosis:
+            Return the statistic of every value seen so far.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, values: np.ndarray) -> 'MomentSketch':
+        """Add a chunk of values, ignoring NaNs, and return the sketch."""
+        values = values[~np.isnan(values)]
+
+        if len(values) == 0:
+            return self
+
+        # Summarise the chunk with numpy, then merge that summary in
+        chunk = MomentSketch()
+        chunk.count = len(values)
+        chunk.mean = values.mean()
+        deviations = values - chunk.mean
+        squared = deviations ** 2
+        chunk.m2 = squared.sum()
+        chunk.m3 = (squared * deviations).sum()
+        chunk.m4 = (squared ** 2).sum()
+        chunk.min = values.min()
+        chunk.max = values.max()
+
+        return self.merge(chunk)
+
+    def merge(self, other: 'MomentSketch') -> 'MomentSketch':
+        """Combine the moments of another sketch into this one and return it, using Pébay's pairwise update formulas."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+
+        na, nb = self.count, other.count
+        n = na + nb
+        delta = other.mean - self.mean
+
+        m2 = self.m2 + other.m2 + delta ** 2 * na * nb / n
+        m3 = (self.m3 + other.m3 + delta ** 3 * na * nb * (na - nb) / n ** 2
+              + 3 * delta * (na * other.m2 - nb * self.m2) / n)
+        m4 = (self.m4 + other.m4 + delta ** 4 * na * nb * (na ** 2 - na * nb + nb ** 2) / n ** 3
+              + 6 * delta ** 2 * (na ** 2 * other.m2 + nb ** 2 * self.m2) / n ** 2
+              + 4 * delta * (na * other.m3 - nb * self.m3) / n)
+
+        self.count = n
+        self.mean = self.mean + delta * nb / n
+        self.m2, self.m3, self.m4 = m2, m3, m4
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+        return self
+
+    def variance(self) -> float:
+        """Return the sample variance (with n - 1 degrees of freedom, as pandas uses)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    def std(self) -> float:
+        """Return the sample standard deviation."""
+        return np.sqrt(self.variance())
+
+    def skew(self) -> float:
+        """Return the adjusted Fisher-Pearson skew, as calculated by pandas."""
+        n = self.count
+
+        if n < 3:
+            return np.nan
+        if self.m2 == 0:
+            return 0.0
+
+        return (n * (n - 1) ** 0.5 / (n - 2)) * (self.m3 / self.m2 ** 1.5)
+
+    def kurtosis(self) -> float:
+        """Return the excess kurtosis, with the same bias adjustment as pandas."""
+        n = self.count
+
+        if n < 4:
+            return np.nan
+        if self.m2 == 0:
+            return 0.0
+
+        numerator = n * (n + 1) * (n - 1) * self.m4
+        denominator = (n - 2) * (n - 3) * self.m2 ** 2
+        adjustment = 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+
+        return numerator / denominator - adjustment
+
+
+class QuantileSketch():
+    """Approximate quantiles of a stream of numbers in a fixed amount of memory, using a compacting sketch in the style of KLL.
+
+    Values are kept in levels, where a value at level i stands for 2**i of the original values. Whenever a level holds more than
+    k values, it is sorted and every other value is promoted to the next level. The rank error is roughly log2(n / k) / k, so the
+    default k of 1,000 keeps quantiles of a 10 million row loan book within about 1% of their true rank. Sketches can be merged.
+
+    Attributes:
+        k (int): the number of values a level may hold before it is compacted.
+        levels (List[np.ndarray]): the values kept at each level.
+
+    Methods:
+        update:
+            Add a chunk of values to the sketch.
+        merge:
+            Combine another sketch into this one.
+        quantile:
+            Return the approximate value at each of the quantiles.
+        median:
+            Return the median, which is exact until the sketch first compacts.
+
+    """
+
+    def __init__(self, k: int = 1000, seed: int = 0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray) -> 'QuantileSketch':
+        """Add a chunk of values, ignoring NaNs, and return the sketch."""
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0], values.astype(float)])
+        self._compact()
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Combine another sketch's levels into this one and return it."""
+        for level, values in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], values])
+
+        self._compact()
+        return self
+
+    def quantile(self, qs: List[float]) -> np.ndarray:
+        """Return the approximate value at each of the quantiles in qs, which are between 0 and 1."""
+        values = np.concatenate(self.levels)
+
+        if len(values) == 0:
+            return np.full(len(qs), np.nan)
+
+        weights = np.concatenate([np.full(len(values), 2.0 ** level) for level, values in enumerate(self.levels)])
+
+        order = np.argsort(values, kind='stable')
+        values, cumulative_weights = values[order], np.cumsum(weights[order])
+
+        # The value whose cumulative weight first reaches each quantile of the total weight
+        positions = np.searchsorted(cumulative_weights, np.asarray(qs) * cumulative_weights[-1], side='left')
+        return values[np.minimum(positions, len(values) - 1)]
+
+    def median(self) -> float:
+        """Return the median. While every value is still held at level 0 it is exact, averaging the middle two values as pandas does."""
+        if len(self.levels) == 1:
+            values = self.levels[0]
+            return np.median(values) if len(values) else np.nan
+
+        return self.quantile([0.5])[0]
+
+    def _compact(self) -> None:
+        level = 0
+
+        while level < len(self.levels):
+            if len(self.levels[level]) > self.k:
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+
+                values = np.sort(self.levels[level])
+
+                # With an odd number of values, the largest stays at this level so the pairs come out even
+                leftover = values[-1:] if len(values) % 2 else values[:0]
+                values = values[:len(values) - len(leftover)]
+
+                # Promoting either the odd or even positions at random keeps the rank estimates unbiased
+                offset = self.rng.integers(2)
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], values[offset::2]])
+                self.levels[level] = leftover
+
+            level += 1
+
+
+class HeavyHitterSketch():
+    """The most frequent values of a stream, with their approximate counts, kept in a fixed amount of memory (the Misra-Gries summary).
+
+    At most capacity values are counted. When a chunk brings in more, the count of the (capacity + 1)th most frequent value is taken
+    off every count, and values left without a positive count are forgotten. Any value making up more than 1 / (capacity + 1) of the
+    stream is always kept, so the mode of a column with a clear favourite is found, and with at most capacity distinct values, as in
+    term or employment_length, the counts are exact. Sketches can be merged.
+
+    Attributes:
+        capacity (int): the number of values which are counted.
+        counts (Series): the count of each value kept, indexed by value.
+
+    Methods:
+        update:
+            Add a chunk of values to the sketch.
+        merge:
+            Combine another sketch into this one.
+        mode:
+            Return the value with the highest count.
+
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts = Series(dtype=np.int64)
+
+    def update(self, values: np.ndarray) -> 'HeavyHitterSketch':
+        """Add a chunk of values, ignoring nulls, and return the sketch."""
+        counts = Series(values).value_counts()
+        return self._add(counts[counts > 0])
+
+    def merge(self, other: 'HeavyHitterSketch') -> 'HeavyHitterSketch':
+        """Combine the counts of another sketch into this one and return it."""
+        return self._add(other.counts)
+
+    def mode(self) -> Any:
+        """Return the value with the highest count, or the smallest of those tied for it as Series.mode() does, or None if nothing was seen."""
+        if len(self.counts) == 0:
+            return None
+
+        return sorted(self.counts.index[self.counts == self.counts.max()])[0]
+
+    def _add(self, counts: Series) -> 'HeavyHitterSketch':
+        self.counts = self.counts.add(counts, fill_value=0).astype(np.int64) if len(self.counts) else counts.astype(np.int64)
+
+        if len(self.counts) > self.capacity:
+            excess = self.counts.nlargest(self.capacity + 1).iloc[-1]
+            self.counts = self.counts[self.counts > excess] - excess
+
+        return self
+
+
+class ReservoirSample():
+    """A uniform random sample of a stream of numbers, of at most size values, for statistics which need the values themselves.
+
+    Each value is given a random key, and the sample keeps the values with the smallest keys. That is the same as sampling
+    the whole stream at once, so the samples of different chunks can be merged. Until more than size values are seen, the sample
+    holds all of them. The Box-Cox and Yeo-Johnson lambdas of a loan book are fitted to a sample like this.
+
+    Attributes:
+        size (int): the largest number of values kept.
+        values (np.ndarray): the values in the sample.
+        keys (np.ndarray): the random key of each value.
+
+    Methods:
+        update:
+            Add a chunk of values to the sample.
+        merge:
+            Combine another sample into this one.
+
+    """
+
+    def __init__(self, size: int = 100_000, seed: int = 0):
+        self.size = size
+        self.values = np.empty(0)
+        self.keys = np.empty(0)
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray) -> 'ReservoirSample':
+        """Add a chunk of values, ignoring NaNs, and return the sample."""
+        values = values[~np.isnan(values)].astype(float)
+        return self._add(values, self.rng.random(len(values)))
+
+    def merge(self, other: 'ReservoirSample') -> 'ReservoirSample':
+        """Combine another sample into this one and return it."""
+        return self._add(other.values, other.keys)
+
+    def _add(self, values: np.ndarray, keys: np.ndarray) -> 'ReservoirSample':
+        self.values = np.concatenate([self.values, values])
+        self.keys = np.concatenate([self.keys, keys])
+
+        if len(self.values) > self.size:
+            smallest = np.argpartition(self.keys, self.size)[:self.size]
+
+            # Keep the sample in the order the values arrived in
+            smallest.sort()
+            self.values, self.keys = self.values[smallest], self.keys[smallest]
+
+        return self
+
+
+class StreamingDataFrameInfo():
+    """Descriptive statistics of a DataFrame which is read one chunk at a time, so it never has to fit in memory.
+
+    Feed it chunks from pd.read_csv(chunksize=...), a Parquet dataset, or RDSDatabaseConnector.stream_table_as_dataframes().
+    Every chunk is read once: null counts and moments are exact, and quantiles are approximate. Two profiles of different
+    chunks can be merged, so a loan book can be profiled in parallel.
+
+    Attributes:
+        row_count (int): number of rows seen.
+        null_counts (Series): number of nulls seen in each column.
+        dtypes (Series): dtype of each column in the first chunk.
+        moments (Dict[str, MomentSketch]): moments of each numeric column.
+        quantiles (Dict[str, QuantileSketch]): quantile sketch of each numeric column.
+
+    Methods:
+        update:
+            Add a chunk to the statistics.
+        merge:
+            Combine the statistics of another profile into this one.
+        percentage_of_nulls_in_data_frame:
+            Calculate null percentage in all columns.
+        combine_null_percentage_and_count:
+            Combine null counts and percentages.
+        measure_skew_for_all_columns:
+            Calculate skew for all numeric columns.
+        describe_all:
+            Generate overall statistics for all numeric columns.
+
+    """
+
+    def __init__(self, quantile_k: int = 1000):
+        self.quantile_k = quantile_k
+        self.row_count = 0
+        self.null_counts = None
+        self.dtypes = None
+        self.moments = {}
+        self.quantiles = {}
+
+    def update(self, chunk: DataFrame) -> 'StreamingDataFrameInfo':
+        """Add the statistics of a chunk and return the profile."""
+        null_counts = chunk.isna().sum()
+
+        if self.null_counts is None:
+            self.null_counts = null_counts
+            self.dtypes = chunk.dtypes
+        else:
+            self.null_counts = self.null_counts.add(null_counts, fill_value=0).astype(np.int64)
+
+        self.row_count += len(chunk)
+
+        for name in chunk.columns:
+            column = chunk[name]
+
+            # Moments and quantiles are only meaningful for numbers, and bools are left out as they are in describe()
+            if not pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+                continue
+
+            values = column.to_numpy(dtype=float, na_value=np.nan)
+
+            self.moments.setdefault(name, MomentSketch()).update(values)
+            self.quantiles.setdefault(name, QuantileSketch(self.quantile_k)).update(values)
+
+        return self
+
+    def merge(self, other: 'StreamingDataFrameInfo') -> 'StreamingDataFrameInfo':
+        """Combine the statistics of a profile of other chunks into this one and return it."""
+        if other.null_counts is None:
+            return self
+        if self.null_counts is None:
+            self.null_counts, self.dtypes = other.null_counts.copy(), other.dtypes
+        else:
+            self.null_counts = self.null_counts.add(other.null_counts, fill_value=0).astype(np.int64)
+
+        self.row_count += other.row_count
+
+        for name, moments in other.moments.items():
+            self.moments.setdefault(name, MomentSketch()).merge(moments)
+        for name, quantiles in other.quantiles.items():
+            self.quantiles.setdefault(name, QuantileSketch(self.quantile_k)).merge(quantiles)
+
+        return self
+
+    def percentage_of_nulls_in_data_frame(self, precision=2, sort=True) -> Series:
+        """Returns a Series showing the percentage of null values for every column, as DataFrameInfo does for a whole DataFrame."""
+        null_percentages = round(self.null_counts * 100 / self.row_count, precision)
+
+        if sort:
+            return null_percentages.sort_values(ascending=False)
+
+        return null_percentages
+
+    def combine_null_percentage_and_count(self) -> DataFrame:
+        """Return a DataFrame containing the null percentage, null count and dtype of each column with nulls."""
+        columns_with_nulls = self.null_counts[self.null_counts > 0].index
+
+        data = {
+            "% of nulls": self.percentage_of_nulls_in_data_frame(sort=True)[columns_with_nulls],
+            "# of nulls": self.null_counts[columns_with_nulls],
+            "dtype": self.dtypes[columns_with_nulls]
+        }
+
+        return pd.concat(data, axis=1).sort_values("% of nulls", ascending=False)
+
+    def measure_skew_for_all_columns(self, sort=False) -> Series:
+        """Return a Series showing the skew value for each numeric column."""
+        skewness = Series({name: moments.skew() for name, moments in self.moments.items()}, dtype=float)
+
+        if sort:
+            return skewness.sort_values(ascending=False)
+        else:
+            return skewness
+
+    def describe_all(self, percentiles: List[float] = None) -> DataFrame:
+        """Returns the count, mean, std, min, approximate percentiles and max for every numeric column, laid out like DataFrame.describe().
+        The percentiles are the quartiles unless they are given."""
+        percentiles = [0.25, 0.5, 0.75] if percentiles is None else percentiles
+        rows = {}
+
+        for name, moments in self.moments.items():
+            quantiles = self.quantiles[name].quantile(percentiles)
+
+            rows[name] = {'count': moments.count, 'mean': moments.mean, 'std': moments.std(), 'min': moments.min,
+                          **{f"{p * 100:g}%": value for p, value in zip(percentiles, quantiles)},
+                          'max': moments.max}
+
+        return DataFrame(rows)
+
+
+def profile_chunks(chunks: Iterable[DataFrame], quantile_k: int = 1000) -> StreamingDataFrameInfo:
+    """Read every chunk once and return the StreamingDataFrameInfo of all of them."""
+    profile = StreamingDataFrameInfo(quantile_k)
+
+    for chunk in chunks:
+        profile.update(chunk)
+
+    return profile
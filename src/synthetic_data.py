@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+
+from pandas import DataFrame
+from typing import Iterator
+
+# The share of each loan_status in the loan_payments table
+LOAN_STATUS_SHARES = {
+    'Fully Paid': 27010,
+    'Current': 19267,
+    'Charged Off': 5498,
+    'Does not meet the credit policy. Status:Fully Paid': 966,
+    'Late (31-120 days)': 580,
+    'Does not meet the credit policy. Status:Charged Off': 351,
+    'In Grace Period': 265,
+    'Late (16-30 days)': 106,
+    'Default': 52,
+}
+
+# The share of nulls in each column with nulls, other than next_payment_date, which is only set for loans still being repaid
+NULL_RATES = {
+    'funded_amount': 0.0554,
+    'term': 0.0880,
+    'int_rate': 0.0953,
+    'employment_length': 0.0391,
+    'mths_since_last_delinq': 0.5717,
+    'mths_since_last_record': 0.8860,
+    'last_payment_date': 0.0013,
+    'last_credit_pull_date': 0.0001,
+    'collections_12_mths_ex_med': 0.0009,
+    'mths_since_last_major_derog': 0.8617,
+}
+
+HOME_OWNERSHIP_SHARES = {'MORTGAGE': 26923, 'RENT': 22493, 'OWN': 4750, 'OTHER': 63, 'NONE': 2}
+VERIFICATION_STATUS_SHARES = {'Not Verified': 0.37, 'Source Verified': 0.30, 'Verified': 0.33}
+EMPLOYMENT_LENGTH_SHARES = {'10+ years': 0.33, '2 years': 0.10, '< 1 year': 0.09, '3 years': 0.09, '5 years': 0.07, '1 year': 0.07,
+                            '4 years': 0.065, '6 years': 0.05, '7 years': 0.045, '8 years': 0.035, '9 years': 0.03}
+PURPOSE_SHARES = {'debt_consolidation': 0.50, 'credit_card': 0.20, 'home_improvement': 0.06, 'other': 0.06, 'major_purchase': 0.04,
+                  'small_business': 0.03, 'car': 0.03, 'medical': 0.01, 'wedding': 0.01, 'moving': 0.01, 'vacation': 0.007,
+                  'house': 0.007, 'educational': 0.002, 'renewable_energy': 0.001}
+
+# The share of each grade, and the interest rate of its first sub grade, which rises by 0.6% for each of the next four
+GRADES = np.array(['A', 'B', 'C', 'D', 'E', 'F', 'G'], dtype=object)
+GRADE_SHARES = np.array([0.24, 0.30, 0.21, 0.14, 0.07, 0.03, 0.01])
+GRADE_INTEREST_RATES = np.array([6.0, 10.0, 13.5, 16.0, 18.5, 21.0, 23.5])
+SUB_GRADES = np.array([f"{grade}{number}" for grade in GRADES for number in range(1, 6)], dtype=object)
+
+# Statuses of loans still being repaid, which have outstanding principal and a next payment date
+ACTIVE_STATUSES = ['Current', 'Late (31-120 days)', 'In Grace Period', 'Late (16-30 days)']
+# Statuses of loans which stopped being repaid, which can have recoveries
+CHARGED_OFF_STATUSES = ['Charged Off', 'Does not meet the credit policy. Status:Charged Off', 'Default']
+
+# Every month the date columns can hold, as '%b-%Y' strings. Issue dates run from Jun-2007 to Dec-2021, and the extract is from Jan-2022.
+MONTHS = pd.date_range('1960-01-01', '2022-12-01', freq='MS').strftime('%b-%Y').to_numpy(dtype=object)
+FIRST_ISSUE_MONTH = 47 * 12 + 5
+LAST_ISSUE_MONTH = 61 * 12 + 11
+EXTRACT_MONTH = 62 * 12
+
+
+def generate_loan_payments(n_rows: int, seed: int = 0, chunksize: int = 1_000_000) -> DataFrame:
+    """Return a synthetic loan_payments table of n_rows, with the same 43 columns and dtypes as the real table.
+
+    The rows are made chunksize at a time and joined, so the same seed gives the same rows whatever the chunksize. For tables too
+    large to hold in memory, e.g. 10 million rows, use generate_loan_payments_in_chunks with save_chunks_to_csv or save_chunks_to_parquet.
+    """
+    return pd.concat(generate_loan_payments_in_chunks(n_rows, seed, chunksize), ignore_index=True)
+
+
+def generate_loan_payments_in_chunks(n_rows: int, seed: int = 0, chunksize: int = 1_000_000) -> Iterator[DataFrame]:
+    """Yield a synthetic loan_payments table of n_rows as DataFrames of up to chunksize rows, with ids and row labels continuing
+    from one chunk to the next. Each block of rows has its own random stream, so the rows do not depend on the chunksize.
+    """
+    block_size = 10_000
+    blocks = -(-n_rows // block_size)
+    streams = np.random.SeedSequence(seed).spawn(blocks)
+    rows_per_chunk = max(block_size, chunksize // block_size * block_size)
+
+    for start in range(0, n_rows, rows_per_chunk):
+        stop = min(start + rows_per_chunk, n_rows)
+        chunk = pd.concat([_generate_block(np.random.default_rng(streams[first // block_size]), first, min(first + block_size, stop))
+                           for first in range(start, stop, block_size)], ignore_index=True)
+        chunk.index = pd.RangeIndex(start, stop)
+        yield chunk
+
+
+def _generate_block(rng: np.random.Generator, start: int, stop: int) -> DataFrame:
+    """Return the synthetic rows from position start up to stop, drawn from rng."""
+    n = stop - start
+
+    # Loan terms, grades and amounts
+    loan_status = _choose(rng, LOAN_STATUS_SHARES, n)
+    grade_code = rng.choice(len(GRADES), n, p=GRADE_SHARES)
+    sub_grade_step = rng.integers(0, 5, n)
+    term_months = np.where(rng.random(n) < 0.7, 36, 60)
+    int_rate = np.round(GRADE_INTEREST_RATES[grade_code] + 0.6 * sub_grade_step + rng.normal(0, 0.4, n), 2).clip(5.4, 26.1)
+
+    loan_amount = (np.exp(rng.normal(9.2, 0.65, n)).clip(500, 35000) / 25).round().astype(np.int64) * 25
+    reduced = rng.random(n) < 0.05
+    funded_amount = np.where(reduced, (loan_amount * rng.uniform(0.5, 1, n) / 25).round() * 25, loan_amount).astype(float)
+    funded_amount_inv = np.round(funded_amount * np.where(rng.random(n) < 0.1, rng.uniform(0.8, 1, n), 1), 2)
+
+    # Monthly instalment of an amortised loan
+    monthly_rate = int_rate / 1200
+    growth = (1 + monthly_rate) ** term_months
+    instalment = np.round(funded_amount * monthly_rate * growth / (growth - 1), 2)
+
+    # Borrower details
+    annual_inc = np.round(np.exp(rng.normal(11.0, 0.6, n)).clip(4000, 6_000_000), 2)
+    dti = np.round(rng.normal(16, 7.5, n).clip(0, 40), 2)
+    delinq_2yrs = rng.negative_binomial(0.4, 0.6, n).astype(np.int64)
+    inq_last_6mths = rng.negative_binomial(1.2, 0.55, n).astype(np.int64)
+    open_accounts = 1 + rng.poisson(9, n).astype(np.int64)
+    total_accounts = open_accounts + rng.negative_binomial(3, 0.2, n).astype(np.int64)
+
+    # Dates, counted in months from Jan-1960. Later years issued more loans, and loans still being repaid were issued within their term.
+    active = np.isin(loan_status, ACTIVE_STATUSES)
+    charged_off = np.isin(loan_status, CHARGED_OFF_STATUSES)
+    issue_month = FIRST_ISSUE_MONTH + np.floor((LAST_ISSUE_MONTH - FIRST_ISSUE_MONTH + 1) * rng.random(n) ** 0.5).astype(np.int64)
+    issue_month = np.where(active, EXTRACT_MONTH - rng.integers(1, term_months), issue_month)
+    earliest_credit_line = (issue_month - 36 - rng.gamma(3, 48, n).astype(np.int64)).clip(0)
+
+    # Months of payments made: every month so far for loans being repaid, less a month or two if they are late, up to the whole term
+    # for paid loans, which are often paid off early, and fewer for loans which were charged off
+    months_missed = np.where(np.isin(loan_status, ['Late (31-120 days)', 'Late (16-30 days)']), rng.integers(1, 4, n), 0)
+    payments = np.where(active, EXTRACT_MONTH - issue_month - months_missed,
+                        np.where(charged_off, term_months * rng.uniform(0.05, 0.6, n), term_months * rng.uniform(0.2, 1, n)))
+    payments = np.maximum(np.floor(payments), 1).astype(np.int64)
+
+    # Principal still owed after the payments made
+    balance = funded_amount * (growth - (1 + monthly_rate) ** payments) / (growth - 1)
+    paid_principal = funded_amount - balance
+    paid_interest = instalment * payments - paid_principal
+
+    late_fee = np.where(rng.random(n) < np.where(active | charged_off, 0.15, 0.02), rng.exponential(15, n), 0).round(2)
+    recoveries = np.where(charged_off & (rng.random(n) < 0.8), np.minimum(rng.lognormal(6.5, 1.2, n), balance), 0).round(2)
+    collection_recovery_fee = np.where((recoveries > 0) & (rng.random(n) < 0.7), recoveries * rng.uniform(0, 0.18, n), 0).round(2)
+
+    # Paid loans also paid off what was owed, and loans still being repaid owe it
+    fully_paid = ~active & ~charged_off
+    total_rec_prncp = np.round(np.where(fully_paid, funded_amount, paid_principal), 2)
+    out_prncp = np.round(np.where(active | (loan_status == 'Default'), balance, 0), 2)
+    total_rec_int = np.round(paid_interest, 2)
+    total_payment = np.round(total_rec_prncp + total_rec_int + late_fee + recoveries, 2)
+    investor_share = funded_amount_inv / funded_amount
+
+    last_payment_month = np.minimum(issue_month + payments, EXTRACT_MONTH)
+    last_payment_amount = np.round(np.where(fully_paid, instalment + balance, instalment * np.where(charged_off, rng.uniform(0.1, 1, n), 1)), 2)
+    next_payment_month = np.where(active | (rng.random(n) < 0.043), np.minimum(last_payment_month + 1, EXTRACT_MONTH + 1), -1)
+    last_credit_pull_month = np.minimum(last_payment_month + rng.integers(0, 24, n), EXTRACT_MONTH)
+
+    df = DataFrame({
+        'id': np.arange(start, stop, dtype=np.int64) + 54_000,
+        'member_id': np.arange(start, stop, dtype=np.int64) + 58_000,
+        'loan_amount': loan_amount,
+        'funded_amount': funded_amount,
+        'funded_amount_inv': funded_amount_inv,
+        'term': np.array(['36 months', '60 months'], dtype=object)[(term_months == 60).astype(int)],
+        'int_rate': int_rate,
+        'instalment': instalment,
+        'grade': GRADES[grade_code],
+        'sub_grade': SUB_GRADES[grade_code * 5 + sub_grade_step],
+        'employment_length': _choose(rng, EMPLOYMENT_LENGTH_SHARES, n),
+        'home_ownership': _choose(rng, HOME_OWNERSHIP_SHARES, n),
+        'annual_inc': annual_inc,
+        'verification_status': _choose(rng, VERIFICATION_STATUS_SHARES, n),
+        'issue_date': MONTHS[issue_month],
+        'loan_status': loan_status,
+        'payment_plan': np.array(['n', 'y'], dtype=object)[(rng.random(n) < 1 / 54231).astype(int)],
+        'purpose': _choose(rng, PURPOSE_SHARES, n),
+        'dti': dti,
+        'delinq_2yrs': delinq_2yrs,
+        'earliest_credit_line': MONTHS[earliest_credit_line],
+        'inq_last_6mths': inq_last_6mths,
+        'mths_since_last_delinq': np.floor(rng.beta(1.2, 2, n) * 150),
+        'mths_since_last_record': np.floor(rng.beta(2, 1.5, n) * 130),
+        'open_accounts': open_accounts,
+        'total_accounts': total_accounts,
+        'out_prncp': out_prncp,
+        'out_prncp_inv': np.round(out_prncp * investor_share, 2),
+        'total_payment': total_payment,
+        'total_payment_inv': np.round(total_payment * investor_share, 2),
+        'total_rec_prncp': total_rec_prncp,
+        'total_rec_int': total_rec_int,
+        'total_rec_late_fee': late_fee,
+        'recoveries': recoveries,
+        'collection_recovery_fee': collection_recovery_fee,
+        'last_payment_date': MONTHS[last_payment_month],
+        'last_payment_amount': last_payment_amount,
+        'next_payment_date': np.where(next_payment_month >= 0, MONTHS[next_payment_month], np.nan),
+        'last_credit_pull_date': MONTHS[last_credit_pull_month],
+        'collections_12_mths_ex_med': rng.choice([0.0, 1.0, 2.0, 3.0, 4.0], n, p=[0.99614, 0.00356, 0.00026, 0.00002, 0.00002]),
+        'mths_since_last_major_derog': np.floor(rng.beta(1.5, 2, n) * 150),
+        'policy_code': np.ones(n, dtype=np.int64),
+        'application_type': np.full(n, 'INDIVIDUAL', dtype=object),
+    })
+
+    # Null out each column's share of values
+    for name, rate in NULL_RATES.items():
+        df[name] = df[name].mask(rng.random(n) < rate)
+
+    return df
+
+
+def _choose(rng: np.random.Generator, shares: dict, n: int) -> np.ndarray:
+    """Return n values drawn from the keys of shares, in proportion to their values, as an object array of shared strings."""
+    weights = np.array(list(shares.values()), dtype=float)
+
+    # Indexing an object array reuses the same few string objects, rather than making a new string for every row
+    values = np.array(list(shares), dtype=object)
+    return values[rng.choice(len(values), n, p=weights / weights.sum())]